@@ -0,0 +1,113 @@
+###############################################################
+# benchmark_outbox.py
+# ------------------------------------------------------------
+# Compara a fila local em SQLite (PERSISTENCE) com o log segmentado
+# Uso: python scripts/benchmark_outbox.py [-n 20000] [--threads 8]
+# TODOS OS DIREITOS RESERVADOS A CONTROL ENGENHARIA
+# #############################################################
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from models import persistence
+from logstore import SegmentLog
+from outbox import LogOutbox, OutboxDrainer
+
+
+def confirmed(payload, routing_key=None):
+    future = Future()
+    future.set_result(True)
+    return future
+
+
+def confirm_all(pending):
+    return [key for key, _ in pending]
+
+
+def sample_payload(n):
+    return json.dumps({"id_sensor": f"DP_{n:06d}", "valor": 21.5 + n % 10, "timestamp": "2025-11-01 12:00:00"})
+
+
+def enqueue_all(outbox, count, threads):
+    """Enfileira `count` mensagens a partir de `threads` threads, aguardando a gravação."""
+    per_thread = count // threads
+
+    def producer(start):
+        for n in range(start, start + per_thread):
+            outbox.enqueue(sample_payload(n), wait=True)
+
+    workers = [threading.Thread(target=producer, args=(i * per_thread,)) for i in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return per_thread * threads, time.perf_counter() - started
+
+
+def disk_usage(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def run(backend, count, threads, directory):
+    if backend == "sqlite":
+        path = os.path.join(directory, "outbox.db")
+        engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+        persistence.__table__.create(engine)
+        outbox = OutboxDrainer(session_factory=sessionmaker(bind=engine), replay_rate=0,
+                               publish=confirmed, wait=confirm_all, ready=lambda: True)
+    else:
+        path = os.path.join(directory, "outbox_log")
+        outbox = LogOutbox(SegmentLog(path), publish=confirmed, wait=confirm_all, ready=lambda: True)
+    outbox.start = lambda: None  # o envio é medido separadamente com drain_once
+
+    written, enqueue_time = enqueue_all(outbox, count, threads)
+    size = disk_usage(path)
+    started = time.perf_counter()
+    drained = outbox.drain_once()
+    drain_time = time.perf_counter() - started
+    if backend == "sqlite":
+        outbox.writer.stop()
+        engine.dispose()
+    else:
+        outbox.log.close()
+
+    return {
+        "backend": backend,
+        "mensagens": written,
+        "enfileiramento_por_segundo": round(written / enqueue_time, 1),
+        "envio_por_segundo": round(drained / drain_time, 1) if drain_time else None,
+        "bytes_em_disco": size,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fila local: SQLite x log segmentado")
+    parser.add_argument("-n", "--count", type=int, default=20000, help="mensagens por backend")
+    parser.add_argument("--threads", type=int, default=8, help="threads enfileirando ao mesmo tempo")
+    parser.add_argument("-b", "--backends", nargs="+", default=["sqlite", "log"], choices=["sqlite", "log"])
+    args = parser.parse_args()
+
+    for backend in args.backends:
+        directory = tempfile.mkdtemp(prefix="cma-outbox-")
+        try:
+            print(json.dumps(run(backend, args.count, args.threads, directory), ensure_ascii=False))
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
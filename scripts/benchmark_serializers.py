@@ -0,0 +1,113 @@
+###############################################################
+# benchmark_serializers.py
+# ------------------------------------------------------------
+# Compara tamanho e custo de CPU dos formatos de mensagem (serializers.py)
+# com payloads gerados por process_json_datapoints (um registrador) e
+# process_equipment_payloads (equipamento inteiro) em um banco temporário
+# Uso: python scripts/benchmark_serializers.py [-r 50] [-n 20]
+# TODOS OS DIREITOS RESERVADOS A CONTROL ENGENHARIA
+# #############################################################
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+
+def populate(models, registers):
+    """Gateway e um equipamento Modbus com `registers` registradores e tags."""
+    from sqlalchemy import insert
+    with models.engine.begin() as connection:
+        connection.execute(insert(models.cma_gateway.__table__), [{
+            "xid_gateway": "GTW_001", "subestacao": "Subestação Camaçari II", "regional": "Nordeste",
+            "host": "10.20.30.40", "status": True, "id_gtw": 1, "id_sub": 17}])
+        connection.execute(insert(models.datasource_modbus_ip.__table__), [{
+            "xid_equip": "EQP_TR01", "xid_gateway": "GTW_001", "fabricante": "Treetech", "marca": "Treetech",
+            "modelo": "TM2", "sap_id": "10004567", "enabled": True, "updatePeriodType": "SECONDS",
+            "updatePeriods": 60, "host": "10.20.30.41", "port": 502, "id_hdw": 3, "name_hdw": "Monitor de temperatura",
+            "type": "Transformador", "model_sen": "TM2", "name_sen": "TR-01 Monitor", "id_man": 5}])
+        connection.execute(insert(models.datapoints_modbus_ip.__table__), [{
+            "xid_sensor": f"DP_TR01_{n:04d}", "xid_equip": "EQP_TR01", "offset": 40001 + n, "enabled": True,
+            "nome": f"Temperatura do enrolamento {n}", "tipo": "Temperatura", "classificacao": "Analógico",
+            "phase": "ABC"[n % 3], "circuitBreakerManeuverType_reg_mod": "N/A", "bushingSide": "H",
+            "id_reg_reg_mod": 2, "id_sen_reg_mod": 8} for n in range(registers)])
+        connection.execute(insert(models.eqp_tags.__table__), [
+            {"xid_equip": "EQP_TR01", "nome": "bay", "valor": "TR-01"},
+            {"xid_equip": "EQP_TR01", "nome": "tensao", "valor": "230kV"}])
+        connection.execute(insert(models.dp_tags.__table__), [
+            {"xid_sensor": f"DP_TR01_{n:04d}", "nome": "unidade", "valor": "°C"} for n in range(registers)])
+
+
+def measure(serializer, texts, rounds):
+    """Tamanho médio e tempo médio (µs) de conversão e de decodificação por mensagem."""
+    bodies = [serializer.transcode(text) for text in texts]
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for text in texts:
+            serializer.transcode(text)
+    encode = (time.perf_counter() - started) / (rounds * len(texts))
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for body in bodies:
+            serializer.decode(body)
+    decode = (time.perf_counter() - started) / (rounds * len(texts))
+    size = sum(len(body.encode("utf-8") if isinstance(body, str) else body) for body in bodies) / len(bodies)
+    return size, encode * 1e6, decode * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tamanho e CPU dos formatos de mensagem")
+    parser.add_argument("-r", "--registers", type=int, default=50, help="registradores do equipamento")
+    parser.add_argument("-n", "--rounds", type=int, default=20, help="repetições da medição")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="cma-serializers-")
+    try:
+        run(directory, args.registers, args.rounds)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def run(directory, registers, rounds):
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(directory, 'CMA_Gateway.db')}"
+    os.environ["QUEUE_DATABASE_URL"] = f"sqlite:///{os.path.join(directory, 'CMA_Gateway_queue.db')}"
+    import models
+    populate(models, registers)
+    import main as gateway
+    from serializers import SERIALIZERS, RABBIT_JSON_BACKEND, orjson
+
+    sensors = gateway.config_snapshot.current().sensors_of("modbus", "EQP_TR01")
+    values = {xid: {"value": 21.5 + n / 7} for n, xid in enumerate(sensors)}
+    payloads = {
+        "registrador": [gateway.process_json_datapoints(xid, "MODBUS", values[xid]) for xid in sensors],
+        "equipamento": gateway.process_equipment_payloads("EQP_TR01", "MODBUS", values),
+    }
+
+    json_backend = "orjson" if orjson is not None and RABBIT_JSON_BACKEND == "auto" else "json"
+    for kind, texts in payloads.items():
+        baseline = None
+        for name, serializer in SERIALIZERS.items():
+            if not serializer.available():
+                print(json.dumps({"payload": kind, "formato": name, "erro": "biblioteca não instalada"},
+                                 ensure_ascii=False))
+                continue
+            size, encode, decode = measure(serializer, texts, rounds)
+            baseline = baseline or size
+            print(json.dumps({
+                "payload": kind,
+                "formato": name,
+                "json_backend": json_backend if name == "json_compact" else None,
+                "mensagens": len(texts),
+                "bytes_por_mensagem": round(size),
+                "tamanho_relativo": round(size / baseline, 3),
+                "conversao_us": round(encode, 2),
+                "decodificacao_us": round(decode, 2),
+            }, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
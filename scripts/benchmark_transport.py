@@ -0,0 +1,62 @@
+###############################################################
+# benchmark_transport.py
+# ------------------------------------------------------------
+# Compara a vazão de envio AMQP x MQTT com os brokers do .env
+# Uso: python scripts/benchmark_transport.py [-n 5000] [-t amqp mqtt]
+# TODOS OS DIREITOS RESERVADOS A CONTROL ENGENHARIA
+# #############################################################
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import wait
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from rabbitmq import create_publisher
+
+
+def sample_payload(n):
+    return json.dumps({
+        "id_sensor": f"DP_{n:06d}",
+        "valor": 21.5 + n % 10,
+        "timestamp": "2025-11-01 12:00:00",
+    })
+
+
+def run(transport, count, timeout):
+    publisher = create_publisher(transport)
+    try:
+        if not publisher.wait_ready(timeout):
+            return {"transporte": transport, "erro": "broker indisponível"}
+        payloads = [sample_payload(n) for n in range(count)]
+        started = time.perf_counter()
+        futures = [publisher.publish_async(payload) for payload in payloads]
+        wait(futures, timeout=timeout)
+        elapsed = time.perf_counter() - started
+        confirmed = sum(1 for future in futures if future.done() and future.result())
+        return {
+            "transporte": transport,
+            "mensagens": count,
+            "confirmadas": confirmed,
+            "segundos": round(elapsed, 3),
+            "mensagens_por_segundo": round(confirmed / elapsed, 1) if elapsed else None,
+        }
+    finally:
+        publisher.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vazão de envio AMQP x MQTT")
+    parser.add_argument("-n", "--count", type=int, default=5000, help="mensagens por transporte")
+    parser.add_argument("-t", "--transports", nargs="+", default=["amqp", "mqtt"], choices=["amqp", "mqtt"])
+    parser.add_argument("--timeout", type=float, default=60, help="tempo máximo por transporte (s)")
+    args = parser.parse_args()
+
+    for transport in args.transports:
+        print(json.dumps(run(transport, args.count, args.timeout), ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
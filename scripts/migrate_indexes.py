@@ -0,0 +1,57 @@
+###############################################################
+# migrate_indexes.py
+# ------------------------------------------------------------
+# Reescreve os índices dos bancos do gateway (configuração e fila)
+# conforme os modelos, sem alterar os dados, e compacta os arquivos
+# Uso: python scripts/migrate_indexes.py [--database-url URL] [--no-vacuum]
+# TODOS OS DIREITOS RESERVADOS A CONTROL ENGENHARIA
+# #############################################################
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+
+def file_size(engine):
+    path = engine.url.database
+    return sum(os.path.getsize(path + suffix) for suffix in ("", "-wal")
+               if path and os.path.exists(path + suffix))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migração dos índices dos bancos SQLite do gateway")
+    parser.add_argument("--database-url", help="banco de configuração (padrão: DATABASE_URL do .env)")
+    parser.add_argument("--queue-database-url", help="banco da fila (padrão: QUEUE_DATABASE_URL do .env)")
+    parser.add_argument("--no-vacuum", action="store_true", help="não reescreve os arquivos após a migração")
+    args = parser.parse_args()
+
+    # Definidas antes de importar models: o .env não sobrescreve variáveis já existentes
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    if args.queue_database_url:
+        os.environ["QUEUE_DATABASE_URL"] = args.queue_database_url
+    os.environ["SQLITE_MIGRATE_INDEXES"] = "false"
+
+    import models
+
+    targets = [(models.engine, models.Base.metadata)]
+    if str(models.queue_engine.url) != str(models.engine.url):
+        targets.append((models.queue_engine, models.QueueBase.metadata))
+
+    for bind, metadata in targets:
+        size_before = file_size(bind)
+        dropped, created = models.migrate_indexes(bind, metadata, vacuum=not args.no_vacuum)
+        bind.dispose()
+        print(json.dumps({
+            "banco": bind.url.database,
+            "indices_removidos": dropped,
+            "indices_criados": created,
+            "bytes_antes": size_before,
+            "bytes_depois": file_size(bind),
+        }, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
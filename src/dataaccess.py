@@ -0,0 +1,102 @@
+###############################################################
+# dataaccess.py
+# ------------------------------------------------------------
+# Consultas em conjunto da configuração por equipamento: registradores,
+# equipamento, gateway e tags com poucas junções, sem consulta por registrador
+# Author: Aluisio Cavalcante <aluisio@controlengenharia.eng.br>
+# novembro de 2025
+# TODOS OS DIREITOS RESERVADOS A CONTROL ENGENHARIA
+# #############################################################
+from sqlalchemy import literal_column, select
+
+from models import engine, cma_gateway, eqp_tags, dp_tags
+from snapshot import CONFIG_TABLES, PERIOD_COLUMNS, PROTOCOL_TABLES, ROW_TYPES, ConfigSnapshot
+
+# Máximo de xid_equip por cláusula IN (limite de parâmetros do SQLite)
+IN_CHUNK_SIZE = 500
+
+
+def _chunks(values):
+    values = list(dict.fromkeys(values))
+    for start in range(0, len(values), IN_CHUNK_SIZE):
+        yield values[start:start + IN_CHUNK_SIZE]
+
+
+def _split(row, slices):
+    """Separa uma linha da junção nas tuplas nomeadas de cada tabela (None para o lado vazio do LEFT JOIN)."""
+    parts = []
+    for row_type, start, stop, key in slices:
+        values = row[start:stop]
+        parts.append(row_type(*values) if values[key] is not None else None)
+    return parts
+
+
+def load_equipments(protocol, xid_equips, bind=engine):
+    """
+    Lê a configuração dos equipamentos `xid_equips` do protocolo com três
+    consultas, qualquer que seja a quantidade de registradores:
+
+    1. equipamento LEFT JOIN registradores LEFT JOIN gateway;
+    2. tags dos equipamentos;
+    3. tags dos registradores (junção com os registradores dos equipamentos).
+
+    Retorna um `ConfigSnapshot` parcial (`complete=False`) com a mesma
+    interface da cópia completa, restrito a esses equipamentos.
+    """
+    protocol = protocol.lower()
+    equipment_model, datapoint_model = PROTOCOL_TABLES[protocol]
+    equipment, datapoint = equipment_model.__table__, datapoint_model.__table__
+    gateway, equipment_tag, datapoint_tag = cma_gateway.__table__, eqp_tags.__table__, dp_tags.__table__
+
+    # Posição das colunas de cada tabela na linha da junção e da chave primária em cada fatia
+    slices = []
+    position = 0
+    for table, key in ((equipment, "xid_equip"), (datapoint, "xid_sensor"), (gateway, "xid_gateway")):
+        columns = [column.key for column in table.columns]
+        slices.append((ROW_TYPES[table.name], position, position + len(columns), columns.index(key)))
+        position += len(columns)
+
+    rows = {model.__tablename__: [] for model in CONFIG_TABLES}
+    equipments, gateways = {}, {}
+    with bind.connect() as connection, connection.begin():
+        for chunk in _chunks(xid_equips):
+            joined = (
+                select(equipment, datapoint, gateway)
+                .select_from(equipment
+                             .outerjoin(datapoint, datapoint.c.xid_equip == equipment.c.xid_equip)
+                             .outerjoin(gateway, gateway.c.xid_gateway == equipment.c.xid_gateway))
+                .where(equipment.c.xid_equip.in_(chunk))
+                # Registradores na ordem de gravação, como na cópia completa
+                .order_by(equipment.c.xid_equip, literal_column(f'"{datapoint.name}".rowid'))
+            )
+            for row in connection.execute(joined):
+                equipment_row, datapoint_row, gateway_row = _split(row, slices)
+                equipments.setdefault(equipment_row.xid_equip, equipment_row)
+                if gateway_row is not None:
+                    gateways.setdefault(gateway_row.xid_gateway, gateway_row)
+                if datapoint_row is not None:
+                    rows[datapoint.name].append(datapoint_row)
+
+            row_type = ROW_TYPES[equipment_tag.name]
+            rows[equipment_tag.name].extend(row_type(*row) for row in connection.execute(
+                select(equipment_tag).where(equipment_tag.c.xid_equip.in_(chunk)).order_by(equipment_tag.c.id)))
+
+            row_type = ROW_TYPES[datapoint_tag.name]
+            rows[datapoint_tag.name].extend(row_type(*row) for row in connection.execute(
+                select(datapoint_tag)
+                .join(datapoint, datapoint.c.xid_sensor == datapoint_tag.c.xid_sensor)
+                .where(datapoint.c.xid_equip.in_(chunk))
+                .order_by(datapoint_tag.c.id)))
+
+    rows[equipment.name] = list(equipments.values())
+    rows[gateway.name] = list(gateways.values())
+    return ConfigSnapshot(rows, complete=False)
+
+
+def load_periods(protocol, bind=engine):
+    """Lista de (xid_equip, período, unidade) dos equipamentos do protocolo, em uma consulta."""
+    protocol = protocol.lower()
+    table = PROTOCOL_TABLES[protocol][0].__table__
+    value, unit = PERIOD_COLUMNS[protocol]
+    with bind.connect() as connection:
+        return [tuple(row) for row in connection.execute(select(table.c.xid_equip, table.c[value], table.c[unit]))]
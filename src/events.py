@@ -0,0 +1,168 @@
+###############################################################
+# events.py
+# ------------------------------------------------------------
+# Barramento de eventos de alteração dos modelos (inclusão,
+# atualização e deleção), entregues em lotes aos assinantes
+# Author: Aluisio Cavalcante <aluisio@controlengenharia.eng.br>
+# novembro de 2025
+# TODOS OS DIREITOS RESERVADOS A CONTROL ENGENHARIA
+# #############################################################
+import logging
+import os
+import threading
+import time
+from collections import deque, namedtuple
+
+from dotenv import load_dotenv
+from logger import *
+# Carregando as variáveis de ambiente do arquivo .env
+load_dotenv()
+
+# Liga os eventos de alteração dos modelos (desligado por padrão), tamanho
+# máximo de cada lote entregue, espera para juntar eventos (ms), limite de
+# eventos pendentes (os mais antigos são descartados) e registro dos eventos
+# no log como as mensagens impressas pelas versões anteriores
+EVENT_BUS_ENABLED = os.getenv("EVENT_BUS_ENABLED", "false").lower() == "true"
+EVENT_BUS_BATCH_MAX = int(os.getenv("EVENT_BUS_BATCH_MAX", 500))
+EVENT_BUS_LINGER_MS = int(os.getenv("EVENT_BUS_LINGER_MS", 50))
+EVENT_BUS_MAX_PENDING = int(os.getenv("EVENT_BUS_MAX_PENDING", 100000))
+EVENT_BUS_LOG = os.getenv("EVENT_BUS_LOG", "false").lower() == "true"
+
+# Logger dos eventos com nível INFO próprio: o logger raiz (logger.py) só
+# registra a partir de WARNING e as alterações não são avisos
+event_logger = logging.getLogger("gateway.events")
+event_logger.setLevel(logging.INFO)
+
+# operation: "inclusão", "atualização" ou "deleção"; key: chave primária (tupla)
+ChangeEvent = namedtuple("ChangeEvent", ["operation", "table", "key"])
+
+
+class ChangeEventBus:
+
+    """
+    Distribui eventos de alteração para os assinantes.
+
+    `publish` só acrescenta o evento a uma fila em memória e retorna; sem
+    assinantes não faz nada. Uma thread própria, iniciada no primeiro evento,
+    entrega os eventos em lotes de até `batch_max`, esperando até `linger`
+    segundos para juntar os que chegam em sequência. Cada assinante recebe a
+    lista de eventos das tabelas que assinou.
+    """
+
+    def __init__(self, batch_max=EVENT_BUS_BATCH_MAX, linger=EVENT_BUS_LINGER_MS / 1000.0,
+                 max_pending=EVENT_BUS_MAX_PENDING):
+        self.batch_max = max(1, int(batch_max))
+        self.linger = max(0.0, float(linger))
+        self.max_pending = max(1, int(max_pending))
+
+        self._subscribers = ()  # substituída inteira a cada alteração: leitura sem lock
+        self._pending = deque()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._pid = None
+        self._stop = False
+        self._delivering = False
+        self.dropped = 0
+
+    @property
+    def active(self):
+        return bool(self._subscribers)
+
+    def subscribe(self, callback, tables=None):
+        """
+        Registra `callback(eventos)` para as tabelas em `tables` (nomes das
+        tabelas; None para todas).
+        """
+        tables = frozenset(tables) if tables is not None else None
+        with self._cond:
+            self._subscribers = self._subscribers + ((callback, tables),)
+
+    def unsubscribe(self, callback):
+        with self._cond:
+            self._subscribers = tuple(entry for entry in self._subscribers if entry[0] is not callback)
+
+    def publish(self, operation, table, key=None):
+        if not self._subscribers:
+            return
+        with self._cond:
+            self._start()
+            if len(self._pending) >= self.max_pending:
+                self._pending.popleft()
+                self.dropped += 1
+            self._pending.append(ChangeEvent(operation, table, key))
+            if len(self._pending) == 1 or len(self._pending) >= self.batch_max:
+                self._cond.notify()
+
+    def flush(self, timeout=5):
+        """Aguarda a entrega dos eventos pendentes. Retorna False se o tempo acabar."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._pending or self._delivering:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.notify_all()
+                self._cond.wait(min(remaining, 0.05))
+        return True
+
+    def stop(self):
+        with self._cond:
+            self._stop = True
+            self._cond.notify_all()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+
+    def _start(self):
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, name="change-events", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._stop:
+                    self._cond.wait()
+                if self._stop:
+                    return
+                # Espera um pouco para juntar os eventos de uma mesma transação
+                deadline = time.monotonic() + self.linger
+                while len(self._pending) < self.batch_max and not self._stop:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                count = min(len(self._pending), self.batch_max)
+                batch = [self._pending.popleft() for _ in range(count)]
+                self._delivering = True
+                subscribers = self._subscribers
+            try:
+                self._deliver(batch, subscribers)
+            finally:
+                with self._cond:
+                    self._delivering = False
+                    self._cond.notify_all()
+
+    @staticmethod
+    def _deliver(batch, subscribers):
+        for callback, tables in subscribers:
+            events = batch if tables is None else [event for event in batch if event.table in tables]
+            if not events:
+                continue
+            try:
+                callback(events)
+            except Exception as e:
+                logger.error(f"Erro no assinante de eventos {getattr(callback, '__name__', callback)}: {e}")
+
+
+def log_events(events):
+    """Assinante que registra no log cada alteração recebida."""
+    for event in events:
+        event_logger.info(f"A operação '{event.operation}' foi realizada em {event.table} {event.key}")
+
+
+change_events = ChangeEventBus()
+if EVENT_BUS_ENABLED and EVENT_BUS_LOG:
+    change_events.subscribe(log_events)
@@ -0,0 +1,409 @@
+###############################################################
+# logstore.py
+# ------------------------------------------------------------
+# Log segmentado (append-only) para a fila local de mensagens
+# Author: Aluisio Cavalcante <aluisio@controlengenharia.eng.br>
+# novembro de 2025
+# TODOS OS DIREITOS RESERVADOS A CONTROL ENGENHARIA
+# #############################################################
+import os
+import queue
+import struct
+import threading
+import zlib
+
+from dotenv import load_dotenv
+from logger import *
+# Carregando as variáveis de ambiente do arquivo .env
+load_dotenv()
+
+# Diretório dos segmentos, tamanho máximo de cada segmento (bytes), nível de
+# compressão zlib dos segmentos fechados (0 = sem compressão) e tamanho
+# máximo do log (bytes, 0 = sem limite; acima dele os segmentos mais antigos
+# são descartados)
+LOGSTORE_DIR=os.getenv("LOGSTORE_DIR", "outbox_log")
+LOGSTORE_SEGMENT_BYTES=int(os.getenv("LOGSTORE_SEGMENT_BYTES", 4 * 1024 * 1024))
+LOGSTORE_COMPRESSION_LEVEL=int(os.getenv("LOGSTORE_COMPRESSION_LEVEL", 6))
+LOGSTORE_MAX_BYTES=int(os.getenv("LOGSTORE_MAX_BYTES", 512 * 1024 * 1024))
+
+# Cabeçalho de cada registro: tamanho e CRC32 do conteúdo
+HEADER = struct.Struct("!II")
+
+
+def _content(data):
+    """Registro como texto; mensagens já convertidas (começam com serializers.MARKER) ficam em bytes."""
+    return data if data[:1] == b"\x00" else data.decode("utf-8")
+
+
+class SegmentLog:
+
+    """
+    Log append-only dividido em segmentos.
+
+    Cada registro é gravado como tamanho + CRC32 + conteúdo no segmento ativo
+    (`<offset inicial>.log`). Ao passar de `segment_bytes` o segmento é
+    fechado e um novo é aberto; o segmento fechado é comprimido inteiro com
+    zlib (`.logz`) por uma thread própria, sem bloquear a gravação. O
+    offset do consumidor fica no arquivo `checkpoint`, gravado de forma
+    atômica; segmentos totalmente consumidos são apagados inteiros.
+
+    Na abertura apenas o último segmento é lido: registros incompletos ou
+    com CRC inválido no final (queda durante a gravação) são descartados.
+    """
+
+    def __init__(self, directory=LOGSTORE_DIR, segment_bytes=LOGSTORE_SEGMENT_BYTES,
+                 compression_level=LOGSTORE_COMPRESSION_LEVEL, max_bytes=LOGSTORE_MAX_BYTES):
+        self.directory = directory
+        self.segment_bytes = max(1, int(segment_bytes))
+        self.compression_level = compression_level
+        self.max_bytes = max_bytes
+
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._segments = []  # offsets iniciais, do mais antigo para o ativo
+        self._active = None
+        self._active_size = 0
+        self._next_offset = 0
+        self._synced_offset = 0
+        self._checkpoint = 0
+        self._cache = (None, None)  # (offset inicial, registros) do último segmento fechado lido
+        self._read_cursor = (None, 0, 0)  # (segmento, offset, posição) da última leitura do segmento ativo
+        self._closed_fds = []  # descritores dos segmentos fechados ainda sem fsync
+        self._compress_queue = queue.Queue()
+        self._compress_lock = threading.Lock()
+        self._compress_thread = None
+        self._compress_pid = None
+        self.dropped = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self._recover()
+
+    # ---------------------------------------------------------
+    # Escrita
+    # ---------------------------------------------------------
+    def append(self, payload):
+        """Acrescenta um registro e retorna o seu offset."""
+        data = payload.encode("utf-8") if isinstance(payload, str) else payload
+        with self._lock:
+            if self._active_size >= self.segment_bytes:
+                self._roll()
+            self._active.write(HEADER.pack(len(data), zlib.crc32(data)) + data)
+            self._active_size += HEADER.size + len(data)
+            offset = self._next_offset
+            self._next_offset += 1
+            return offset
+
+    def sync(self, offset=None):
+        """
+        Garante em disco os registros até `offset` (por padrão, todos).
+
+        Chamadas concorrentes aproveitam o mesmo fsync.
+        """
+        with self._sync_lock:
+            if offset is not None and offset < self._synced_offset:
+                return
+            with self._lock:
+                self._active.flush()
+                target = self._next_offset
+                # Cópias dos descritores: o segmento pode ser fechado por `_roll` durante o fsync
+                filenos, self._closed_fds = self._closed_fds + [os.dup(self._active.fileno())], []
+            try:
+                for fileno in filenos:
+                    os.fsync(fileno)
+            finally:
+                for fileno in filenos:
+                    os.close(fileno)
+            self._synced_offset = max(self._synced_offset, target)
+
+    # ---------------------------------------------------------
+    # Leitura e confirmação
+    # ---------------------------------------------------------
+    @property
+    def checkpoint(self):
+        return self._checkpoint
+
+    @property
+    def next_offset(self):
+        return self._next_offset
+
+    def pending(self):
+        return self._next_offset - self._checkpoint
+
+    def read(self, offset, limit):
+        """
+        Lê até `limit` registros a partir de `offset`. Retorna [(offset, conteúdo)].
+
+        O conteúdo é texto, exceto o das mensagens gravadas já no formato de
+        envio (`serializers.pack`), que é devolvido em bytes.
+        """
+        records = []
+        with self._lock:
+            self._active.flush()
+            segments = list(self._segments)
+            end = self._next_offset
+        offset = max(offset, segments[0])
+        for index, base in enumerate(segments):
+            next_base = segments[index + 1] if index + 1 < len(segments) else end
+            if offset >= next_base:
+                continue
+            if index + 1 == len(segments):
+                records.extend(self._read_active(base, offset, limit - len(records), end))
+                return records
+            for position, payload in enumerate(self._segment_records(base, active=False)):
+                record_offset = base + position
+                if record_offset < offset or record_offset >= end:
+                    continue
+                records.append((record_offset, _content(payload)))
+                if len(records) >= limit:
+                    return records
+            offset = next_base
+        return records
+
+    def commit(self, offset):
+        """Registra que todos os registros antes de `offset` foram consumidos."""
+        with self._lock:
+            offset = min(max(offset, self._checkpoint), self._next_offset)
+            self._write_checkpoint(offset)
+            self._delete_consumed()
+
+    def enforce_quota(self):
+        """Descarta os segmentos mais antigos enquanto o log passar de `max_bytes`."""
+        if not self.max_bytes:
+            return 0
+        dropped = 0
+        with self._lock:
+            while len(self._segments) > 1 and self.size() > self.max_bytes:
+                next_base = self._segments[1]
+                dropped += max(next_base - max(self._checkpoint, self._segments[0]), 0)
+                self._write_checkpoint(max(self._checkpoint, next_base))
+                self._delete_consumed()
+        if dropped:
+            self.dropped += dropped
+            logger.error(f"Cota do log: {dropped} mensagem(ns) descartada(s)")
+        return dropped
+
+    def size(self):
+        total = 0
+        for name in os.listdir(self.directory):
+            if name.endswith((".log", ".logz")):
+                total += os.path.getsize(os.path.join(self.directory, name))
+        return total
+
+    def wait_compressed(self, timeout=None):
+        """Aguarda a compressão dos segmentos já fechados. Retorna True se não houver pendências."""
+        done = threading.Event()
+        self._compress_queue.put(done.set)
+        self._start_compressor()
+        return done.wait(timeout)
+
+    def close(self):
+        if self._compress_thread is not None and self._compress_thread.is_alive():
+            self.wait_compressed(timeout=30)
+        with self._lock:
+            for fileno in self._closed_fds:
+                os.close(fileno)
+            self._closed_fds = []
+            if self._active is not None:
+                self._active.flush()
+                os.fsync(self._active.fileno())
+                self._active.close()
+                self._active = None
+
+    # ---------------------------------------------------------
+    # Segmentos
+    # ---------------------------------------------------------
+    def _path(self, base, compressed=False):
+        return os.path.join(self.directory, f"{base:020d}.log{'z' if compressed else ''}")
+
+    def _roll(self):
+        """
+        Fecha o segmento ativo e abre o próximo (chamado com `_lock`).
+
+        O fsync do segmento fechado fica para o próximo `sync` e a compressão
+        para a thread de compressão, fora do lock.
+        """
+        base = self._segments[-1]
+        self._active.flush()
+        self._closed_fds.append(os.dup(self._active.fileno()))
+        self._active.close()
+        self._open_active(self._next_offset)
+        if self.compression_level:
+            self._compress_queue.put(base)
+            self._start_compressor()
+
+    def _start_compressor(self):
+        with self._compress_lock:
+            if self._compress_thread is not None and self._compress_thread.is_alive() \
+                    and self._compress_pid == os.getpid():
+                return
+            self._compress_pid = os.getpid()
+            self._compress_thread = threading.Thread(target=self._run_compressor, name="logstore-compress",
+                                                     daemon=True)
+            self._compress_thread.start()
+
+    def _run_compressor(self):
+        while True:
+            task = self._compress_queue.get()
+            if callable(task):
+                task()
+                continue
+            try:
+                self._compress(task)
+            except Exception as e:
+                # O segmento continua válido sem compressão
+                logger.error(f"Log da fila: erro ao comprimir o segmento {task}: {e}")
+
+    def _compress(self, base):
+        raw_path = self._path(base)
+        tmp_path = self._path(base, compressed=True) + ".tmp"
+        try:
+            with open(raw_path, "rb") as raw:
+                data = raw.read()
+        except FileNotFoundError:
+            return  # segmento já consumido e apagado
+        data = zlib.compress(data, self.compression_level)
+        with open(tmp_path, "wb") as compressed:
+            compressed.write(data)
+            compressed.flush()
+            os.fsync(compressed.fileno())
+        # Troca curta sob o lock: o segmento pode ter sido apagado por `_delete_consumed`
+        with self._lock:
+            if base not in self._segments:
+                os.remove(tmp_path)
+                return
+            os.replace(tmp_path, self._path(base, compressed=True))
+            os.remove(raw_path)
+
+    def _open_active(self, base):
+        self._segments.append(base)
+        self._active = open(self._path(base), "ab")
+        self._active_size = self._active.tell()
+
+    def _read_active(self, base, offset, limit, end):
+        """Lê o segmento ativo a partir de `offset`, continuando da última leitura quando possível."""
+        cursor_base, cursor_offset, position = self._read_cursor
+        if cursor_base != base or cursor_offset > offset:
+            cursor_offset, position = base, 0
+        records = []
+        with open(self._path(base), "rb") as segment:
+            segment.seek(position)
+            while cursor_offset < end and len(records) < limit:
+                header = segment.read(HEADER.size)
+                if len(header) < HEADER.size:
+                    break
+                length, _ = HEADER.unpack(header)
+                if cursor_offset < offset:
+                    segment.seek(length, os.SEEK_CUR)
+                else:
+                    records.append((cursor_offset, _content(segment.read(length))))
+                cursor_offset += 1
+            self._read_cursor = (base, cursor_offset, segment.tell())
+        return records
+
+    def _segment_records(self, base, active):
+        if not active and self._cache[0] == base:
+            return self._cache[1]
+        compressed = os.path.exists(self._path(base, compressed=True))
+        try:
+            with open(self._path(base, compressed), "rb") as segment:
+                data = segment.read()
+        except FileNotFoundError:
+            # Comprimido pela thread de compressão entre a verificação e a abertura
+            compressed = True
+            with open(self._path(base, compressed), "rb") as segment:
+                data = segment.read()
+        if compressed:
+            data = zlib.decompress(data)
+        records, _ = self._parse(data)
+        if not active:
+            self._cache = (base, records)
+        return records
+
+    @staticmethod
+    def _parse(data):
+        """Retorna (registros válidos, bytes válidos), parando no primeiro registro inválido."""
+        records = []
+        position = 0
+        while position + HEADER.size <= len(data):
+            length, crc = HEADER.unpack_from(data, position)
+            start = position + HEADER.size
+            payload = data[start:start + length]
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                break
+            records.append(payload)
+            position = start + length
+        return records, position
+
+    def _delete_consumed(self):
+        while len(self._segments) > 1 and self._segments[1] <= self._checkpoint:
+            base = self._segments.pop(0)
+            for compressed in (False, True):
+                if os.path.exists(self._path(base, compressed)):
+                    os.remove(self._path(base, compressed))
+            if self._cache[0] == base:
+                self._cache = (None, None)
+
+    # ---------------------------------------------------------
+    # Checkpoint e recuperação
+    # ---------------------------------------------------------
+    def _write_checkpoint(self, offset):
+        path = os.path.join(self.directory, "checkpoint")
+        with open(path + ".tmp", "w") as checkpoint:
+            checkpoint.write(str(offset))
+            checkpoint.flush()
+            os.fsync(checkpoint.fileno())
+        os.replace(path + ".tmp", path)
+        self._checkpoint = offset
+
+    def _recover(self):
+        bases = set()
+        for name in os.listdir(self.directory):
+            if name.endswith(".tmp"):
+                os.remove(os.path.join(self.directory, name))
+                continue
+            stem, ext = os.path.splitext(name)
+            if ext in (".log", ".logz") and stem.isdigit():
+                base = int(stem)
+                if ext == ".logz" and os.path.exists(self._path(base)):
+                    # Queda durante a compressão: o segmento original continua valendo
+                    os.remove(self._path(base, compressed=True))
+                bases.add(base)
+        self._segments = sorted(bases)
+
+        checkpoint_path = os.path.join(self.directory, "checkpoint")
+        if os.path.exists(checkpoint_path):
+            with open(checkpoint_path) as checkpoint:
+                self._checkpoint = int(checkpoint.read().strip() or 0)
+
+        if not self._segments:
+            self._open_active(self._checkpoint)
+            self._next_offset = self._checkpoint
+            self._synced_offset = self._checkpoint
+            return
+
+        if self.compression_level:
+            # Segmentos fechados que ficaram sem compressão (queda antes da thread de
+            # compressão); comprimidos quando a thread iniciar, no próximo `_roll`
+            for base in self._segments[:-1]:
+                if not os.path.exists(self._path(base, compressed=True)):
+                    self._compress_queue.put(base)
+
+        tail = self._segments.pop()
+        if os.path.exists(self._path(tail, compressed=True)):
+            # O último segmento já estava fechado: abre um novo depois dele
+            self._segments.append(tail)
+            count = len(self._segment_records(tail, active=False))
+            self._next_offset = tail + count
+            self._open_active(self._next_offset)
+        else:
+            # Só o segmento ativo é lido; descarta um final incompleto
+            with open(self._path(tail), "rb") as segment:
+                records, valid = self._parse(segment.read())
+            if valid < os.path.getsize(self._path(tail)):
+                logger.error(f"Log da fila: final incompleto descartado no segmento {tail}")
+                with open(self._path(tail), "r+b") as segment:
+                    segment.truncate(valid)
+            self._next_offset = tail + len(records)
+            self._open_active(tail)
+        self._synced_offset = self._next_offset
+        self._checkpoint = min(max(self._checkpoint, self._segments[0]), self._next_offset)
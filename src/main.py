@@ -25,6 +25,10 @@ import sys
 import multiprocessing
 from rabbitmq import *
 from scadalts import *
+from outbox import *
+from snapshot import *
+from payload import PAYLOAD_DNP3, PAYLOAD_MAX_REGISTERS, PAYLOAD_MODE, Slot, TemplateCache, json_array
+from dataaccess import load_equipments, load_periods
 from logger import *
 from dotenv import load_dotenv
 
@@ -164,11 +168,14 @@ def thr_get_system_info():
                     "mascara": network_data["Máscara"] if network_data["Máscara"] else None,
                     "status": network_data["Status"] if network_data["Status"] else None,
                     "velocidade": network_data["Velocidade"] if network_data["Velocidade"] else None
-                }
+                },
+                "cache_scada": point_cache.stats(),
+                "brokers_rabbitmq": publisher.status(),
+                "fila_mqtt": outbox.stats()
                 } #TODO: INCLUIR STATUS DO SCADA-LTS
         }
         payload = json.dumps(payload, indent=4, ensure_ascii=False)
-        send_data_to_mqtt(payload)
+        send_data_to_mqtt(payload, kind="health")
         logger.info("Enviando payload health_system_check para RabbitMQ...")
         #syslog.syslog("Enviando payload health_system_check para RabbitMQ...")
         syslog.syslog(syslog.LOG_ERR, "Enviando payload health_system_check para RabbitMQ...")
@@ -181,8 +188,10 @@ def fetch_name_value_pairs(table_class, field_name, xid):
     Busca pares de valores das colunas 'nome' e 'valor' de uma tabela
     e retorna uma estrutura de dados no formato [{"nome": "valor"}, ...].
 
+    Os pares vêm da cópia em memória da configuração (`config_snapshot`).
+
     Args:
-        table_class: Classe ORM que representa a tabela.
+        table_class: Classe ORM que representa a tabela (eqp_tags ou dp_tags).
         field_name (str): Nome da coluna usada como filtro.
         xid: Valor usado na condição WHERE.
 
@@ -190,25 +199,16 @@ def fetch_name_value_pairs(table_class, field_name, xid):
         list[dict]: Lista de dicionários no formato {"nome": "valor"}.
     """
 
-    session = SessionLocal()
     try:
-        query = (
-            select(table_class.__table__.c.nome, table_class.__table__.c.valor)
-            .where(table_class.__table__.c[field_name] == xid)
-        )
-
-        # Executar a consulta e obter todos os resultados
-        items = session.execute(query).fetchall()
-
-        # Montar a estrutura de saída como lista de dicionários
-        result = {item[0]: item[1] for item in items if item[0] and item[1]}
-
-        return result
+        snapshot = config_snapshot.current()
+        if table_class is eqp_tags and field_name == "xid_equip":
+            return dict(snapshot.tags_of_equipment(xid))
+        if table_class is dp_tags and field_name == "xid_sensor":
+            return dict(snapshot.tags_of_datapoint(xid))
+        raise ValueError(f"Tags de {table_class.__tablename__} por {field_name} não disponíveis")
     except Exception as e:
         logger.error(
             f"Erro ao buscar pares de valores das colunas 'nome' e 'valor' de uma tabela: {e}")
-    finally:
-        session.close()
 
 
 def parse_json_response(json_response, key):
@@ -234,191 +234,270 @@ def parse_json_response(json_response, key):
         return f"Erro ao processar o JSON: {e}"
 
 
-def process_json_datapoints(xid_sensor_param: str, protocol: str):
+# Campos variáveis dos payloads de sensores
+TIMESTAMP_SLOT = Slot("timestamp")
+VALUE_SLOT = Slot("register_value")
+REGISTERS_SLOT = Slot("registers")
+
+
+def build_payload_parts(snapshot, protocol, xid_sensor_param):
 
     """
-    Função para geração de um Payload (arquivo JSON) de múltiplas
-    Tabelas do banco de dados
+    Monta os blocos do payload de um registrador com os dados fixos do
+    gateway, do equipamento e do registrador; `timestamp` e `register_value`
+    ficam como campos variáveis (`Slot`).
 
     Args:
+        snapshot (ConfigSnapshot): Configuração em memória.
+        protocol (str): "MODBUS" ou "DNP3".
         xid_sensor_param (str): Valor do xid_sensor.
-        protocol (str): "modbus" ou "dnp3".
 
     Returns:
-        json: payload Json com os dados para ser enviados para Scada-LTS
+        tuple: (gateway, sensor, registrador) como dicionários, ou None se o
+        registrador não existir.
+    """
+    no_data = "sem dados"
+    if protocol == "DNP3":
+        
+        # Registrador, equipamento e gateway dnp3
+        result_datapoints = snapshot.datapoint("dnp3", xid_sensor_param)
+        xid_eqp = no_data if not result_datapoints else result_datapoints.xid_equip
+        
+        result_datasource_dnp3 = snapshot.equipment("dnp3", xid_eqp)
+        xid_gtw = no_data if not result_datasource_dnp3 else result_datasource_dnp3.xid_gateway
+        result_cma_gateway = snapshot.gateway(xid_gtw)
+
+        # Coletando variáveis de interesse DATA GATEWAY
+        gateway_id = no_data if not result_cma_gateway else result_cma_gateway.xid_gateway
+        subestacao = no_data if not result_cma_gateway else result_cma_gateway.subestacao
+        regional = no_data if not result_cma_gateway else result_cma_gateway.regional
+        host_gateway = no_data if not result_cma_gateway else result_cma_gateway.host
+        status_gateway = no_data if not result_cma_gateway else result_cma_gateway.status
+        gtw_id = no_data if not result_cma_gateway else result_cma_gateway.id_gtw
+        sub_id = no_data if not result_cma_gateway else result_cma_gateway.id_sub
+
+        # Coletando variáveis de interesse DATASOURCE DNP 3
+        xid_equip = no_data if not result_datasource_dnp3 else result_datasource_dnp3.xid_equip
+        fabricante = no_data if not result_datasource_dnp3 else result_datasource_dnp3.fabricante
+        marca = no_data if not result_datasource_dnp3 else result_datasource_dnp3.marca
+        modelo = no_data if not result_datasource_dnp3 else result_datasource_dnp3.modelo
+        type_ = no_data if not result_datasource_dnp3 else result_datasource_dnp3.type
+        sap_id = no_data if not result_datasource_dnp3 else result_datasource_dnp3.sap_id
+        status_datasource = no_data if not result_datasource_dnp3 else result_datasource_dnp3.enabled
+        host_datasource = no_data if not result_datasource_dnp3 else result_datasource_dnp3.host
+        type_sen_type = type_
+        model_sen_model = modelo
+        # Campos sem coluna nas tabelas DNP3 (enviados como null)
+        id_hdw_id = None
+        name_hdw_name = None
+        name_sen_name = None
+        id_man_id = None
+        
+        # Coletando variáveis de interesse DATAPOINTS DNP3 IP
+        xid_sensor = no_data if not result_datapoints else result_datapoints.xid_sensor
+        registrador = no_data if not result_datapoints else result_datapoints.index
+        nome = no_data if not result_datapoints else result_datapoints.nome
+        tipo = no_data if not result_datapoints else result_datapoints.tipo
+        classificacao = no_data if not result_datapoints else result_datapoints.classificacao
+        status_datapoints = no_data if not result_datapoints else result_datapoints.enabled
+        register_type_reg = classificacao
+        sensor_type_reg = tipo
+        # Campos sem coluna nas tabelas DNP3 (enviados como null)
+        phase_reg = None
+        circuitBreakerManeuverType_reg = None
+        bushingSide_reg = None
+        register_type_id_reg = None
+        sensor_type_id_reg = None
+        
+
+    elif protocol == "MODBUS":
+        
+        # Registrador, equipamento e gateway modbus
+        result_datapoints = snapshot.datapoint("modbus", xid_sensor_param)
+        xid_eqp = no_data if not result_datapoints else result_datapoints.xid_equip
+
+        result_datasource_modbus_ip = snapshot.equipment("modbus", xid_eqp)
+        xid_gtw = no_data if not result_datasource_modbus_ip else result_datasource_modbus_ip.xid_gateway
+        result_cma_gateway = snapshot.gateway(xid_gtw)
+
+        # Coletando variáveis de interesse DATA GATEWAY
+        gateway_id = no_data if not result_cma_gateway else result_cma_gateway.xid_gateway
+        subestacao = no_data if not result_cma_gateway else result_cma_gateway.subestacao
+        regional = no_data if not result_cma_gateway else result_cma_gateway.regional
+        host_gateway = no_data if not result_cma_gateway else result_cma_gateway.host
+        gtw_id = no_data if not result_cma_gateway else result_cma_gateway.id_gtw
+        sub_id = no_data if not result_cma_gateway else result_cma_gateway.id_sub 
+        
+
+        # Coletando variáveis de interesse DATASOURCE MODBUS IP
+        xid_equip = no_data if not result_datasource_modbus_ip else result_datasource_modbus_ip.xid_equip
+        fabricante = no_data if not result_datasource_modbus_ip else result_datasource_modbus_ip.fabricante
+        sap_id = no_data if not result_datasource_modbus_ip else result_datasource_modbus_ip.sap_id
+        host_datasource = no_data if not result_datasource_modbus_ip else result_datasource_modbus_ip.host
+        id_hdw_id = no_data if not result_datasource_modbus_ip else result_datasource_modbus_ip.id_hdw
+        name_hdw_name = no_data if not result_datasource_modbus_ip else result_datasource_modbus_ip.name_hdw
+        type_sen_type = no_data if not result_datasource_modbus_ip else result_datasource_modbus_ip.type
+        model_sen_model = no_data if not result_datasource_modbus_ip else result_datasource_modbus_ip.model_sen
+        name_sen_name = no_data if not result_datasource_modbus_ip else result_datasource_modbus_ip.name_sen
+        id_man_id = no_data if not result_datasource_modbus_ip else result_datasource_modbus_ip.id_man
+
+        # Coletando variáveis de interesse DATAPOINTS MODBUS IP
+        xid_sensor = no_data if not result_datapoints else result_datapoints.xid_sensor
+        registrador = no_data if not result_datapoints else result_datapoints.offset
+        nome = no_data if not result_datapoints else result_datapoints.nome
+        phase_reg= no_data if not result_datapoints else result_datapoints.phase
+        circuitBreakerManeuverType_reg = no_data if not result_datapoints else result_datapoints.circuitBreakerManeuverType_reg_mod
+        bushingSide_reg = no_data if not result_datapoints else result_datapoints.bushingSide
+        register_type_id_reg = no_data if not result_datapoints else result_datapoints.id_reg_reg_mod
+        register_type_reg = no_data if not result_datapoints else result_datapoints.classificacao
+        sensor_type_id_reg = no_data if not result_datapoints else result_datapoints.id_sen_reg_mod
+        sensor_type_reg = no_data if not result_datapoints else result_datapoints.tipo
+
+    if xid_sensor == no_data:
+        return None
+
+    gateway = {
+        "timestamp":TIMESTAMP_SLOT,
+        "gateway_id": gtw_id,
+        "gateway_name":gateway_id,
+        "gateway_ip":host_gateway,
+        "SE_id":sub_id,
+        "SE":subestacao,
+        "SE_Region":regional
+    }
+    sensor = {
+        "hardware_id": id_hdw_id,
+        "hardware_name": name_hdw_name,
+        "sap_id": sap_id,
+        "type": type_sen_type,
+        "model": model_sen_model,
+        "sensor_id":xid_equip,
+        "sensor_name": name_sen_name,
+        "sensor_ip":host_datasource,
+        "sensor_protocol": protocol,
+        "manufacturer_id": id_man_id,
+        "manufacturer_name": fabricante,
+        "sensor_tags": dict(snapshot.tags_of_equipment(xid_eqp))
+    }
+    register = {
+        "register_id": xid_sensor,
+        "register_name": nome,
+        "register": registrador,
+        "phase":phase_reg,
+        "circuitBreakerManeuverType":circuitBreakerManeuverType_reg,
+        "bushingSide":bushingSide_reg,
+        "register_type_id":register_type_id_reg,
+        "register_type":register_type_reg,
+        "sensor_type_id":sensor_type_id_reg,
+        "sensor_type":sensor_type_reg,                                
+        "register_tags": dict(snapshot.tags_of_datapoint(xid_sensor)),
+        "register_value": VALUE_SLOT,
+    }
+    return gateway, sensor, register
+
+
+def build_payload_template(snapshot, protocol, xid_sensor_param):
+
+    """Documento do payload de um registrador (modo register): gateway, equipamento e o registrador."""
+
+    parts = build_payload_parts(snapshot, protocol, xid_sensor_param)
+    if parts is None:
+        return None
+    gateway, sensor, register = parts
+    return {"gateways": [gateway], "sensors": [sensor], "registers": [register]}
+
+
+def build_register_template(snapshot, protocol, xid_sensor_param):
+
+    """Bloco de um registrador dentro do array `registers` (modo equipment)."""
+
+    parts = build_payload_parts(snapshot, protocol, xid_sensor_param)
+    return None if parts is None else parts[2]
+
+
+def build_equipment_template(snapshot, protocol, xid_equip):
+
+    """
+    Documento do payload de um equipamento (modo equipment): gateway e
+    equipamento uma única vez e `registers` como campo variável.
+    """
+
+    xid_sensors = snapshot.sensors_of(protocol, xid_equip)
+    parts = build_payload_parts(snapshot, protocol, xid_sensors[0]) if xid_sensors else None
+    if parts is None:
+        return None
+    gateway, sensor, _ = parts
+    return {"gateways": [gateway], "sensors": [sensor], "registers": REGISTERS_SLOT}
+
+
+# Payloads pré-serializados por registrador e por equipamento, remontados quando a configuração muda
+payload_templates = TemplateCache(build_payload_template)
+register_templates = TemplateCache(build_register_template)
+equipment_templates = TemplateCache(build_equipment_template)
+
+
+def load_equipment_config(protocol, xid_equip):
+
     """
-    session = SessionLocal()
+    Configuração de um equipamento para um ciclo de leitura.
 
+    Com CONFIG_SNAPSHOT_ENABLED vem da cópia em memória; sem ela, é lida do
+    banco em poucas consultas em conjunto (`dataaccess.load_equipments`),
+    qualquer que seja a quantidade de registradores do equipamento.
+
+    Args:
+        protocol (str): "modbus" ou "dnp3".
+        xid_equip (str): Xid do equipamento.
+
+    Returns:
+        ConfigSnapshot: Configuração (completa ou só do equipamento), ou None em caso de erro.
+    """
     try:
-        no_data = "sem dados"
-        if protocol == "DNP3":
-            
-            # Montando query datapoints dnp3
-            query_datapoints = select(datapoints_dnp3).where(datapoints_dnp3.xid_sensor == xid_sensor_param)
-            result_datapoints = session.execute(query_datapoints).scalars().first()
-            xid_eqp = no_data if not result_datapoints else result_datapoints.xid_equip
-            
-            # Montando query datasources dnp3
-            query_datasources = select(datasource_dnp3).where(datasource_dnp3.xid_equip == xid_eqp)
-            result_datasources = session.execute(query_datasources).scalars().first()
-            xid_gtw = no_data if not result_datasources else result_datasources.xid_gateway
-         
-            #Montando queries 
-            query_cma_gateway = select(cma_gateway).where(cma_gateway.xid_gateway == xid_gtw)
-            query_datasource_dnp3 = select(datasource_dnp3).where(datasource_dnp3.xid_equip == xid_eqp)
-            query_eqp_tags = select(eqp_tags).where(eqp_tags.xid_equip == xid_eqp)
-            query_dp_tags = select(dp_tags).where(dp_tags.xid_sensor == xid_sensor_param)
-
-            # resultado das queries
-            result_cma_gateway = session.execute(query_cma_gateway).scalars().first()
-            result_datasource_dnp3 = session.execute(query_datasource_dnp3).scalars().first()
-            result_eqp_tags = session.execute(query_eqp_tags).scalars().first()
-            result_dp_tags = session.execute(query_dp_tags).scalars().first()
-
-            # Coletando variáveis de interesse DATA GATEWAY
-            gateway_id = no_data if not result_cma_gateway else result_cma_gateway.xid_gateway
-            subestacao = no_data if not result_cma_gateway else result_cma_gateway.subestacao
-            regional = no_data if not result_cma_gateway else result_cma_gateway.regional
-            host_gateway = no_data if not result_cma_gateway else result_cma_gateway.host
-            status_gateway = no_data if not result_cma_gateway else result_cma_gateway.status
-
-            # Coletando variáveis de interesse DATASOURCE DNP 3
-            xid_equip = no_data if not result_datasource_dnp3 else result_datasource_dnp3.xid_equip
-            fabricante = no_data if not result_datasource_dnp3 else result_datasource_dnp3.fabricante
-            marca = no_data if not result_datasource_dnp3 else result_datasource_dnp3.marca
-            modelo = no_data if not result_datasource_dnp3 else result_datasource_dnp3.modelo
-            type_ = no_data if not result_datasource_dnp3 else result_datasource_dnp3.type
-            sap_id = no_data if not result_datasource_dnp3 else result_datasource_dnp3.sap_id
-            status_datasource = no_data if not result_datasource_dnp3 else result_datasource_dnp3.enabled
-            host_datasource = no_data if not result_datasource_dnp3 else result_datasource_dnp3.host
-            
-            # Coletando variáveis de interesse DATAPOINTS DNP3 IP
-            xid_sensor = no_data if not result_datapoints else result_datapoints.xid_sensor
-            registrador = no_data if not result_datapoints else result_datapoints.index
-            nome = no_data if not result_datapoints else result_datapoints.nome
-            tipo = no_data if not result_datapoints else result_datapoints.tipo
-            classificacao = no_data if not result_datapoints else result_datapoints.classificacao
-            status_datapoints = no_data if not result_datapoints else result_datapoints.enabled
-            
+        if CONFIG_SNAPSHOT_ENABLED:
+            return config_snapshot.current()
+        return load_equipments(protocol, [xid_equip])
+    except Exception as e:
+        logger.error(f"Erro ao carregar a configuração do equipamento {protocol} {xid_equip}: {e}")
 
-        elif protocol == "MODBUS":
-            
-           # Montando query datapoints modbus
-            query_datapoints = select(datapoints_modbus_ip).where(datapoints_modbus_ip.xid_sensor == xid_sensor_param)
-            result_datapoints = session.execute(query_datapoints).scalars().first()
-            xid_eqp = no_data if not result_datapoints else result_datapoints.xid_equip
-
-            # Montando query datasources modbus
-            query_datasources = select(datasource_modbus_ip).where(datasource_modbus_ip.xid_equip == xid_eqp)
-            result_datasources = session.execute(query_datasources).scalars().first()
-            xid_gtw = no_data if not result_datasources else result_datasources.xid_gateway
-
-            # Montando queries
-            query_cma_gateway = select(cma_gateway).where(cma_gateway.xid_gateway == xid_gtw)
-            query_datasource_modbus_ip = select(datasource_modbus_ip).where(datasource_modbus_ip.xid_equip == xid_eqp)
-            query_eqp_tags = select(eqp_tags).where(eqp_tags.xid_equip == xid_eqp)
-            query_dp_tags = select(dp_tags).where(dp_tags.xid_sensor == xid_sensor_param)
-
-            # Resultado das queries
-            result_cma_gateway = session.execute(query_cma_gateway).scalars().first()
-            result_datasource_modbus_ip = session.execute(query_datasource_modbus_ip).scalars().first()
-            result_eqp_tags = session.execute(query_eqp_tags).scalars().first()
-            result_dp_tags = session.execute(query_dp_tags).scalars().first()
-
-            # Coletando variáveis de interesse DATA GATEWAY
-            gateway_id = no_data if not result_cma_gateway else result_cma_gateway.xid_gateway
-            subestacao = no_data if not result_cma_gateway else result_cma_gateway.subestacao
-            regional = no_data if not result_cma_gateway else result_cma_gateway.regional
-            host_gateway = no_data if not result_cma_gateway else result_cma_gateway.host
-            gtw_id = no_data if not result_cma_gateway else result_cma_gateway.id_gtw
-            sub_id = no_data if not result_cma_gateway else result_cma_gateway.id_sub 
-            
 
-            # Coletando variáveis de interesse DATASOURCE MODBUS IP
-            xid_equip = no_data if not result_datasource_modbus_ip else result_datasource_modbus_ip.xid_equip
-            fabricante = no_data if not result_datasource_modbus_ip else result_datasource_modbus_ip.fabricante
-            sap_id = no_data if not result_datasource_modbus_ip else result_datasource_modbus_ip.sap_id
-            host_datasource = no_data if not result_datasource_modbus_ip else result_datasource_modbus_ip.host
-            id_hdw_id = no_data if not result_datasource_modbus_ip else result_datasource_modbus_ip.id_hdw
-            name_hdw_name = no_data if not result_datasource_modbus_ip else result_datasource_modbus_ip.name_hdw
-            type_sen_type = no_data if not result_datasource_modbus_ip else result_datasource_modbus_ip.type
-            model_sen_model = no_data if not result_datasource_modbus_ip else result_datasource_modbus_ip.model_sen
-            name_sen_name = no_data if not result_datasource_modbus_ip else result_datasource_modbus_ip.name_sen
-            id_man_id = no_data if not result_datasource_modbus_ip else result_datasource_modbus_ip.id_man
-
-            # Coletando variáveis de interesse DATAPOINTS MODBUS IP
-            xid_sensor = no_data if not result_datapoints else result_datapoints.xid_sensor
-            registrador = no_data if not result_datapoints else result_datapoints.offset
-            nome = no_data if not result_datapoints else result_datapoints.nome
-            phase_reg= no_data if not result_datapoints else result_datapoints.phase
-            circuitBreakerManeuverType_reg = no_data if not result_datapoints else result_datapoints.circuitBreakerManeuverType_reg_mod
-            bushingSide_reg = no_data if not result_datapoints else result_datapoints.bushingSide
-            register_type_id_reg = no_data if not result_datapoints else result_datapoints.id_reg_reg_mod
-            register_type_reg = no_data if not result_datapoints else result_datapoints.classificacao
-            sensor_type_id_reg = no_data if not result_datapoints else result_datapoints.id_sen_reg_mod
-            sensor_type_reg = no_data if not result_datapoints else result_datapoints.tipo
-          
-       
-        if xid_sensor != no_data:
+def process_json_datapoints(xid_sensor_param: str, protocol: str, json_data=None, config=None):
+
+    """
+    Função para geração de um Payload (arquivo JSON) de múltiplas
+    Tabelas do banco de dados
+
+    A parte fixa do payload vem de `payload_templates`; a cada leitura
+    só o valor e o timestamp são codificados.
+
+    Args:
+        xid_sensor_param (str): Valor do xid_sensor.
+        protocol (str): "modbus" ou "dnp3".
+        json_data (dict, opcional): Valor do datapoint já lido do Scada-LTS
+            (ex.: por `get_json_data_many`). Se None, o valor é lido aqui.
+        config (ConfigSnapshot, opcional): Configuração do ciclo, de
+            `load_equipment_config`. Se None, usa a cópia em memória.
+
+    Returns:
+        json: payload Json com os dados para ser enviados para Scada-LTS, ou
+        None para DNP3 sem PAYLOAD_DNP3
+    """
+    if protocol == "DNP3" and not PAYLOAD_DNP3:
+        return None
+    try:
+        template = payload_templates.get(protocol, xid_sensor_param, snapshot=config)
+        if template is not None:
+            xid_sensor = xid_sensor_param
             print("Entrando no if xid_sensor\n")
-            if get_json_data(xid_sensor) != None:
+            if json_data is None:
+                json_data = get_json_data(xid_sensor)
+            if json_data != None:
                 print("Entrando no get_json_data(xid_sensor)\n")
                 
-                extracted_value = get_json_data(xid_sensor)
-                extracted_value = parse_json_response(extracted_value, 'value') #TODO: NÃO ENVIAR DE value for null - Aluisio vai ver com Leonardo
-                tags_equipamento = no_data if not result_eqp_tags else result_eqp_tags.xid_equip
-                xid_eqp_tags = fetch_name_value_pairs(eqp_tags, 'xid_equip', tags_equipamento)
-                tag_sensor = no_data if not result_dp_tags else result_dp_tags.xid_sensor
-                xid_dp_tags = fetch_name_value_pairs(dp_tags, 'xid_sensor', tag_sensor)
+                extracted_value = parse_json_response(json_data, 'value') #TODO: NÃO ENVIAR DE value for null - Aluisio vai ver com Leonardo
                 timestamp = datetime.now().timestamp()
 
                 try:
-                    response_data = {
-                        "gateways": [  
-                            {
-                                "timestamp":timestamp,
-                                "gateway_id": gtw_id,
-                                "gateway_name":gateway_id,
-                                "gateway_ip":host_gateway,
-                                "SE_id":sub_id,
-                                "SE":subestacao,
-                                "SE_Region":regional
-                            }
-                        ],
-                        "sensors": [
-                            {
-                                "hardware_id": id_hdw_id,
-                                "hardware_name": name_hdw_name,
-                                "sap_id": sap_id,
-                                "type": type_sen_type,
-                                "model": model_sen_model,
-                                "sensor_id":xid_equip,
-                                "sensor_name": name_sen_name,
-                                "sensor_ip":host_datasource,
-                                "sensor_protocol": protocol,
-                                "manufacturer_id": id_man_id,
-                                "manufacturer_name": fabricante,
-                                "sensor_tags": xid_eqp_tags
-                            }
-                        ],
-                        "registers": [
-                            {
-                                "register_id": xid_sensor,
-                                "register_name": nome,
-                                "register": registrador,
-                                "phase":phase_reg,
-                                "circuitBreakerManeuverType":circuitBreakerManeuverType_reg,
-                                "bushingSide":bushingSide_reg,
-                                "register_type_id":register_type_id_reg,
-                                "register_type":register_type_reg,
-                                "sensor_type_id":sensor_type_id_reg,
-                                "sensor_type":sensor_type_reg,                                
-                                "register_tags": xid_dp_tags,
-                                "register_value": extracted_value,
-                            }
-                        ]
-                    }
-                    result = json.dumps(response_data, indent=4, ensure_ascii=False)
+                    result = template.render(timestamp=timestamp, register_value=extracted_value)
                     #print("result = ", result)
                 except:
                     print("Erro ao gerar JSON com dados do xid_sensor", xid_sensor)
@@ -433,11 +512,56 @@ def process_json_datapoints(xid_sensor_param: str, protocol: str):
     except Exception as e:
         logger.error(f"Erro ao gerar um Payload (JSON) de múltiplas Tabelas do banco de dados: {e}")
 
-    finally:
-        session.close()
+
+def process_equipment_payloads(xid_equip: str, protocol: str, values: dict, config=None):
+
+    """
+    Gera os payloads consolidados de um ciclo do equipamento (PAYLOAD_MODE=equipment):
+    gateway e equipamento uma única vez e os registradores lidos no array
+    `registers`, com no máximo PAYLOAD_MAX_REGISTERS registradores por payload.
+
+    Args:
+        xid_equip (str): Xid do equipamento.
+        protocol (str): "MODBUS" ou "DNP3".
+        values (dict): Valores lidos do Scada-LTS por xid_sensor
+            (`get_json_data_many`); registradores sem valor ficam de fora.
+        config (ConfigSnapshot, opcional): Configuração do ciclo, de
+            `load_equipment_config`. Se None, usa a cópia em memória.
+
+    Returns:
+        list: payloads (str) a serem enviados, vazia se não houver valores
+        (ou para DNP3 sem PAYLOAD_DNP3).
+    """
+    payloads = []
+    if protocol == "DNP3" and not PAYLOAD_DNP3:
+        return payloads
+    try:
+        snapshot = config if config is not None else config_snapshot.current()
+        envelope = equipment_templates.get(protocol, xid_equip, snapshot=snapshot)
+        if envelope is None:
+            logger.error(f"Equipamento {protocol} {xid_equip} sem configuração ou sem registradores, payload não gerado")
+            return payloads
+        registers = []
+        # Na ordem dos registradores do equipamento no banco
+        for xid_sensor in snapshot.sensors_of(protocol, xid_equip):
+            json_data = values.get(xid_sensor)
+            if json_data is None:
+                continue
+            template = register_templates.get(protocol, xid_sensor, snapshot=snapshot)
+            if template is not None:
+                registers.append(template.render(register_value=parse_json_response(json_data, 'value')))
+
+        size = max(1, PAYLOAD_MAX_REGISTERS)
+        for start in range(0, len(registers), size):
+            payloads.append(envelope.render(timestamp=datetime.now().timestamp(),
+                                            registers=json_array(registers[start:start + size], envelope.indent)))
+    except Exception as e:
+        # Com o traceback: um erro na montagem do modelo deixaria o equipamento sem envio
+        logger.exception(f"Erro ao gerar o payload consolidado do equipamento {protocol} {xid_equip}: {e}")
+    return payloads
 
 
-def send_data_to_mqtt(content_data):
+def send_data_to_mqtt(content_data, kind="sensor", source=None):
 
     """
     Função que armazena e envia um JSON para o RabbitMQ.
@@ -446,6 +570,11 @@ def send_data_to_mqtt(content_data):
     ----------
     content_data : str
         Conteúdo do JSON a ser armazenado e enviado ao RabbitMQ.
+    kind : str
+        Tipo da mensagem (sensor, status ou health), usado pela cota da fila.
+    source : str
+        xid do registrador ou do equipamento da leitura, usado pelo
+        downsample da cota da fila.
 
     Returns
     -------
@@ -456,77 +585,29 @@ def send_data_to_mqtt(content_data):
     Notes
     -----
     1. Armazena o JSON no campo content_data e False no campo sended
-    2. Percorre a tabela e envia o JSON onde sended = False.
-       Se o envio for sucesso altera o campo sended = True
+    2. O envio ao broker é feito pela thread de `outbox`, que percorre a
+       fila em páginas e remove apenas as mensagens confirmadas.
     """
     print("send_data_to_mqtt -> content_data = ", content_data)
+    if not isinstance(content_data, str):
+        # Ex.: None quando o payload não pôde ser gerado; não entra na fila
+        logger.error(f"Conteúdo inválido para a fila ({type(content_data).__name__}), mensagem descartada")
+        return {"error": f"Conteúdo inválido para a fila: {type(content_data).__name__}"}
     if  content_data == "":
         print("Nenhum conteúdo para enviar ao MQTT!")
         return
 
-    session = SessionLocal()
     try:
-        send_success = False
-        # 1 - Armazena o JSON no campo content_data
-        # e atribui False no campo sended
-        query = persistence.__table__.insert().values(
-            content_data=content_data,
-            sended=False
-        )
-        session.execute(query)
-        session.commit()  # Confirma a transação para inserir no banco
+        outbox.enqueue(content_data, kind=kind, source=source)
         print("Registro inserido na fila com sucesso!")
-
-        # 2 - Percorre a tabela e envia o JSON onde sended = False.
-        # Se o envio for sucesso altera o campo sended = True
-        query = select(persistence).where(persistence.sended == False)
-        items = session.execute(query).scalars().all()
-
-        for item in items:
-            #print(f"Enviando conteúdo: {item.content_data}")
-            print("Enviando conteúdo para mqtt...")
-
-            ntries = 3
-            current_try = 1
-            while (ntries + 1 > current_try):
-                print("Tentativa de envio", current_try, "de", ntries)
-
-                if check_rabbitmq_connection(): # Verifica se o RabbitMg está online antes de enviar
-                    print("Servidor RabbitMQ está acessível!")
-                    status = send_rabbitmq(content_data)
-                    if status:
-                        send_success = True
-                        break
-
-                else:
-                    send_success = False
-                    print("Não foi possível conectar ao servidor RabbitMQ.")
-                    logger.error("Não foi possível conectar ao servidor RabbitMQ.")
-                    current_try += 1
-                    time.sleep(2)
-
-            if send_success:
-                # Atualiza o campo sended para True
-                query = persistence.__table__.delete().where(
-                    persistence.__table__.c.id == item.id
-                )
-                result = session.execute(query)
-                session.commit()
-                if result:
-                    print("Exclusão de registro temporário concluído com sucesso!\n\n\n")
-                else:
-                    print("Falha ao excluir registro temporário!")
-
-            else:
-                print("Falha ao enviar mensagem para o MQTT. A mensagem foi guardada em fila e será enviada posteriormente!")
-
     except SQLAlchemyError as e:
-        session.rollback()  # Desfaz transações em caso de erro
         logger.error(f"Erro no banco de dados: {str(e)}")
         return {"error": f"Erro no banco de dados: {str(e)}"}
-
-    finally:
-        session.close()
+    except Exception as e:
+        # Disco cheio, erro de I/O, gravação sem resposta (TimeoutError) ou mensagem
+        # recusada: a thread do sensor continua
+        logger.error(f"Erro ao gravar na fila local: {str(e)}")
+        return {"error": f"Erro ao gravar na fila local: {str(e)}"}
 
 
 def get_periods_eqp(table_class, protocol):
@@ -547,22 +628,18 @@ def get_periods_eqp(table_class, protocol):
     Notes:
         - Para Modbus, são retornados os campos "updatePeriods" e "updatePeriodType".
         - Para DNP3, são retornados os campos "rbePollPeriods" e "eventsPeriodType".
+        - Os períodos vêm da cópia em memória da configuração (`config_snapshot`)
+          ou, sem ela, de uma única consulta.
     """
 
-    session = SessionLocal()
     try:
-        if protocol == "modbus": 
-            query = select(table_class.__table__.c["xid_equip", "updatePeriods", "updatePeriodType"])
-        elif protocol == "dnp3": 
-            query = select(table_class.__table__.c["xid_equip", "rbePollPeriods", "eventsPeriodType"])
-        else:
+        if protocol not in PERIOD_COLUMNS:
             raise ValueError("Protocolo inválido")
-        items = session.execute(query).fetchall()
-        return items
+        if not CONFIG_SNAPSHOT_ENABLED:
+            return load_periods(protocol)
+        return config_snapshot.current().periods(protocol)
     except Exception as e:
         logger.error(f"Erro ao capturar os períodos da tabela {protocol}: {e}")
-    finally:
-        session.close()
             
 
 def convert_to_seconds(time_value, unit):
@@ -587,56 +664,47 @@ def convert_to_seconds(time_value, unit):
     return time_value * conversion_factors.get(unit, 1)
 
 
-def get_xid_sensor_from_eqp_modbus(xid_equip_modbus):
+def get_xid_sensor_from_eqp_modbus(xid_equip_modbus, config=None):
 
     """
     Retorna o xid_sensor da tabela datapoints_modbus_ip com base no xid_equip_modbus.
 
     Args:
         xid_equip_modbus (str): Xid do equipamento Modbus IP.
+        config (ConfigSnapshot, opcional): Configuração já carregada para o ciclo.
 
     Returns:
         str: Xid do sensor Modbus IP.
     """
     try:
-        session = SessionLocal()
-        
-        query = select(datapoints_modbus_ip.xid_sensor).where(
-            datapoints_modbus_ip.xid_equip == xid_equip_modbus)
-        result = session.execute(query).scalars().all()
+        config = config or load_equipment_config("modbus", xid_equip_modbus)
+        result = list(config.sensors_of("modbus", xid_equip_modbus))
         print("xid_sensor modbus: ", result)
         return result
     except Exception as e:
         logger.error(
             f"Erro ao capturar o xid_sensor da tabela xid_equip_modbus_ip: {e}")
-    finally:
-        session.close()
 
 
-def get_xid_sensor_from_eqp_dnp3(xid_equip_dnp3):
+def get_xid_sensor_from_eqp_dnp3(xid_equip_dnp3, config=None):
 
     """
     Retorna o xid_sensor da tabela datapoints_dnp3 com base no xid_equip.
 
     Args:
         xid_equip_dnp3 (str): Xid do equipamento DNP3.
+        config (ConfigSnapshot, opcional): Configuração já carregada para o ciclo.
 
     Returns:
         str: Xid do sensor DNP3.
     """
 
     try:
-        session = SessionLocal()
-        query = select(datapoints_dnp3.xid_sensor).where(
-            datapoints_dnp3.xid_equip == xid_equip_dnp3)
-        result = session.execute(query).scalars().all()
-
-        return result
+        config = config or load_equipment_config("dnp3", xid_equip_dnp3)
+        return list(config.sensors_of("dnp3", xid_equip_dnp3))
     except Exception as e:
         logger.error(
             f"Erro ao capturar o xid_sensor da tabela datapoints_dnp3: {e}")
-    finally:
-        session.close()
 
 
 def execute_sensors_modbus(xid_modbus, interval, stop_event):
@@ -660,17 +728,30 @@ def execute_sensors_modbus(xid_modbus, interval, stop_event):
                 print(f"Thread de envio xid_sensor modbus:{xid_modbus} finalizada.")
                 return  # Sai imediatamente se o evento foi acionado
             time.sleep(0.1)
-        if STATUS_SCADA == "ONLINE":
+        if scada_breaker.is_available():
             print(f"\nEnviando para MQTT dados xid_sensor mdbus:{xid_modbus} a cada {interval/60} minuto(s)")
-            list_xid_sensor_modbus = get_xid_sensor_from_eqp_modbus(xid_modbus)
+            # Configuração do equipamento uma vez por ciclo, para todos os registradores
+            config_modbus = load_equipment_config("modbus", xid_modbus)
+            list_xid_sensor_modbus = get_xid_sensor_from_eqp_modbus(xid_modbus, config_modbus) or []
             
             agora = datetime.now()
             print(agora.strftime("%Y-%m-%d %H:%M:%S"))  # Exemplo: 2025-03-16 14:32:15
+            values_modbus = get_json_data_many(list_xid_sensor_modbus)
             for xid_sensor_modbus in list_xid_sensor_modbus:
+                if values_modbus.get(xid_sensor_modbus) is None:
+                    print("Erro ao obter dados do xid_sensor", xid_sensor_modbus, "no Sacada-LTS!")
+                    logger.error(f"Erro ao obter dados do xid_sensor {xid_sensor_modbus} no Sacada-LTS!")
+                    continue
+                if PAYLOAD_MODE == "equipment":
+                    continue
                 print("Enviando para mqtt dados do sensor modbus: ", xid_sensor_modbus)
-                payload = process_json_datapoints(xid_sensor_modbus, "MODBUS")
+                payload = process_json_datapoints(xid_sensor_modbus, "MODBUS", values_modbus[xid_sensor_modbus],
+                                                  config_modbus)
                 print("PAYLOAD A SER ENVIADO PARA MQTT=", payload)
-                send_data_to_mqtt(payload)
+                send_data_to_mqtt(payload, source=xid_sensor_modbus)
+            if PAYLOAD_MODE == "equipment":
+                for payload in process_equipment_payloads(xid_modbus, "MODBUS", values_modbus, config_modbus):
+                    send_data_to_mqtt(payload, source=xid_modbus)
 
         else:
             print(f"Comunicação com SCADA perdida ao enviar dados xid_sensor modbus:{xid_modbus}!")
@@ -689,22 +770,39 @@ def execute_sensors_dnp3(xid_dnp3, interval, stop_event):
         interval (float): Intervalo de envio dos dados em segundos.
         stop_event (Event): Evento de parada.
 
+    Sem PAYLOAD_DNP3 a thread não lê o Scada-LTS nem envia dados.
+
     returns:
         None
     """
+    if not PAYLOAD_DNP3:
+        logger.warning(f"Envio dos dados DNP3 desligado (PAYLOAD_DNP3), equipamento {xid_dnp3} ignorado")
     while not stop_event.is_set():
         for _ in range(int(interval * 10)):  # delay de 0.1s
             if stop_event.is_set():
                 print(f"Thread de envio xid_sensor dnp3:{xid_dnp3} finalizada.")
                 return  # Sai imediatamente se o evento foi acionado
             time.sleep(0.1)
-        if STATUS_SCADA == "ONLINE":
+        if not PAYLOAD_DNP3:
+            continue
+        if scada_breaker.is_available():
             print(f"\nEnviando para MQTT dados xid_sensor dnp3:{xid_dnp3} a cada {interval} segundo(s)")
-            list_xid_sensor_dnp3 = get_xid_sensor_from_eqp_dnp3(xid_dnp3)
+            config_dnp3 = load_equipment_config("dnp3", xid_dnp3)
+            list_xid_sensor_dnp3 = get_xid_sensor_from_eqp_dnp3(xid_dnp3, config_dnp3) or []
+            values_dnp3 = get_json_data_many(list_xid_sensor_dnp3)
             for xid_sensor_dnp3 in list_xid_sensor_dnp3:
+                if values_dnp3.get(xid_sensor_dnp3) is None:
+                    print("Erro ao obter dados do xid_sensor", xid_sensor_dnp3, "no Sacada-LTS!")
+                    logger.error(f"Erro ao obter dados do xid_sensor {xid_sensor_dnp3} no Sacada-LTS!")
+                    continue
+                if PAYLOAD_MODE == "equipment":
+                    continue
                 print("Enviando para mqtt dados do sensor dnp3: ", xid_sensor_dnp3)
-                payload = process_json_datapoints(xid_sensor_dnp3, "DNP3")
-                send_data_to_mqtt(payload)
+                payload = process_json_datapoints(xid_sensor_dnp3, "DNP3", values_dnp3[xid_sensor_dnp3], config_dnp3)
+                send_data_to_mqtt(payload, source=xid_sensor_dnp3)
+            if PAYLOAD_MODE == "equipment":
+                for payload in process_equipment_payloads(xid_dnp3, "DNP3", values_dnp3, config_dnp3):
+                    send_data_to_mqtt(payload, source=xid_dnp3)
         else:
             print(f"Comunicação com SCADA perdida ao enviar dados xid_sensor DNP3:{xid_dnp3}!")
             logger.error(f"Comunicação com SCADA perdida ao enviar dados xid_sensor DNP3:{xid_dnp3}!")
@@ -719,19 +817,25 @@ def thr_check_server_online(host: str, port: int, servername: str):
     Verifica se o servidor especificado pela variável `host` e `port` está online ou offline.
     Se o servidor estiver online, muda o valor da variável STATUS_CMA ou STATUS_SCADA para "ONLINE".
     Se o servidor estiver offline, muda o valor da variável STATUS_CMA ou STATUS_SCADA para "OFFLINE".
+
+    Para o Scada-LTS, a falha de conexão é registrada no circuit breaker
+    (`scada_breaker`) e, com o circuito aberto, o status é "OFFLINE" e a
+    autenticação não é tentada.
     """
     print(f"Iniciando verificação de status do servidor {host}:{port} ...")
     while True:
+        STATUS_AUTH_SCADA = False
         try:
             
             global STATUS_SCADA
             global service_status
             with socket.create_connection((host, port), timeout=5):
                 if port == 8080:
-                    STATUS_SCADA = "ONLINE"
+                    STATUS_SCADA = "ONLINE" if scada_breaker.is_available() else "OFFLINE"
                 service_status["is_running"] = True
         except (socket.timeout, ConnectionRefusedError):
             if port == 8080:
+                scada_breaker.record_failure()
                 STATUS_SCADA = "OFFLINE"
             service_status["is_running"] = False
 
@@ -739,23 +843,26 @@ def thr_check_server_online(host: str, port: int, servername: str):
         if conexao == "OFFLINE":
             logger.error(f"Servidor {servername} está offline!")
 
-        if conexao == "ONLINE":
-            STATUS_AUTH_SCADA = auth_ScadaLTS()
+        # Sessão conferida no servidor a cada verificação, sem novo login se ainda for aceita
+        if conexao == "ONLINE" and scada_breaker.is_available():
+            STATUS_AUTH_SCADA = auth_ScadaLTS(validate=True)
     
         print("\n=====   CONEXÃO COM SCADA    =====")
         print("["+servername+"]:", conexao)
         print("Status de autenticação com SCADA:", STATUS_AUTH_SCADA)
+        print("Circuito do SCADA:", scada_breaker.state)
         print("\n")
 
         payload = {
             "scada_lts": {
                 "status_conexao": STATUS_SCADA,
-                "status_autenticacao": STATUS_AUTH_SCADA
+                "status_autenticacao": STATUS_AUTH_SCADA,
+                "status_circuito": scada_breaker.state
             }
         }
 
         payload = json.dumps(payload, indent=4, ensure_ascii=False)
-        send_data_to_mqtt(payload)
+        send_data_to_mqtt(payload, kind="status")
                     
         time.sleep(int(STATUS_SERVER_CHECK_INTERVAL))
 
@@ -837,6 +944,9 @@ def start_main_threads():
         active_threads["process_scada"] = process_scada  # Armazena a referência da thread
         process_scada.start()
     '''
+    """Inicia o envio da fila local (PERSISTENCE) para o broker"""
+    outbox.start()
+
     """Inicia os processos para monitorar o sistema (health check)"""
     if "health_checker" not in active_threads:
         health_checker = threading.Thread(target=thr_get_system_info, args=(), daemon = True)
@@ -8,11 +8,13 @@
 # #############################################################
 #from pydantic import  Field
 from databases import Database
-from sqlalchemy import create_engine, Column, Integer, String, event, Boolean, Float
+from sqlalchemy import create_engine, Column, Index, Integer, String, event, Boolean, Float, inspect, text
 #from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.orm import sessionmaker, declarative_base, scoped_session
 from dotenv import load_dotenv
 import os
+import time
+from events import EVENT_BUS_ENABLED, change_events
 
 # Carregando as variáveis de ambiente do arquivo .env
 load_dotenv()
@@ -20,43 +22,75 @@ load_dotenv()
 # Configuração do banco de dados
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+
+def queue_database_url(url):
+    """Banco da fila ao lado do banco de configuração: CMA_Gateway.db -> CMA_Gateway_queue.db."""
+    root, ext = os.path.splitext(url)
+    return f"{root}_queue{ext or '.db'}"
+
+
+# Banco da fila de mensagens (tabela PERSISTENCE), separado do banco de configuração
+QUEUE_DATABASE_URL = os.getenv("QUEUE_DATABASE_URL") or queue_database_url(DATABASE_URL)
+
+# Pragmas do SQLite aplicados a cada conexão dos dois bancos
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", 64 * 1024 * 1024))
+SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", -8000))
+SQLITE_BUSY_TIMEOUT = int(os.getenv("SQLITE_BUSY_TIMEOUT", 5000))
+
+# Ajusta na inicialização os índices de bancos criados por versões anteriores
+SQLITE_MIGRATE_INDEXES = os.getenv("SQLITE_MIGRATE_INDEXES", "true").lower() == "true"
+
+
+def create_sqlite_engine(url, incremental_vacuum=False):
+    """
+    Cria o engine com os pragmas de SQLITE_* em cada conexão.
+
+    Com `incremental_vacuum` o banco é criado com auto_vacuum incremental
+    (só tem efeito em banco novo, antes da criação das tabelas).
+    """
+    sqlite_engine = create_engine(url, connect_args={"check_same_thread": False,
+                                                     "timeout": SQLITE_BUSY_TIMEOUT / 1000.0})
+
+    @event.listens_for(sqlite_engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if incremental_vacuum:
+            cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        cursor.execute(f"PRAGMA journal_mode = {SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous = {SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA mmap_size = {SQLITE_MMAP_SIZE}")
+        cursor.execute(f"PRAGMA cache_size = {SQLITE_CACHE_SIZE}")
+        cursor.execute(f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT}")
+        cursor.close()
+
+    return sqlite_engine
+
+
 # Configuração do SQLite e SQLAlchemy
 database = Database(DATABASE_URL)
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+engine = create_sqlite_engine(DATABASE_URL)
 Base = declarative_base()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-# Função para disparar mensagens
-def trigger_message(operation, target):
-    print(f"A operação '{operation}' foi realizada no item: {target}")
+queue_engine = create_sqlite_engine(QUEUE_DATABASE_URL, incremental_vacuum=True)
+QueueBase = declarative_base()
+QueueSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=queue_engine)
+QueueSession = scoped_session(QueueSessionLocal)
 
 ###########################################################
 ##################### CMA GATEWAY #########################
 ###########################################################
 class cma_gateway(Base):
     __tablename__ = "CMA_GD"
-    xid_gateway = Column(String, primary_key=True, index=True)
-    subestacao = Column(String, index=True)
-    regional = Column(String, index=True)
-    host = Column(String, index=True)
-    status = Column(Boolean, index=True)
-    id_gtw = Column(Integer, index=True)
-    id_sub = Column(Integer, index=True)
-
-
-
-# Eventos do SQLAlchemy para capturar alterações
-@event.listens_for(cma_gateway, "after_insert")
-def after_insert(mapper, connection, target):
-    trigger_message("inclusão", target)
-
-@event.listens_for(cma_gateway, "after_update")
-def after_update(mapper, connection, target):
-    trigger_message("atualização", target)
-
-@event.listens_for(cma_gateway, "after_delete")
-def after_delete(mapper, connection, target):
-    trigger_message("deleção", target)
+    xid_gateway = Column(String, primary_key=True)
+    subestacao = Column(String)
+    regional = Column(String)
+    host = Column(String)
+    status = Column(Boolean)
+    id_gtw = Column(Integer)
+    id_sub = Column(Integer)
 
 
 ###########################################################
@@ -64,43 +98,29 @@ def after_delete(mapper, connection, target):
 ###########################################################
 class datasource_modbus_ip(Base):
     __tablename__ = "EQP_MODBUS_IP"
-    xid_equip = Column(String, primary_key=True, index=True)
-    xid_gateway = Column(String, index=True)
-    fabricante = Column(String, index=True)
-    marca = Column(String, index=True)
-    modelo = Column(String, index=True)
-    #type = Column(String, index=True)
-    sap_id = Column(String, index=True)
-    enabled = Column(Boolean, index=True)
-    updatePeriodType = Column(String, index=True)
-    maxReadBitCount = Column(Integer, index=True)
-    maxReadRegisterCount = Column(Integer, index=True)
-    maxWriteRegisterCount = Column(Integer, index=True)
-    host = Column(String, index=True)
-    port = Column(Integer, index=True)
-    retries = Column(Integer, index=True)
-    timeout = Column(Integer, index=True)
-    updatePeriods = Column(Integer, index=True)
-    id_hdw = Column(Integer, index=True)
-    name_hdw = Column(String, index=True)
-    type = Column(String, index=True)
-    model_sen = Column(String, index=True)
-    name_sen = Column(String, index=True)
-    id_man = Column(Integer, index=True)
-
-
-# Eventos do SQLAlchemy para capturar alterações
-@event.listens_for(datasource_modbus_ip, "after_insert")
-def after_insert(mapper, connection, target):
-    trigger_message("inclusão", target)
-
-@event.listens_for(datasource_modbus_ip, "after_update")
-def after_update(mapper, connection, target):
-    trigger_message("atualização", target)
-
-@event.listens_for(datasource_modbus_ip, "after_delete")
-def after_delete(mapper, connection, target):
-    trigger_message("deleção", target)
+    xid_equip = Column(String, primary_key=True)
+    xid_gateway = Column(String)
+    fabricante = Column(String)
+    marca = Column(String)
+    modelo = Column(String)
+    #type = Column(String)
+    sap_id = Column(String)
+    enabled = Column(Boolean)
+    updatePeriodType = Column(String)
+    maxReadBitCount = Column(Integer)
+    maxReadRegisterCount = Column(Integer)
+    maxWriteRegisterCount = Column(Integer)
+    host = Column(String)
+    port = Column(Integer)
+    retries = Column(Integer)
+    timeout = Column(Integer)
+    updatePeriods = Column(Integer)
+    id_hdw = Column(Integer)
+    name_hdw = Column(String)
+    type = Column(String)
+    model_sen = Column(String)
+    name_sen = Column(String)
+    id_man = Column(Integer)
 
 
 ###########################################################
@@ -108,39 +128,27 @@ def after_delete(mapper, connection, target):
 ###########################################################
 class datapoints_modbus_ip(Base):
     __tablename__ = "DP_MODBUS_IP"
-    xid_sensor = Column(String, primary_key=True, index=True)
-    xid_equip = Column(String, index=True)
-    range = Column(String, index=True)
-    modbusDataType = Column(String, index=True)
-    additive = Column(Integer, index=True)
-    offset = Column(Integer, index=True)
-    bit = Column(Integer, index=True)
-    multiplier = Column(Float, index=True)
-    slaveId = Column(Integer, index=True)
-    enabled = Column(Boolean, index=True)
-    nome = Column(String, index=True)
-    tipo = Column(String, index=True)
-    classificacao = Column(String, index=True)
-    phase = Column(String, index=True)
-    circuitBreakerManeuverType_reg_mod = Column(String, index=True)
-    bushingSide = Column(String, index=True)
-    id_reg_reg_mod = Column(Integer, index=True)
-    id_sen_reg_mod = Column(Integer, index=True)
-
-
-
-# Eventos do SQLAlchemy para capturar alterações
-@event.listens_for(datapoints_modbus_ip, "after_insert")
-def after_insert(mapper, connection, target):
-    trigger_message("inclusão", target)
-
-@event.listens_for(datapoints_modbus_ip, "after_update")
-def after_update(mapper, connection, target):
-    trigger_message("atualização", target)
-
-@event.listens_for(datapoints_modbus_ip, "after_delete")
-def after_delete(mapper, connection, target):
-    trigger_message("deleção", target)
+    xid_sensor = Column(String, primary_key=True)
+    xid_equip = Column(String)
+    range = Column(String)
+    modbusDataType = Column(String)
+    additive = Column(Integer)
+    offset = Column(Integer)
+    bit = Column(Integer)
+    multiplier = Column(Float)
+    slaveId = Column(Integer)
+    enabled = Column(Boolean)
+    nome = Column(String)
+    tipo = Column(String)
+    classificacao = Column(String)
+    phase = Column(String)
+    circuitBreakerManeuverType_reg_mod = Column(String)
+    bushingSide = Column(String)
+    id_reg_reg_mod = Column(Integer)
+    id_sen_reg_mod = Column(Integer)
+
+    # Sensores de um equipamento (coleta e status por equipamento)
+    __table_args__ = (Index("ix_DP_MODBUS_IP_xid_equip_enabled", "xid_equip", "enabled"),)
 
 
 ###########################################################
@@ -148,38 +156,23 @@ def after_delete(mapper, connection, target):
 ###########################################################
 class datasource_dnp3(Base):
     __tablename__ = "EQP_DNP3"
-    xid_equip = Column(String, primary_key=True, index=True)
-    xid_gateway = Column(String, index=True)
-    fabricante = Column(String, index=True)
-    marca = Column(String, index=True)
-    modelo = Column(String, index=True)
-    type = Column(String, index=True)
-    sap_id = Column(String, index=True)
-    enabled = Column(Boolean, index=True)
-    eventsPeriodType = Column(String, index=True)
-    host = Column(String, index=True)
-    port = Column(Integer, index=True)
-    rbePollPeriods = Column(Integer, index=True)
-    retries = Column(Integer, index=True)
-    slaveAddress = Column(Integer, index=True)
-    sourceAddress = Column(Integer, index=True)
-    staticPollPeriods = Column(Integer, index=True)
-    timeout = Column(Integer, index=True)
-
-
-
-# Eventos do SQLAlchemy para capturar alterações
-@event.listens_for(datasource_dnp3, "after_insert")
-def after_insert(mapper, connection, target):
-    trigger_message("inclusão", target)
-
-@event.listens_for(datasource_dnp3, "after_update")
-def after_update(mapper, connection, target):
-    trigger_message("atualização", target)
-
-@event.listens_for(datasource_dnp3, "after_delete")
-def after_delete(mapper, connection, target):
-    trigger_message("deleção", target)
+    xid_equip = Column(String, primary_key=True)
+    xid_gateway = Column(String)
+    fabricante = Column(String)
+    marca = Column(String)
+    modelo = Column(String)
+    type = Column(String)
+    sap_id = Column(String)
+    enabled = Column(Boolean)
+    eventsPeriodType = Column(String)
+    host = Column(String)
+    port = Column(Integer)
+    rbePollPeriods = Column(Integer)
+    retries = Column(Integer)
+    slaveAddress = Column(Integer)
+    sourceAddress = Column(Integer)
+    staticPollPeriods = Column(Integer)
+    timeout = Column(Integer)
 
 
 ###########################################################
@@ -187,32 +180,20 @@ def after_delete(mapper, connection, target):
 ###########################################################
 class datapoints_dnp3(Base):
     __tablename__ = "DP_DNP3"
-    xid_sensor = Column(String, primary_key=True, index=True)
-    xid_equip = Column(String, index=True)
-    dnp3DataType = Column(Integer, index=True)
-    controlCommand = Column(Integer, index=True)
-    index = Column(Integer, index=True)
-    timeoff = Column(Integer, index=True)
-    timeon = Column(Integer, index=True)
-    enabled = Column(Boolean, index=True)
-    nome = Column(String, index=True)
-    tipo = Column(String, index=True)
-    classificacao = Column(String, index=True)
-    
-
-
-# Eventos do SQLAlchemy para capturar alterações
-@event.listens_for(datapoints_dnp3, "after_insert")
-def after_insert(mapper, connection, target):
-    trigger_message("inclusão", target)
-
-@event.listens_for(datapoints_dnp3, "after_update")
-def after_update(mapper, connection, target):
-    trigger_message("atualização", target)
-
-@event.listens_for(datapoints_dnp3, "after_delete")
-def after_delete(mapper, connection, target):
-    trigger_message("deleção", target)
+    xid_sensor = Column(String, primary_key=True)
+    xid_equip = Column(String)
+    dnp3DataType = Column(Integer)
+    controlCommand = Column(Integer)
+    index = Column(Integer)
+    timeoff = Column(Integer)
+    timeon = Column(Integer)
+    enabled = Column(Boolean)
+    nome = Column(String)
+    tipo = Column(String)
+    classificacao = Column(String)
+
+    # Sensores de um equipamento (coleta e status por equipamento)
+    __table_args__ = (Index("ix_DP_DNP3_xid_equip_enabled", "xid_equip", "enabled"),)
 
 
 ###########################################################
@@ -220,24 +201,12 @@ def after_delete(mapper, connection, target):
 ###########################################################
 class eqp_tags(Base):
     __tablename__ = "EQP_TAGS"
-    id = Column(Integer, primary_key=True, index=True)
-    xid_equip = Column(String, index=True)
-    nome = Column(String, index=True)
-    valor = Column(String, index=True)
-
+    id = Column(Integer, primary_key=True)
+    xid_equip = Column(String)
+    nome = Column(String)
+    valor = Column(String)
 
-# Eventos do SQLAlchemy para capturar alterações
-@event.listens_for(eqp_tags, "after_insert")
-def after_insert(mapper, connection, target):
-    trigger_message("inclusão", target)
-
-@event.listens_for(eqp_tags, "after_update")
-def after_update(mapper, connection, target):
-    trigger_message("atualização", target)
-
-@event.listens_for(eqp_tags, "after_delete")
-def after_delete(mapper, connection, target):
-    trigger_message("deleção", target)
+    __table_args__ = (Index("ix_EQP_TAGS_xid_equip", "xid_equip"),)
 
 
 ###########################################################
@@ -245,48 +214,160 @@ def after_delete(mapper, connection, target):
 ###########################################################
 class dp_tags(Base):
     __tablename__ = "DP_TAGS"
-    id = Column(Integer, primary_key=True, index=True)
-    xid_sensor = Column(String, index=True)
-    nome = Column(String, index=True)
-    valor = Column(String, index=True)
-
-
-# Eventos do SQLAlchemy para capturar alterações
-@event.listens_for(dp_tags, "after_insert")
-def after_insert(mapper, connection, target):
-    trigger_message("inclusão", target)
-
-@event.listens_for(dp_tags, "after_update")
-def after_update(mapper, connection, target):
-    trigger_message("atualização", target)
-
-@event.listens_for(dp_tags, "after_delete")
-def after_delete(mapper, connection, target):
-    trigger_message("deleção", target)
+    id = Column(Integer, primary_key=True)
+    xid_sensor = Column(String)
+    nome = Column(String)
+    valor = Column(String)
 
+    __table_args__ = (Index("ix_DP_TAGS_xid_sensor", "xid_sensor"),)
 
 
 ###########################################################
 ####################### PERSISTENCE #####################
 ###########################################################
-class persistence(Base):
+class persistence(QueueBase):
     __tablename__ = "PERSISTENCE"
-    id = Column(Integer, primary_key=True, index=True)
-    content_data = Column(String, index=True)
-    sended = Column(Boolean, index=True)
+    id = Column(Integer, primary_key=True)
+    content_data = Column(String)
+    sended = Column(Boolean)
+    created_at = Column(Integer)  # Epoch (s) em que a mensagem entrou na fila
+    kind = Column(String)  # sensor, status ou health
+    source = Column(String)  # xid do registrador ou do equipamento que gerou a leitura (sensor)
+
+    # Leitura por faixa (kind, id) e descarte por idade
+    __table_args__ = (Index("ix_PERSISTENCE_kind_id", "kind", "id"),
+                      Index("ix_PERSISTENCE_created_at", "created_at"))
 
 
 # Eventos do SQLAlchemy para capturar alterações
-@event.listens_for(persistence, "after_insert")
-def after_insert(mapper, connection, target):
-    trigger_message("inclusão", target)
-
-@event.listens_for(persistence, "after_update")
-def after_update(mapper, connection, target):
-    trigger_message("atualização", target)
-
-@event.listens_for(persistence, "after_delete")
-def after_delete(mapper, connection, target):
-    trigger_message("deleção", target)
-    
+def watch_changes(model, bus=change_events):
+    """Publica no barramento de eventos as inclusões, atualizações e deleções de `model`."""
+    table = model.__table__.name
+
+    def listener(operation):
+        def publish(mapper, connection, target):
+            if bus.active:
+                bus.publish(operation, table, mapper.primary_key_from_instance(target))
+        return publish
+
+    event.listen(model, "after_insert", listener("inclusão"))
+    event.listen(model, "after_update", listener("atualização"))
+    event.listen(model, "after_delete", listener("deleção"))
+
+
+# Só os modelos de configuração: a fila (PERSISTENCE) é gravada com
+# comandos em lote, que não passam pelos eventos do ORM
+if EVENT_BUS_ENABLED:
+    for mapper in Base.registry.mappers:
+        watch_changes(mapper.class_)
+
 Base.metadata.create_all(bind=engine)
+QueueBase.metadata.create_all(bind=queue_engine)
+
+
+def add_missing_columns(table, bind):
+    """Acrescenta a uma tabela já existente as colunas novas do modelo."""
+    existing = {column["name"] for column in inspect(bind).get_columns(table.name)}
+    with bind.begin() as connection:
+        for column in table.columns:
+            if column.name not in existing:
+                column_type = column.type.compile(bind.dialect)
+                connection.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}'))
+
+
+def move_legacy_queue(chunk_size=5000):
+    """
+    Move para o banco da fila as mensagens que versões anteriores deixaram na
+    tabela PERSISTENCE do banco de configuração.
+
+    Mensagens sem `created_at`/`kind` (anteriores à cota da fila) entram com o
+    horário da migração e o tipo sensor, para que as regras de idade e de
+    descarte da cota também se apliquem a elas.
+    """
+    if str(queue_engine.url) == str(engine.url):
+        return 0
+    if persistence.__tablename__ not in inspect(engine).get_table_names():
+        return 0
+    moved = 0
+    table = persistence.__table__
+    columns = {column["name"] for column in inspect(engine).get_columns(table.name)}
+    created_at = "created_at" if "created_at" in columns else "NULL"
+    kind = "kind" if "kind" in columns else "NULL"
+    migrated_at = int(time.time())
+    while True:
+        with engine.begin() as source:
+            rows = source.execute(text(
+                f'SELECT id, content_data, {created_at} AS created_at, {kind} AS kind FROM "{table.name}" '
+                f'ORDER BY id LIMIT {int(chunk_size)}')).all()
+            if not rows:
+                break
+            with queue_engine.begin() as target:
+                target.execute(table.insert(), [{"content_data": row.content_data, "sended": False,
+                                                 "created_at": row.created_at or migrated_at,
+                                                 "kind": row.kind or "sensor"}
+                                                for row in rows])
+            source.execute(text(f'DELETE FROM "{table.name}" WHERE id <= :last'), {"last": rows[-1].id})
+        moved += len(rows)
+    if moved:
+        print(f"{moved} mensagem(ns) da fila movida(s) para {QUEUE_DATABASE_URL}")
+    return moved
+
+
+def fill_queue_defaults(bind=None):
+    """
+    Preenche `created_at` (horário atual) e `kind` (sensor) das mensagens da
+    fila gravadas antes dessas colunas existirem. Retorna a quantidade de
+    mensagens alteradas.
+    """
+    bind = bind if bind is not None else queue_engine
+    table = persistence.__table__
+    with bind.begin() as connection:
+        updated = connection.execute(table.update().where(table.c.created_at.is_(None))
+                                     .values(created_at=int(time.time()))).rowcount
+        updated += connection.execute(table.update().where(table.c.kind.is_(None))
+                                      .values(kind="sensor")).rowcount
+    return updated
+
+
+def migrate_indexes(bind, metadata, vacuum=False):
+    """
+    Ajusta os índices de um banco existente aos declarados nos modelos.
+
+    Versões anteriores criavam um índice `ix_<tabela>_<coluna>` para cada
+    coluna; os que não constam mais do modelo são removidos e os novos
+    criados. Os dados não são alterados. Com `vacuum` o arquivo é reescrito
+    para devolver ao disco o espaço dos índices removidos.
+
+    Retorna (índices removidos, índices criados).
+    """
+    dropped, created = [], []
+    existing_tables = set(inspect(bind).get_table_names())
+    with bind.begin() as connection:
+        for table in metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            declared = {index.name: index for index in table.indexes}
+            existing = {index["name"] for index in inspect(connection).get_indexes(table.name)}
+            for name in sorted(existing - set(declared)):
+                if name.startswith("ix_"):
+                    connection.execute(text(f'DROP INDEX IF EXISTS "{name}"'))
+                    dropped.append(name)
+            for name in sorted(set(declared) - existing):
+                declared[name].create(connection, checkfirst=True)
+                created.append(name)
+        if created:
+            connection.execute(text("ANALYZE"))
+    if vacuum:
+        with bind.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            connection.exec_driver_sql("VACUUM")
+    if dropped or created:
+        print(f"Índices de {bind.url.database}: {len(dropped)} removido(s), {len(created)} criado(s)")
+    return dropped, created
+
+
+add_missing_columns(persistence.__table__, queue_engine)
+move_legacy_queue()
+fill_queue_defaults()
+if SQLITE_MIGRATE_INDEXES:
+    migrate_indexes(engine, Base.metadata)
+    migrate_indexes(queue_engine, QueueBase.metadata)
@@ -0,0 +1,247 @@
+###############################################################
+# mqtt.py
+# ------------------------------------------------------------
+# Publicador MQTT nativo (alternativa ao AMQP do rabbitmq.py)
+# Author: Aluisio Cavalcante <aluisio@controlengenharia.eng.br>
+# novembro de 2025
+# TODOS OS DIREITOS RESERVADOS A CONTROL ENGENHARIA
+# #############################################################
+import os
+import socket
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+import paho.mqtt.client as paho
+from paho.mqtt.properties import Properties
+from paho.mqtt.packettypes import PacketTypes
+from dotenv import load_dotenv
+from logger import *
+# Carregando as variáveis de ambiente do arquivo .env
+load_dotenv()
+
+# Variáveis de configuração do MQTT
+MQTT_PORT=int(os.getenv("MQTT_PORT", 1883))
+MQTT_QOS=int(os.getenv("MQTT_QOS", 1))
+MQTT_PROTOCOL=os.getenv("MQTT_PROTOCOL", "3.1.1")
+MQTT_CLIENT_ID=os.getenv("MQTT_CLIENT_ID") or f"cma-gateway-{socket.gethostname()}"
+MQTT_CLEAN_SESSION=os.getenv("MQTT_CLEAN_SESSION", "false").lower() in ("1", "true", "sim", "yes")
+MQTT_SESSION_EXPIRY=int(os.getenv("MQTT_SESSION_EXPIRY", 86400))
+MQTT_KEEPALIVE=int(os.getenv("MQTT_KEEPALIVE", 30))
+MQTT_INFLIGHT=int(os.getenv("MQTT_INFLIGHT", 20))
+MQTT_MAX_QUEUED=int(os.getenv("MQTT_MAX_QUEUED", 1000))
+# Tópico: modelo com {topico} (RABBIT_TOPICO) e {chave} (routing key). Vazio usa a
+# routing key com "." trocado por "/", que o plugin MQTT do RabbitMQ entrega no
+# exchange amq.topic com a mesma routing key usada pelo AMQP.
+MQTT_TOPIC=os.getenv("MQTT_TOPIC", "")
+
+RABBIT_USER=os.getenv("RABBIT_USER")
+RABBIT_PASS=os.getenv("RABBIT_PASS")
+RABBIT_TOPICO=os.getenv("RABBIT_TOPICO")
+RABBIT_CHAVE=os.getenv("RABBIT_CHAVE")
+RABBIT_RECONNECT_MIN=float(os.getenv("RABBIT_RECONNECT_MIN", 1))
+RABBIT_RECONNECT_MAX=float(os.getenv("RABBIT_RECONNECT_MAX", 30))
+RABBIT_PUBLISH_TIMEOUT=float(os.getenv("RABBIT_PUBLISH_TIMEOUT", 5))
+
+
+class MqttPublisher:
+
+    """
+    Publicador MQTT (3.1.1 ou 5) com a mesma API de `RabbitPublisher`.
+
+    O cliente paho mantém uma única conexão com a sua própria thread de rede,
+    iniciada na primeira utilização, e reconecta sozinho com backoff entre
+    RABBIT_RECONNECT_MIN e RABBIT_RECONNECT_MAX segundos. Com sessão
+    persistente (MQTT_CLEAN_SESSION=false) as mensagens QoS 1 sem PUBACK são
+    reenviadas após a reconexão.
+
+    Até MQTT_INFLIGHT mensagens QoS 1 aguardam PUBACK ao mesmo tempo. O Future
+    de cada publicação é resolvido com True quando o broker confirma (QoS 1)
+    ou quando a mensagem é escrita no socket (QoS 0).
+    """
+
+    def __init__(self, host="localhost", port=MQTT_PORT, username=RABBIT_USER, password=RABBIT_PASS,
+                 topic=RABBIT_TOPICO, routing_key=RABBIT_CHAVE, qos=MQTT_QOS, protocol=MQTT_PROTOCOL,
+                 client_id=MQTT_CLIENT_ID, clean_session=MQTT_CLEAN_SESSION, topic_template=MQTT_TOPIC):
+        self.host = host
+        self.port = int(port) if port else 1883
+        self.username = username
+        self.password = password
+        self.topic = topic
+        self.routing_key = routing_key
+        self.qos = int(qos)
+        self.protocol = paho.MQTTv5 if str(protocol).startswith("5") else paho.MQTTv311
+        self.client_id = client_id
+        self.clean_session = clean_session
+        self.topic_template = topic_template
+
+        # RLock: o paho pode chamar on_publish dentro de publish na mesma thread
+        self._lock = threading.RLock()
+        self._client = None
+        self._pid = None
+        self._ready = threading.Event()
+        self._outstanding = {}
+        self._published_early = set()
+
+    # ---------------------------------------------------------
+    # API usada pelas outras threads
+    # ---------------------------------------------------------
+    def start(self):
+        """Cria o cliente e inicia a thread de rede (uma vez por processo)."""
+        with self._lock:
+            if self._client is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._ready.clear()
+            self._client = self._create_client()
+            self._client.loop_start()
+
+    def wait_ready(self, timeout=None):
+        """Aguarda a conexão estar pronta. Retorna True se pronta."""
+        self.start()
+        return self._ready.wait(timeout)
+
+    def is_connected(self):
+        return self._ready.is_set()
+
+    def is_blocked(self):
+        # O MQTT não tem controle de fluxo equivalente ao connection.blocked do AMQP
+        return False
+
+    def outstanding(self):
+        """Quantidade de mensagens publicadas aguardando PUBACK."""
+        return len(self._outstanding)
+
+    def topic_for(self, routing_key):
+        """Tópico MQTT correspondente à routing key."""
+        if self.topic_template:
+            return self.topic_template.format(topico=self.topic, chave=routing_key)
+        return routing_key.replace(".", "/")
+
+    def publish_async(self, payload, routing_key=None, properties=None):
+        """
+        Publica a mensagem e retorna imediatamente.
+
+        `properties` (pika.BasicProperties) só é aproveitado no MQTT 5, onde
+        content_type vira a propriedade Content Type da mensagem.
+
+        Returns:
+            Future: resolvido com True quando a mensagem for publicada ou
+            False se não houver conexão ou em caso de erro.
+        """
+        self.start()
+        future = Future()
+        if not self._ready.is_set():
+            future.set_result(False)
+            return future
+        topic = self.topic_for(routing_key or self.routing_key)
+        try:
+            # Fora do lock: o paho chama `_on_publish` segurando o lock interno
+            # que `publish` também usa; a confirmação que chegar antes do
+            # registro do Future fica em `_published_early`
+            info = self._client.publish(topic, payload, qos=self.qos,
+                                        properties=self._mqtt_properties(properties))
+            with self._lock:
+                if info.rc != paho.MQTT_ERR_SUCCESS:
+                    logger.error(f"Erro ao enviar dados para o MQTT: {paho.error_string(info.rc)}")
+                    future.set_result(False)
+                elif info.mid in self._published_early:
+                    self._published_early.discard(info.mid)
+                    future.set_result(True)
+                else:
+                    self._outstanding[info.mid] = future
+        except Exception as e:
+            print(f"Erro ao enviar dados para o MQTT: {e}")
+            logger.error(f"Erro ao enviar dados para o MQTT: {e}")
+            if not future.done():
+                future.set_result(False)
+        return future
+
+    def publish(self, payload, routing_key=None, properties=None, timeout=RABBIT_PUBLISH_TIMEOUT):
+        """Publica e aguarda o resultado por até `timeout` segundos."""
+        future = self.publish_async(payload, routing_key, properties)
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            return False
+
+    def close(self):
+        """Desconecta e encerra a thread de rede."""
+        with self._lock:
+            client, self._client = self._client, None
+        if client is not None:
+            client.disconnect()
+            client.loop_stop()
+        self._ready.clear()
+        self._fail_outstanding()
+
+    # ---------------------------------------------------------
+    # Thread de rede (callbacks do paho)
+    # ---------------------------------------------------------
+    def _create_client(self):
+        if self.protocol == paho.MQTTv5:
+            client = paho.Client(paho.CallbackAPIVersion.VERSION2, client_id=self.client_id,
+                                 protocol=self.protocol)
+        else:
+            client = paho.Client(paho.CallbackAPIVersion.VERSION2, client_id=self.client_id,
+                                 clean_session=self.clean_session, protocol=self.protocol)
+        if self.username:
+            client.username_pw_set(self.username, self.password)
+        client.max_inflight_messages_set(MQTT_INFLIGHT)
+        client.max_queued_messages_set(MQTT_MAX_QUEUED)
+        client.reconnect_delay_set(int(RABBIT_RECONNECT_MIN), int(RABBIT_RECONNECT_MAX))
+        client.on_connect = self._on_connect
+        client.on_disconnect = self._on_disconnect
+        client.on_publish = self._on_publish
+
+        if self.protocol == paho.MQTTv5:
+            properties = Properties(PacketTypes.CONNECT)
+            properties.SessionExpiryInterval = 0 if self.clean_session else MQTT_SESSION_EXPIRY
+            client.connect_async(self.host, self.port, keepalive=MQTT_KEEPALIVE,
+                                 clean_start=self.clean_session, properties=properties)
+        else:
+            client.connect_async(self.host, self.port, keepalive=MQTT_KEEPALIVE)
+        return client
+
+    def _mqtt_properties(self, properties):
+        content_type = getattr(properties, "content_type", None)
+        if self.protocol != paho.MQTTv5 or not content_type:
+            return None
+        mqtt_properties = Properties(PacketTypes.PUBLISH)
+        mqtt_properties.ContentType = content_type
+        return mqtt_properties
+
+    def _on_connect(self, client, userdata, flags, reason_code, properties):
+        if reason_code.is_failure:
+            print(f"Erro na conexão com o broker MQTT: {reason_code}")
+            logger.error(f"Erro na conexão com o broker MQTT: {reason_code}")
+            return
+        if not flags.session_present:
+            # Sem sessão no broker as mensagens QoS 1 pendentes não serão confirmadas
+            self._fail_outstanding()
+        print(f"Conectado ao broker MQTT {self.host}:{self.port}")
+        self._ready.set()
+
+    def _on_disconnect(self, client, userdata, flags, reason_code, properties):
+        self._ready.clear()
+        if reason_code.is_failure:
+            logger.error(f"Conexão com o broker MQTT perdida: {reason_code}")
+        if self.clean_session:
+            self._fail_outstanding()
+
+    def _on_publish(self, client, userdata, mid, reason_code, properties):
+        ok = not reason_code.is_failure
+        with self._lock:
+            future = self._outstanding.pop(mid, None)
+            if future is None:
+                # Confirmação recebida antes de `publish` registrar o Future
+                self._published_early.add(mid)
+                return
+        if not future.done():
+            future.set_result(ok)
+
+    def _fail_outstanding(self):
+        with self._lock:
+            outstanding, self._outstanding = self._outstanding, {}
+        for future in outstanding.values():
+            if not future.done():
+                future.set_result(False)
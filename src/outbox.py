@@ -0,0 +1,860 @@
+###############################################################
+# outbox.py
+# ------------------------------------------------------------
+# Fila local (tabela PERSISTENCE) e envio das mensagens ao broker
+# Author: Aluisio Cavalcante <aluisio@controlengenharia.eng.br>
+# novembro de 2025
+# TODOS OS DIREITOS RESERVADOS A CONTROL ENGENHARIA
+# #############################################################
+import os
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+from dotenv import load_dotenv
+from sqlalchemy import func, select, text
+from sqlalchemy.exc import SQLAlchemyError
+
+from models import QueueSession, persistence
+from logstore import SegmentLog
+import rabbitmq
+from logger import *
+# Carregando as variáveis de ambiente do arquivo .env
+load_dotenv()
+
+# Armazenamento da fila local: sqlite (tabela PERSISTENCE) ou log (segmentos
+# append-only em LOGSTORE_DIR, veja logstore.py)
+OUTBOX_BACKEND=os.getenv("OUTBOX_BACKEND", "sqlite").lower()
+
+# Mensagens lidas da fila por página e intervalo (s) entre tentativas quando a
+# fila está vazia ou o broker está indisponível
+OUTBOX_PAGE_SIZE=int(os.getenv("OUTBOX_PAGE_SIZE", 500))
+OUTBOX_IDLE_INTERVAL=float(os.getenv("OUTBOX_IDLE_INTERVAL", 5))
+
+# Gravação em grupo: máximo de mensagens por commit, espera máxima (ms) para
+# juntar mensagens no mesmo commit, se quem enfileira aguarda o commit e por
+# no máximo quantos segundos
+OUTBOX_COMMIT_MAX_ROWS=int(os.getenv("OUTBOX_COMMIT_MAX_ROWS", 500))
+OUTBOX_COMMIT_MAX_DELAY_MS=float(os.getenv("OUTBOX_COMMIT_MAX_DELAY_MS", 10))
+OUTBOX_WAIT_DURABLE=os.getenv("OUTBOX_WAIT_DURABLE", "true").lower() in ("1", "true", "sim", "yes")
+OUTBOX_COMMIT_TIMEOUT=float(os.getenv("OUTBOX_COMMIT_TIMEOUT", 30))
+
+# Reenvio do backlog após falha do broker: máximo de mensagens por segundo (0 = sem limite)
+OUTBOX_REPLAY_RATE=float(os.getenv("OUTBOX_REPLAY_RATE", 200))
+
+# Cota da fila: máximo de mensagens, tamanho máximo do banco (bytes) e idade
+# máxima das mensagens (s); 0 desliga cada limite. Políticas de descarte, em
+# ordem: status_first (status/health primeiro), downsample (mantém, de cada
+# registrador ou equipamento, 1 leitura a cada OUTBOX_DOWNSAMPLE_INTERVAL segundos
+# entre as com mais de OUTBOX_DOWNSAMPLE_AGE segundos) e drop_oldest (mais antigas). Intervalo (s) entre verificações e
+# páginas liberadas por vez no incremental vacuum
+OUTBOX_MAX_ROWS=int(os.getenv("OUTBOX_MAX_ROWS", 1000000))
+OUTBOX_MAX_BYTES=int(os.getenv("OUTBOX_MAX_BYTES", 512 * 1024 * 1024))
+OUTBOX_MAX_AGE=int(os.getenv("OUTBOX_MAX_AGE", 7 * 24 * 3600))
+OUTBOX_EVICTION=os.getenv("OUTBOX_EVICTION", "status_first,downsample,drop_oldest")
+OUTBOX_DOWNSAMPLE_INTERVAL=int(os.getenv("OUTBOX_DOWNSAMPLE_INTERVAL", 600))
+OUTBOX_DOWNSAMPLE_AGE=int(os.getenv("OUTBOX_DOWNSAMPLE_AGE", 3600))
+OUTBOX_QUOTA_INTERVAL=float(os.getenv("OUTBOX_QUOTA_INTERVAL", 60))
+OUTBOX_VACUUM_PAGES=int(os.getenv("OUTBOX_VACUUM_PAGES", 1000))
+
+# Faixas de prioridade (tipos de mensagem, da maior para a menor prioridade; a
+# última recebe também os tipos não listados), escalonamento entre elas (strict
+# ou weighted), pesos do weighted e routing key de cada faixa ("faixa:chave";
+# faixas sem chave usam RABBIT_CHAVE)
+OUTBOX_LANES=os.getenv("OUTBOX_LANES", "status,health,sensor")
+OUTBOX_SCHEDULING=os.getenv("OUTBOX_SCHEDULING", "strict").lower()
+OUTBOX_LANE_WEIGHTS=os.getenv("OUTBOX_LANE_WEIGHTS", "status:6,health:3,sensor:1")
+OUTBOX_LANE_ROUTING=os.getenv("OUTBOX_LANE_ROUTING", "")
+
+
+def parse_lane_map(value, cast=str):
+    """Converte "faixa:valor,faixa:valor" em um dicionário."""
+    result = {}
+    for item in (value or "").split(","):
+        lane, _, lane_value = item.strip().partition(":")
+        if lane and lane_value:
+            result[lane.strip()] = cast(lane_value.strip())
+    return result
+
+
+class GroupCommitWriter:
+
+    """
+    Grava as mensagens na tabela PERSISTENCE em grupos.
+
+    As threads entregam as mensagens com `submit` e uma única thread de
+    gravação junta até `max_rows` mensagens, ou o que chegar em `max_delay`
+    segundos após a primeira, em um único INSERT e um único commit. O Future
+    de cada mensagem é resolvido com True após o commit, ou com a exceção em
+    caso de erro. Se o grupo falhar, as mensagens são gravadas uma a uma para
+    que só as que falharem recebam a exceção. Nenhum erro encerra a thread de
+    gravação nem deixa um Future sem resultado.
+    """
+
+    def __init__(self, session_factory=QueueSession, max_rows=OUTBOX_COMMIT_MAX_ROWS,
+                 max_delay=OUTBOX_COMMIT_MAX_DELAY_MS / 1000.0, on_commit=None):
+        self.session_factory = session_factory
+        self.max_rows = max(1, int(max_rows))
+        self.max_delay = max(0.0, float(max_delay))
+        self.on_commit = on_commit
+
+        self._cond = threading.Condition()
+        self._pending = []
+        self._first_at = 0.0
+        self._stop = False
+        self._thread = None
+        self._pid = None
+
+    def submit(self, content_data, kind="sensor", source=None):
+        """
+        Entrega a mensagem à thread de gravação. Retorna um Future.
+
+        Raises:
+            TypeError: Se `content_data` não for texto nem bytes (mensagem já
+            convertida para o formato de envio).
+        """
+        if not isinstance(content_data, (str, bytes)):
+            raise TypeError(f"Mensagem da fila deve ser str ou bytes, recebido {type(content_data).__name__}")
+        future = Future()
+        row = {"content_data": content_data, "sended": False, "created_at": int(time.time()), "kind": kind,
+               "source": source}
+        with self._cond:
+            self._start()
+            if not self._pending:
+                self._first_at = time.monotonic()
+            self._pending.append((row, future))
+            if len(self._pending) == 1 or len(self._pending) >= self.max_rows:
+                self._cond.notify()
+        return future
+
+    def stop(self):
+        """Grava o que estiver pendente e encerra a thread."""
+        with self._cond:
+            self._stop = True
+            self._cond.notify()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+
+    def _start(self):
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, name="outbox-writer", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._stop:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                deadline = self._first_at + self.max_delay
+                while len(self._pending) < self.max_rows and not self._stop:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                group, self._pending = self._pending[:self.max_rows], self._pending[self.max_rows:]
+                self._first_at = time.monotonic()
+            try:
+                self._write(group)
+            except Exception as e:
+                # Ex.: falha ao abrir a sessão; as mensagens do grupo recebem o erro
+                logger.error(f"Erro ao gravar o grupo na fila: {str(e)}")
+                for _, future in group:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _write(self, group):
+        session = self.session_factory()
+        try:
+            session.execute(persistence.__table__.insert(), [row for row, _ in group])
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            logger.error(f"Erro no banco de dados, gravando o grupo mensagem a mensagem: {str(e)}")
+            committed = self._write_each(session, group)
+        else:
+            committed = True
+            for _, future in group:
+                future.set_result(True)
+        finally:
+            session.close()
+        if committed and self.on_commit is not None:
+            self.on_commit()
+
+    @staticmethod
+    def _write_each(session, group):
+        """Grava as mensagens do grupo uma a uma. Retorna True se alguma foi gravada."""
+        committed = False
+        for row, future in group:
+            try:
+                session.execute(persistence.__table__.insert(), [row])
+                session.commit()
+            except Exception as e:
+                session.rollback()
+                logger.error(f"Erro no banco de dados: {str(e)}")
+                future.set_exception(e)
+            else:
+                committed = True
+                future.set_result(True)
+        return committed
+
+
+class StorageQuota:
+
+    """
+    Mantém a fila PERSISTENCE dentro da cota de mensagens, bytes e idade.
+
+    Mensagens mais antigas que `max_age` são sempre descartadas. Acima da
+    cota de mensagens ou de bytes as políticas de `policies` são aplicadas em
+    ordem até a fila voltar ao limite. O downsample é feito por origem da
+    leitura (`source`, o registrador ou o equipamento): de cada origem fica a
+    primeira leitura de cada intervalo de `downsample_interval` segundos, de
+    modo que nenhum sensor perde o histórico inteiro e aplicar a política de
+    novo não descarta mais nada. O tamanho considerado é o das páginas
+    em uso do banco SQLite, e as páginas liberadas são devolvidas ao disco
+    com incremental vacuum.
+    """
+
+    POLICIES = ("status_first", "downsample", "drop_oldest")
+
+    def __init__(self, session_factory=QueueSession, max_rows=OUTBOX_MAX_ROWS, max_bytes=OUTBOX_MAX_BYTES,
+                 max_age=OUTBOX_MAX_AGE, policies=OUTBOX_EVICTION, downsample_interval=OUTBOX_DOWNSAMPLE_INTERVAL,
+                 downsample_age=OUTBOX_DOWNSAMPLE_AGE, vacuum_pages=OUTBOX_VACUUM_PAGES):
+        if isinstance(policies, str):
+            policies = [policy.strip() for policy in policies.split(",") if policy.strip()]
+        for policy in policies:
+            if policy not in self.POLICIES:
+                raise ValueError(f"Política de descarte inválida: {policy}")
+        self.session_factory = session_factory
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.policies = list(policies)
+        self.downsample_interval = max(1, int(downsample_interval))
+        self.downsample_age = downsample_age
+        self.vacuum_pages = vacuum_pages
+        self.evicted = {"idade": 0, "status_first": 0, "downsample": 0, "drop_oldest": 0}
+        self._vacuum_checked = False
+
+    def enforce(self):
+        """Aplica a cota. Retorna a quantidade de mensagens descartadas."""
+        table = persistence.__table__
+        evicted = 0
+        with self.session_factory() as session:
+            sqlite = session.get_bind().dialect.name == "sqlite"
+            if sqlite and not self._vacuum_checked:
+                self._enable_incremental_vacuum(session)
+
+            if self.max_age:
+                cutoff = int(time.time()) - self.max_age
+                evicted += self._evict(session, "idade", table.c.created_at < cutoff)
+
+            for policy in self.policies:
+                excess = self._excess(session, sqlite)
+                if excess <= 0:
+                    break
+                if policy == "status_first":
+                    evicted += self._evict(session, policy, table.c.kind.in_(("status", "health")), excess)
+                elif policy == "downsample":
+                    old = (table.c.kind == "sensor") & (table.c.created_at < int(time.time()) - self.downsample_age)
+                    kept = (select(func.min(table.c.id)).where(old)
+                            .group_by(table.c.source, table.c.created_at // self.downsample_interval))
+                    evicted += self._evict(session, policy, old & table.c.id.notin_(kept.scalar_subquery()),
+                                           excess)
+                else:
+                    evicted += self._evict(session, policy, None, excess)
+
+            if sqlite and self.vacuum_pages and session.execute(text("PRAGMA freelist_count")).scalar():
+                self._incremental_vacuum(session)
+
+        if evicted:
+            print(f"Cota da fila: {evicted} mensagem(ns) descartada(s)")
+            logger.error(f"Cota da fila: {evicted} mensagem(ns) descartada(s)")
+        return evicted
+
+    def stats(self):
+        return {"descartadas": dict(self.evicted)}
+
+    def _evict(self, session, reason, condition, limit=None):
+        """Descarta as mensagens mais antigas que atendem a `condition`."""
+        table = persistence.__table__
+        ids = select(table.c.id).order_by(table.c.id)
+        if condition is not None:
+            ids = ids.where(condition)
+        if limit is not None:
+            ids = ids.limit(limit)
+        count = session.execute(table.delete().where(table.c.id.in_(ids.scalar_subquery()))).rowcount
+        session.commit()
+        self.evicted[reason] += count
+        return count
+
+    def _excess(self, session, sqlite):
+        """Quantas mensagens precisam sair para a fila voltar à cota."""
+        rows = session.execute(select(func.count()).select_from(persistence.__table__)).scalar()
+        excess = rows - self.max_rows if self.max_rows else 0
+        if self.max_bytes and sqlite and rows:
+            used = self._used_bytes(session)
+            if used > self.max_bytes:
+                per_row = max(used / rows, 1)
+                excess = max(excess, int((used - self.max_bytes) / per_row) + 1)
+        return excess
+
+    @staticmethod
+    def _used_bytes(session):
+        page_size = session.execute(text("PRAGMA page_size")).scalar()
+        page_count = session.execute(text("PRAGMA page_count")).scalar()
+        freelist = session.execute(text("PRAGMA freelist_count")).scalar()
+        return (page_count - freelist) * page_size
+
+    def _incremental_vacuum(self, session):
+        """Devolve ao disco até `vacuum_pages` páginas livres."""
+        session.close()
+        with session.get_bind().connect() as connection:
+            # executescript executa o pragma até o fim; via execute ele libera uma página só
+            connection.connection.driver_connection.executescript(
+                f"PRAGMA incremental_vacuum({int(self.vacuum_pages)});")
+
+    def _enable_incremental_vacuum(self, session):
+        """Liga o auto_vacuum incremental (exige um VACUUM completo uma única vez)."""
+        self._vacuum_checked = True
+        if session.execute(text("PRAGMA auto_vacuum")).scalar() == 2:
+            return
+        print("Habilitando incremental vacuum no banco de dados...")
+        session.close()
+        with session.get_bind().connect() as connection:
+            connection = connection.execution_options(isolation_level="AUTOCOMMIT")
+            connection.execute(text("PRAGMA auto_vacuum = INCREMENTAL"))
+            connection.execute(text("VACUUM"))
+
+
+class OutboxDrainer:
+
+    """
+    Envia ao broker as mensagens guardadas na tabela PERSISTENCE.
+
+    `enqueue` entrega a mensagem ao `GroupCommitWriter`, que acorda a thread
+    de envio após cada commit. As duas threads são iniciadas no primeiro uso.
+
+    A thread de envio percorre a fila pelo id (cursor), em páginas de até
+    `page_size` mensagens: publica a página inteira, aguarda as confirmações
+    do broker e remove as confirmadas com um único DELETE. Assim a memória
+    usada não depende do tamanho da fila.
+
+    Se alguma mensagem da página não for confirmada, a passada é encerrada e
+    a fila volta a ser percorrida desde o início na próxima tentativa.
+
+    O que já estava na fila ao iniciar, após uma falha de envio ou enquanto o
+    broker estava indisponível é tratado como backlog: é reenviado em ordem
+    FIFO com no máximo `replay_rate` mensagens por segundo, intercalado com
+    as mensagens novas, que têm prioridade. `stats` informa o restante, a
+    taxa e a previsão de término do reenvio.
+
+    A fila é dividida em faixas pelo tipo da mensagem (`lanes`), cada uma com
+    o seu cursor e a sua routing key. Com `scheduling` strict cada página vem
+    da faixa de maior prioridade que tiver mensagens, de modo que status e
+    health nunca esperam o backlog de sensores; com weighted a página é
+    dividida entre as faixas conforme `weights`.
+    """
+
+    SCHEDULING = ("strict", "weighted")
+
+    def __init__(self, session_factory=QueueSession, page_size=OUTBOX_PAGE_SIZE,
+                 idle_interval=OUTBOX_IDLE_INTERVAL, replay_rate=OUTBOX_REPLAY_RATE,
+                 publish=None, wait=None, ready=None, quota=None, quota_interval=OUTBOX_QUOTA_INTERVAL,
+                 lanes=OUTBOX_LANES, scheduling=OUTBOX_SCHEDULING, weights=OUTBOX_LANE_WEIGHTS,
+                 routing=OUTBOX_LANE_ROUTING, encode=None, commit_timeout=OUTBOX_COMMIT_TIMEOUT):
+        if isinstance(lanes, str):
+            lanes = [lane.strip() for lane in lanes.split(",") if lane.strip()]
+        if not lanes:
+            raise ValueError("Nenhuma faixa de prioridade configurada")
+        if scheduling not in self.SCHEDULING:
+            raise ValueError(f"Escalonamento inválido: {scheduling}")
+        self.lanes = list(lanes)
+        self.scheduling = scheduling
+        self.weights = parse_lane_map(weights, float) if isinstance(weights, str) else dict(weights)
+        self.routing = parse_lane_map(routing) if isinstance(routing, str) else dict(routing)
+        # Créditos da divisão das páginas entre as faixas (weighted, veja `_split`),
+        # separados para as mensagens novas e para o backlog
+        self._live_credit = dict.fromkeys(self.lanes, 0.0)
+        self._backlog_credit = dict.fromkeys(self.lanes, 0.0)
+        self.session_factory = session_factory
+        self.page_size = max(1, int(page_size))
+        self.idle_interval = idle_interval
+        self.replay_rate = max(0.0, float(replay_rate))
+        self.publish = publish or (lambda payload, routing_key=None: rabbitmq.send_rabbitmq_async(payload, routing_key))
+        self.wait = wait or (lambda pending: rabbitmq.wait_confirms(pending, rabbitmq.RABBIT_PUBLISH_TIMEOUT))
+        self.ready = ready or (lambda: rabbitmq.publisher.wait_ready(self.idle_interval))
+        self.encode = encode or rabbitmq.encode_for_queue
+        self.commit_timeout = commit_timeout
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._pid = None
+        self.writer = GroupCommitWriter(session_factory, on_commit=self._wakeup.set)
+        self.quota = quota or StorageQuota(session_factory)
+        self.quota_interval = quota_interval
+        self._quota_at = 0.0
+
+        # Reenvio do backlog: limite de ids do backlog, progresso e token bucket
+        self._replay_pending = True
+        self._boundary = None
+        self._replay_total = 0
+        self._replay_sent = 0
+        self._replay_started = 0.0
+        self._tokens = 0.0
+        self._tokens_at = 0.0
+
+    def start(self):
+        """Inicia a thread de envio (uma vez por processo)."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name="outbox-drainer", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self.writer.stop()
+        self._stop_event.set()
+        self._wakeup.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+
+    def enqueue(self, content_data, wait=OUTBOX_WAIT_DURABLE, kind="sensor", source=None):
+        """
+        Enfileira a mensagem para gravação na fila.
+
+        `kind` (sensor, status ou health) e `source` (xid do registrador ou do
+        equipamento) são usados pelas políticas de descarte da cota.
+
+        A mensagem é gravada já no formato de envio da routing key da sua
+        faixa (`encode`), para não ser convertida a cada envio ou reenvio.
+
+        Com `wait` aguarda o commit, por no máximo OUTBOX_COMMIT_TIMEOUT
+        segundos (TimeoutError), e propaga o erro da gravação (por exemplo
+        SQLAlchemyError). Sem `wait` retorna logo e o resultado fica no
+        Future. Uma mensagem que não seja texto levanta TypeError.
+
+        Returns:
+            Future: resolvido com True quando a mensagem estiver gravada.
+        """
+        if not isinstance(content_data, str):
+            raise TypeError(f"Mensagem da fila deve ser str, recebido {type(content_data).__name__}")
+        self.start()
+        lane = kind if kind in self.lanes[:-1] else self.lanes[-1]
+        future = self.writer.submit(self.encode(content_data, self.routing.get(lane)), kind, source)
+        if wait:
+            try:
+                future.result(timeout=self.commit_timeout)
+            except FutureTimeoutError:
+                raise TimeoutError(f"Mensagem não gravada na fila em {self.commit_timeout} s") from None
+        return future
+
+    def drain_once(self):
+        """
+        Percorre a fila uma vez.
+
+        A cada volta envia primeiro uma página de mensagens novas (acima do
+        limite do backlog) e depois um trecho do backlog, do mais antigo para o
+        mais novo, limitado a `replay_rate` mensagens por segundo. Em ambos as
+        faixas são escalonadas conforme `scheduling`.
+
+        Returns:
+            int: Quantidade de mensagens confirmadas e removidas da fila.
+        """
+        table = persistence.__table__
+        sent = 0
+        session = self.session_factory()
+        try:
+            if self._replay_pending:
+                self._start_replay(session)
+            live_cursors = {lane: self._boundary or 0 for lane in self.lanes}
+            backlog_cursors = {lane: 0 for lane in self.lanes}
+            while not self._stop_event.is_set():
+                live = self._schedule(session, lambda lane: table.c.id > live_cursors[lane], self.page_size,
+                                      self._live_credit)
+                failed = False
+                for lane, rows in live:
+                    confirmed = self._send(session, rows, lane)
+                    sent += confirmed
+                    if confirmed < len(rows):
+                        failed = True
+                        break
+                    live_cursors[lane] = rows[-1].id
+                if failed:
+                    # As mensagens não confirmadas passam a fazer parte do backlog
+                    self._replay_pending = True
+                    break
+
+                if self._boundary is None:
+                    if not live:
+                        break
+                    continue
+
+                budget = self._take_tokens()
+                if budget == 0:
+                    if not live:
+                        self._stop_event.wait(self._token_wait())
+                    continue
+                backlog = self._schedule(
+                    session, lambda lane: (table.c.id > backlog_cursors[lane]) & (table.c.id <= self._boundary), budget,
+                    self._backlog_credit)
+                if not backlog:
+                    self._finish_replay()
+                    continue
+                for lane, rows in backlog:
+                    confirmed = self._send(session, rows, lane)
+                    sent += confirmed
+                    self._replay_sent += confirmed
+                    self._tokens -= len(rows)
+                    if confirmed < len(rows):
+                        failed = True
+                        break
+                    backlog_cursors[lane] = rows[-1].id
+                if failed:
+                    break
+        except SQLAlchemyError as e:
+            session.rollback()
+            logger.error(f"Erro no banco de dados: {str(e)}")
+        finally:
+            session.close()
+        return sent
+
+    def stats(self):
+        """Situação da fila e do reenvio do backlog, para o health check."""
+        table = persistence.__table__
+        stats = {
+            "reenvio_ativo": self._boundary is not None,
+            "reenvio_restante": 0,
+            "reenvio_taxa": 0.0,
+            "reenvio_eta_s": None,
+            "reenvio_limite": self.replay_rate,
+        }
+        try:
+            with self.session_factory() as session:
+                stats["pendentes"] = session.execute(select(func.count()).select_from(table)).scalar()
+        except SQLAlchemyError as e:
+            logger.error(f"Erro no banco de dados: {str(e)}")
+            stats["pendentes"] = None
+        if self._boundary is not None:
+            remaining = max(self._replay_total - self._replay_sent, 0)
+            elapsed = time.monotonic() - self._replay_started
+            rate = self._replay_sent / elapsed if elapsed > 0 else 0.0
+            stats["reenvio_restante"] = remaining
+            stats["reenvio_taxa"] = round(rate, 1)
+            stats["reenvio_eta_s"] = round(remaining / rate) if rate else None
+        stats.update(self.quota.stats())
+        return stats
+
+    def _lane_condition(self, lane):
+        kind = persistence.__table__.c.kind
+        if lane == self.lanes[-1]:
+            # A última faixa recebe também mensagens sem tipo ou de tipos não listados
+            return kind.is_(None) | kind.notin_(self.lanes[:-1])
+        return kind == lane
+
+    def _schedule(self, session, condition, limit, credit):
+        """
+        Escolhe as mensagens da próxima página entre as faixas, sem passar de
+        `limit`. No weighted a página é dividida por `_split` com os créditos
+        `credit`; o que uma faixa sem mensagens não usar vai para as demais.
+
+        Returns:
+            list: (faixa, linhas) de cada faixa com mensagens, em ordem de prioridade.
+        """
+        if self.scheduling == "strict":
+            for lane in self.lanes:
+                rows = self._fetch(session, condition(lane) & self._lane_condition(lane), limit)
+                if rows:
+                    return [(lane, rows)]
+            return []
+
+        table = persistence.__table__
+        shares = self._split(limit, credit)
+        batches = {}
+        unused = 0
+        for lane in self.lanes:
+            rows = self._fetch(session, condition(lane) & self._lane_condition(lane), shares[lane]) \
+                if shares[lane] else []
+            batches[lane] = list(rows)
+            unused += shares[lane] - len(rows)
+        # O que as faixas sem mensagens suficientes não usaram vai para as demais, em ordem de prioridade
+        for lane in self.lanes:
+            if unused <= 0:
+                break
+            if shares[lane] and len(batches[lane]) < shares[lane]:
+                continue  # faixa já esgotada
+            lane_condition = condition(lane) & self._lane_condition(lane)
+            if batches[lane]:
+                lane_condition &= table.c.id > batches[lane][-1].id
+            extra = self._fetch(session, lane_condition, unused)
+            batches[lane].extend(extra)
+            unused -= len(extra)
+        return [(lane, rows) for lane, rows in batches.items() if rows]
+
+    def _split(self, limit, credit):
+        """
+        Divide exatamente `limit` mensagens entre as faixas conforme
+        `weights` (round robin ponderado suave): a cada mensagem, todas as
+        faixas ganham o seu peso em crédito e a de maior crédito leva a
+        mensagem, pagando a soma dos pesos. Os créditos (`credit`) passam para
+        a próxima chamada, de modo que, com mais faixas que mensagens, as
+        faixas se alternam entre as passadas na proporção dos pesos.
+        """
+        weights = {lane: self.weights.get(lane, 1.0) for lane in self.lanes}
+        total = sum(weights.values())
+        shares = dict.fromkeys(self.lanes, 0)
+        for _ in range(max(int(limit), 0)):
+            for lane in self.lanes:
+                credit[lane] += weights[lane]
+            lane = max(self.lanes, key=credit.get)
+            credit[lane] -= total
+            shares[lane] += 1
+        return shares
+
+    def _fetch(self, session, condition, limit):
+        table = persistence.__table__
+        query = (select(table.c.id, table.c.content_data)
+                 .where(condition, table.c.sended == False)
+                 .order_by(table.c.id)
+                 .limit(limit))
+        return session.execute(query).all()
+
+    def _send(self, session, rows, lane):
+        """Publica as linhas da faixa, remove as confirmadas e retorna quantas foram confirmadas."""
+        table = persistence.__table__
+        routing_key = self.routing.get(lane)
+        pending = [(row.id, self.publish(row.content_data, routing_key)) for row in rows]
+        confirmed = self.wait(pending)
+
+        if len(confirmed) == len(rows):
+            # Todas as linhas da faixa nesse intervalo de ids estavam na página
+            session.execute(table.delete().where(table.c.id.between(rows[0].id, rows[-1].id),
+                                                 self._lane_condition(lane)))
+        elif confirmed:
+            session.execute(table.delete().where(table.c.id.in_(confirmed)))
+        session.commit()
+
+        if len(confirmed) < len(rows):
+            logger.error(f"{len(rows) - len(confirmed)} mensagem(ns) sem confirmação do broker. "
+                         "Elas permanecem na fila para um novo envio.")
+        return len(confirmed)
+
+    def _start_replay(self, session):
+        """Tudo o que já está na fila passa a ser backlog, reenviado com limite de taxa."""
+        table = persistence.__table__
+        self._replay_pending = False
+        boundary, total = session.execute(select(func.max(table.c.id), func.count()).select_from(table)).one()
+        if not total:
+            self._boundary = None
+            return
+        if self._boundary is None:
+            self._replay_sent = 0
+            self._replay_started = time.monotonic()
+            self._tokens = 0.0
+            self._tokens_at = time.monotonic()
+            print(f"Reenvio do backlog iniciado: {total} mensagem(ns) na fila")
+        self._boundary = boundary
+        self._replay_total = total + self._replay_sent
+
+    def _finish_replay(self):
+        elapsed = time.monotonic() - self._replay_started
+        print(f"Reenvio do backlog concluído: {self._replay_sent} mensagem(ns) em {elapsed:.1f}s")
+        self._boundary = None
+
+    def _take_tokens(self):
+        """Quantas mensagens do backlog podem ser enviadas agora (token bucket)."""
+        if not self.replay_rate:
+            return self.page_size
+        now = time.monotonic()
+        self._tokens = min(self._tokens + (now - self._tokens_at) * self.replay_rate,
+                           max(float(self.page_size), 1.0))
+        self._tokens_at = now
+        return min(int(self._tokens), self.page_size)
+
+    def _token_wait(self):
+        return max((1 - self._tokens) / self.replay_rate, 0.001)
+
+    def _enforce_quota(self):
+        # Roda também com o broker fora, que é quando a fila cresce
+        if time.monotonic() - self._quota_at < self.quota_interval:
+            return
+        self._quota_at = time.monotonic()
+        try:
+            self.quota.enforce()
+        except SQLAlchemyError as e:
+            logger.error(f"Erro ao aplicar a cota da fila: {str(e)}")
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            self._wakeup.wait(self.idle_interval)
+            self._wakeup.clear()
+            if self._stop_event.is_set():
+                break
+            self._enforce_quota()
+            if not self.ready():
+                self._replay_pending = True
+                continue
+            try:
+                sent = self.drain_once()
+                if sent:
+                    print(f"{sent} mensagem(ns) da fila enviada(s) ao broker")
+            except Exception as e:
+                print(f"Erro ao enviar a fila ao broker: {e}")
+                logger.error(f"Erro ao enviar a fila ao broker: {e}")
+
+
+class LogOutbox:
+
+    """
+    Fila local em log segmentado (`SegmentLog`), com a mesma API de `OutboxDrainer`.
+
+    `enqueue` acrescenta a mensagem ao segmento ativo e, com `wait`, aguarda o
+    fsync, que é compartilhado pelas threads que gravam ao mesmo tempo. A
+    thread de envio lê páginas a partir do checkpoint, publica, aguarda as
+    confirmações e avança o checkpoint até a primeira mensagem não
+    confirmada; os segmentos consumidos são apagados inteiros.
+
+    A fila é FIFO única: as faixas de prioridade, o limite de taxa do
+    backlog e as políticas de descarte por tipo são exclusivas do backend
+    sqlite. A cota é por tamanho (LOGSTORE_MAX_BYTES), descartando os
+    segmentos mais antigos.
+    """
+
+    def __init__(self, log=None, page_size=OUTBOX_PAGE_SIZE, idle_interval=OUTBOX_IDLE_INTERVAL,
+                 publish=None, wait=None, ready=None, quota_interval=OUTBOX_QUOTA_INTERVAL, encode=None):
+        self.log = log or SegmentLog()
+        self.page_size = max(1, int(page_size))
+        self.idle_interval = idle_interval
+        self.publish = publish or (lambda payload, routing_key=None: rabbitmq.send_rabbitmq_async(payload, routing_key))
+        self.wait = wait or (lambda pending: rabbitmq.wait_confirms(pending, rabbitmq.RABBIT_PUBLISH_TIMEOUT))
+        self.ready = ready or (lambda: rabbitmq.publisher.wait_ready(self.idle_interval))
+        self.encode = encode or rabbitmq.encode_for_queue
+        self.quota_interval = quota_interval
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._quota_at = 0.0
+
+    def start(self):
+        """Inicia a thread de envio (uma vez por processo)."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name="outbox-drainer", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        self._wakeup.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+
+    def enqueue(self, content_data, wait=OUTBOX_WAIT_DURABLE, kind="sensor", source=None):
+        """
+        Acrescenta a mensagem ao log, já no formato de envio da routing key
+        padrão (`encode`).
+
+        Com `wait` retorna só depois do fsync. `kind` e `source` são aceitos
+        por compatibilidade com `OutboxDrainer.enqueue`.
+
+        Returns:
+            Future: resolvido com True quando a mensagem estiver gravada.
+
+        Raises:
+            TypeError: Se `content_data` não for texto.
+            OSError: Se a gravação no disco falhar (disco cheio, erro de I/O).
+        """
+        if not isinstance(content_data, str):
+            raise TypeError(f"Mensagem da fila deve ser str, recebido {type(content_data).__name__}")
+        self.start()
+        offset = self.log.append(self.encode(content_data))
+        if wait:
+            self.log.sync(offset)
+        self._wakeup.set()
+        future = Future()
+        future.set_result(True)
+        return future
+
+    def drain_once(self):
+        """
+        Percorre o log uma vez a partir do checkpoint.
+
+        Returns:
+            int: Quantidade de mensagens confirmadas.
+        """
+        sent = 0
+        while not self._stop_event.is_set():
+            start = self.log.checkpoint
+            records = self.log.read(start, self.page_size)
+            if not records:
+                break
+
+            pending = [(offset, self.publish(payload)) for offset, payload in records]
+            confirmed = set(self.wait(pending))
+
+            checkpoint = records[0][0]
+            for offset, _ in records:
+                if offset not in confirmed:
+                    break
+                checkpoint = offset + 1
+            self.log.commit(checkpoint)
+            sent += checkpoint - start
+
+            if checkpoint <= records[-1][0]:
+                logger.error(f"{records[-1][0] + 1 - checkpoint} mensagem(ns) sem confirmação do broker. "
+                             "Elas permanecem na fila para um novo envio.")
+                break
+        return sent
+
+    def stats(self):
+        """Situação da fila, para o health check."""
+        return {
+            "pendentes": self.log.pending(),
+            "bytes": self.log.size(),
+            "descartadas": {"cota": self.log.dropped},
+        }
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            self._wakeup.wait(self.idle_interval)
+            self._wakeup.clear()
+            if self._stop_event.is_set():
+                break
+            if time.monotonic() - self._quota_at >= self.quota_interval:
+                self._quota_at = time.monotonic()
+                self.log.enforce_quota()
+            if not self.ready():
+                continue
+            try:
+                sent = self.drain_once()
+                if sent:
+                    print(f"{sent} mensagem(ns) da fila enviada(s) ao broker")
+            except Exception as e:
+                print(f"Erro ao enviar a fila ao broker: {e}")
+                logger.error(f"Erro ao enviar a fila ao broker: {e}")
+
+
+def create_outbox(backend=OUTBOX_BACKEND):
+    """Cria a fila local do backend configurado em OUTBOX_BACKEND."""
+    if backend == "log":
+        return LogOutbox()
+    if backend != "sqlite":
+        raise ValueError(f"Backend da fila inválido: {backend}")
+    return OutboxDrainer()
+
+
+# Fila compartilhada pelo processo (a thread de envio só é iniciada no primeiro uso)
+outbox = create_outbox()
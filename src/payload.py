@@ -0,0 +1,179 @@
+###############################################################
+# payload.py
+# ------------------------------------------------------------
+# Modelos pré-serializados de payload: a parte fixa do JSON é
+# gerada uma vez e só os campos variáveis são codificados a cada envio
+# Author: Aluisio Cavalcante <aluisio@controlengenharia.eng.br>
+# novembro de 2025
+# TODOS OS DIREITOS RESERVADOS A CONTROL ENGENHARIA
+# #############################################################
+import json
+import os
+import threading
+from json.encoder import encode_basestring, encode_basestring_ascii
+
+from dotenv import load_dotenv
+
+from snapshot import config_snapshot
+# Carregando as variáveis de ambiente do arquivo .env
+load_dotenv()
+
+# Payload dos sensores: register (uma mensagem por registrador, com gateway e
+# equipamento repetidos) ou equipment (uma mensagem por ciclo do equipamento com
+# todos os registradores) e máximo de registradores por mensagem no modo equipment
+PAYLOAD_MODE = os.getenv("PAYLOAD_MODE", "register").lower()
+PAYLOAD_MAX_REGISTERS = int(os.getenv("PAYLOAD_MAX_REGISTERS", 500))
+
+# Envio dos payloads dos equipamentos DNP3. Desligado por padrão: as versões
+# anteriores não chegavam a gerar esses payloads e os consumidores não os recebiam
+PAYLOAD_DNP3 = os.getenv("PAYLOAD_DNP3", "false").lower() == "true"
+
+# Marcador de um campo variável dentro do documento serializado
+_MARKER = "\x00slot:"
+_CONSTANTS = {None: "null", True: "true", False: "false"}
+
+
+class Slot:
+
+    """Campo variável de um modelo, preenchido em `PayloadTemplate.render`."""
+
+    __slots__ = ("name",)
+
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return f"Slot({self.name!r})"
+
+
+class Raw:
+
+    """Trecho JSON já codificado, inserido sem alteração em um `Slot`."""
+
+    __slots__ = ("text",)
+
+    def __init__(self, text):
+        self.text = text
+
+
+def json_array(items, indent=4):
+    """Monta um array JSON (`Raw`) a partir de elementos já codificados, no formato de `json.dumps`."""
+    if not items:
+        return Raw("[]")
+    if indent is None:
+        return Raw("[" + ", ".join(items) + "]")
+    margin = "\n" + " " * indent
+    return Raw("[" + margin + ("," + margin).join(item.replace("\n", margin) for item in items) + "\n]")
+
+
+class PayloadTemplate:
+
+    """
+    Documento JSON com campos variáveis (`Slot`) serializado uma única vez.
+
+    O documento é convertido com os mesmos parâmetros de `json.dumps` usados
+    no envio e dividido nos pontos dos campos variáveis. `render` junta as
+    partes fixas com os valores codificados, produzindo o mesmo texto que
+    `json.dumps` do documento completo.
+    """
+
+    def __init__(self, document, indent=4, ensure_ascii=False):
+        self.indent = indent
+        self.ensure_ascii = ensure_ascii
+        self._encode_string = encode_basestring_ascii if ensure_ascii else encode_basestring
+        text = json.dumps(document, indent=indent, ensure_ascii=ensure_ascii, default=self._mark)
+
+        self.parts = []
+        self.slots = []
+        self._margins = []
+        marker = json.dumps(_MARKER)[:-1]  # '"\u0000slot:' (caractere de controle sempre escapado)
+        position = 0
+        while True:
+            start = text.find(marker, position)
+            if start < 0:
+                break
+            end = text.index('"', start + 1) + 1
+            name = json.loads(text[start:end])[len(_MARKER):]
+            part = text[position:start]
+            self.parts.append(part)
+            self.slots.append(name)
+            # Recuo da linha do campo, para valores compostos (dict/list) com indent
+            line = part[part.rfind("\n") + 1:]
+            self._margins.append("\n" + line[:len(line) - len(line.lstrip(" "))])
+            position = end
+        self.parts.append(text[position:])
+
+    @staticmethod
+    def _mark(value):
+        if isinstance(value, Slot):
+            return _MARKER + value.name
+        raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+    def render(self, **values):
+        """Retorna o documento em texto com os campos variáveis preenchidos por `values`."""
+        output = [self.parts[0]]
+        for name, margin, part in zip(self.slots, self._margins, self.parts[1:]):
+            output.append(self._encode(values[name], margin))
+            output.append(part)
+        return "".join(output)
+
+    def _encode(self, value, margin):
+        # Caminho rápido para os tipos simples, com a mesma saída de json.dumps
+        kind = type(value)
+        if kind is float and value - value == 0:  # finito (NaN e infinito ficam com json.dumps)
+            return float.__repr__(value)
+        if kind is int:
+            return int.__repr__(value)
+        if kind is str:
+            return self._encode_string(value)
+        if value is None or kind is bool:
+            return _CONSTANTS[value]
+        if kind is Raw:
+            return value.text if self.indent is None else value.text.replace("\n", margin)
+        if self.indent is None or not isinstance(value, (dict, list, tuple)):
+            return json.dumps(value, ensure_ascii=self.ensure_ascii)
+        return json.dumps(value, indent=self.indent, ensure_ascii=self.ensure_ascii).replace("\n", margin)
+
+
+class TemplateCache:
+
+    """
+    Modelos por chave (ex.: protocolo e xid_sensor), montados por
+    `builder(snapshot, *chave)` a partir da configuração em memória.
+
+    Quando a configuração muda (nova cópia em `store`) todos os modelos são
+    descartados e remontados no próximo uso. `builder` retorna o documento
+    com os `Slot` ou None quando a chave não existe na configuração.
+
+    Com uma cópia parcial (`snapshot.complete` False, lida por equipamento)
+    o modelo é montado para a chamada e não é guardado.
+    """
+
+    def __init__(self, builder, store=config_snapshot, indent=4):
+        self.builder = builder
+        self.store = store
+        self.indent = indent
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._templates = {}
+
+    def get(self, *key, snapshot=None):
+        if snapshot is None:
+            snapshot = self.store.current()
+        elif not snapshot.complete:
+            return self._build(snapshot, key)
+        with self._lock:
+            if snapshot is not self._snapshot:
+                self._snapshot, self._templates = snapshot, {}
+            templates = self._templates
+        if key not in templates:
+            templates[key] = self._build(snapshot, key)
+        return templates[key]
+
+    def _build(self, snapshot, key):
+        document = self.builder(snapshot, *key)
+        return PayloadTemplate(document, indent=self.indent) if document is not None else None
+
+    def clear(self):
+        with self._lock:
+            self._snapshot, self._templates = None, {}
@@ -7,11 +7,14 @@
 # TODOS OS DIREITOS RESERVADOS A CONTROL ENGENHARIA
 # #############################################################
 import pika
-
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError, wait as wait_futures
 
 from dotenv import load_dotenv
 import os
 from logger import *
+from serializers import SERIALIZERS, SerializerRoutes, pack, unpack
 # Carregando as variáveis de ambiente do arquivo .env
 load_dotenv()
 
@@ -24,41 +27,649 @@ RABBIT_CAMINHO=os.getenv("RABBIT_CAMINHO")
 RABBIT_TOPICO=os.getenv("RABBIT_TOPICO")
 RABBIT_CHAVE=os.getenv("RABBIT_CHAVE")
 
+# Lista de brokers "host:porta,host:porta" (padrão: RABBIT_HOST:RABBIT_PORT) e política
+# de escolha: priority (failover na ordem da lista), round_robin ou least_outstanding
+RABBIT_HOSTS=os.getenv("RABBIT_HOSTS", "")
+RABBIT_POLICY=os.getenv("RABBIT_POLICY", "priority").lower()
 
-def check_rabbitmq_connection():
+# Protocolo de envio: amqp (pika) ou mqtt (paho-mqtt, veja mqtt.py). Com mqtt a
+# lista de brokers vem de MQTT_HOSTS (padrão: RABBIT_HOST na porta MQTT_PORT)
+RABBIT_TRANSPORT=os.getenv("RABBIT_TRANSPORT", "amqp").lower()
+MQTT_HOSTS=os.getenv("MQTT_HOSTS", "")
+
+# Conexão de longa duração: heartbeat AMQP (s), tempo máximo bloqueado pelo broker (s),
+# intervalo mínimo/máximo entre tentativas de reconexão (s) e tempo de espera por envio (s)
+RABBIT_HEARTBEAT=int(os.getenv("RABBIT_HEARTBEAT", 30))
+RABBIT_BLOCKED_TIMEOUT=int(os.getenv("RABBIT_BLOCKED_TIMEOUT", 60))
+RABBIT_RECONNECT_MIN=float(os.getenv("RABBIT_RECONNECT_MIN", 1))
+RABBIT_RECONNECT_MAX=float(os.getenv("RABBIT_RECONNECT_MAX", 30))
+RABBIT_PUBLISH_TIMEOUT=float(os.getenv("RABBIT_PUBLISH_TIMEOUT", 5))
+
+# Publisher confirms: só considera a mensagem enviada quando o broker confirmar (ack)
+RABBIT_CONFIRMS=os.getenv("RABBIT_CONFIRMS", "true").lower() in ("1", "true", "sim", "yes")
+
+# Agrupamento de mensagens: várias mensagens da mesma routing key viram uma única
+# mensagem AMQP (array JSON) ao atingir o número máximo de mensagens, o tamanho
+# máximo em bytes ou o tempo máximo de espera (ms)
+RABBIT_BATCH=os.getenv("RABBIT_BATCH", "false").lower() in ("1", "true", "sim", "yes")
+RABBIT_BATCH_MAX_MESSAGES=int(os.getenv("RABBIT_BATCH_MAX_MESSAGES", 100))
+RABBIT_BATCH_MAX_BYTES=int(os.getenv("RABBIT_BATCH_MAX_BYTES", 65536))
+RABBIT_BATCH_LINGER_MS=float(os.getenv("RABBIT_BATCH_LINGER_MS", 100))
+
+
+class RabbitPublisher:
+
+    """
+    Publicador AMQP com uma única conexão de longa duração por processo.
+
+    A conexão (pika.SelectConnection) e o canal pertencem a uma thread de I/O
+    própria, iniciada na primeira utilização. A fila é declarada uma única vez
+    ao abrir o canal, os heartbeats AMQP mantêm a conexão viva e as
+    notificações `connection.blocked`/`unblocked` do broker suspendem o envio
+    (controle de fluxo). Se a conexão cair, a thread reconecta com backoff
+    exponencial entre RABBIT_RECONNECT_MIN e RABBIT_RECONNECT_MAX segundos.
+
+    As outras threads apenas entregam a mensagem à thread de I/O
+    (`publish_async`), sem abrir conexões.
+
+    Com RABBIT_CONFIRMS o canal fica em modo publisher confirms: várias
+    mensagens podem aguardar confirmação ao mesmo tempo e cada Future só é
+    resolvido quando o broker confirma (ack → True) ou rejeita (nack → False)
+    aquela delivery tag. Se o canal cair, as mensagens sem confirmação são
+    resolvidas com False.
+    """
+
+    def __init__(self, host=RABBIT_HOST, port=RABBIT_PORT, username=RABBIT_USER, password=RABBIT_PASS,
+                 exchange=RABBIT_CAMINHO, queue=RABBIT_TOPICO, routing_key=RABBIT_CHAVE,
+                 confirms=RABBIT_CONFIRMS):
+        self.host = host
+        self.port = int(port) if port else 5672
+        self.username = username
+        self.password = password
+        self.exchange = exchange
+        self.queue = queue
+        self.routing_key = routing_key
+        self.confirms = confirms
+
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._connection = None
+        self._channel = None
+        self._ready = threading.Event()
+        self._blocked = threading.Event()
+        self._stop_event = threading.Event()
+        self._backoff = RABBIT_RECONNECT_MIN
+
+        # Mensagens aguardando confirmação do broker (usados só na thread de I/O)
+        self._delivery_tag = 0
+        self._outstanding = {}
+
+    # ---------------------------------------------------------
+    # API usada pelas outras threads
+    # ---------------------------------------------------------
+    def start(self):
+        """Inicia a thread de I/O (uma vez por processo)."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._ready.clear()
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name=f"rabbitmq-{self.host}", daemon=True)
+            self._thread.start()
+
+    def wait_ready(self, timeout=None):
+        """Aguarda a conexão e o canal estarem prontos. Retorna True se prontos."""
+        self.start()
+        return self._ready.wait(timeout)
+
+    def is_connected(self):
+        return self._ready.is_set()
+
+    def is_blocked(self):
+        return self._blocked.is_set()
+
+    def outstanding(self):
+        """Quantidade de mensagens publicadas aguardando confirmação do broker."""
+        return len(self._outstanding)
+
+    def publish_async(self, payload, routing_key=None, properties=None):
+        """
+        Entrega a mensagem à thread de I/O e retorna imediatamente.
+
+        Returns:
+            Future: resolvido com True quando a mensagem for publicada (ou
+            confirmada pelo broker, com RABBIT_CONFIRMS) ou False se não
+            houver conexão, se o broker estiver bloqueando publicações,
+            se ela for rejeitada (nack) ou em caso de erro.
+        """
+        self.start()
+        future = Future()
+        connection = self._connection
+        if not self._ready.is_set() or connection is None:
+            future.set_result(False)
+            return future
+        if self._blocked.is_set():
+            future.set_result(False)
+            return future
+        try:
+            connection.ioloop.add_callback_threadsafe(
+                lambda: self._do_publish(payload, routing_key or self.routing_key, properties, future))
+        except Exception as e:
+            logger.error(f"Erro ao enviar dados para ao RabbitMQ: {e}")
+            future.set_result(False)
+        return future
+
+    def publish(self, payload, routing_key=None, properties=None, timeout=RABBIT_PUBLISH_TIMEOUT):
+        """Publica e aguarda o resultado por até `timeout` segundos."""
+        future = self.publish_async(payload, routing_key, properties)
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            return False
+
+    def close(self):
+        """Fecha a conexão e encerra a thread de I/O."""
+        self._stop_event.set()
+        connection = self._connection
+        if connection is not None:
+            try:
+                connection.ioloop.add_callback_threadsafe(self._close_connection)
+            except Exception:
+                pass
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+
+    # ---------------------------------------------------------
+    # Thread de I/O
+    # ---------------------------------------------------------
+    def _run(self):
+        while not self._stop_event.is_set():
+            credentials = pika.PlainCredentials(self.username, self.password)
+            parameters = pika.ConnectionParameters(
+                host=self.host, port=self.port, credentials=credentials,
+                heartbeat=RABBIT_HEARTBEAT, blocked_connection_timeout=RABBIT_BLOCKED_TIMEOUT,
+                connection_attempts=1)
+            try:
+                self._connection = pika.SelectConnection(
+                    parameters=parameters,
+                    on_open_callback=self._on_connection_open,
+                    on_open_error_callback=self._on_connection_open_error,
+                    on_close_callback=self._on_connection_closed)
+                self._connection.add_on_connection_blocked_callback(self._on_connection_blocked)
+                self._connection.add_on_connection_unblocked_callback(self._on_connection_unblocked)
+                self._connection.ioloop.start()
+            except Exception as e:
+                print(f"Erro na conexão com RabbitMQ: {e}")
+                logger.error(f"Erro na conexão com RabbitMQ: {e}")
+            finally:
+                self._ready.clear()
+                self._blocked.clear()
+                self._channel = None
+                if self._connection is not None:
+                    self._connection.ioloop.close()
+
+            if self._stop_event.wait(self._backoff):
+                break
+            self._backoff = min(self._backoff * 2, RABBIT_RECONNECT_MAX)
+
+    def _close_connection(self):
+        if self._connection is not None and not (self._connection.is_closing or self._connection.is_closed):
+            self._connection.close()
+
+    def _on_connection_open(self, connection):
+        connection.channel(on_open_callback=self._on_channel_open)
+
+    def _on_connection_open_error(self, connection, error):
+        print(f"Erro ao conectar com RabbitMQ {self.host}:{self.port}: {error!r}")
+        logger.error(f"Erro ao conectar com RabbitMQ {self.host}:{self.port}: {error!r}")
+        connection.ioloop.stop()
+
+    def _on_connection_closed(self, connection, reason):
+        self._ready.clear()
+        self._channel = None
+        self._fail_outstanding()
+        if not self._stop_event.is_set():
+            print(f"Conexão com RabbitMQ encerrada: {reason}")
+            logger.error(f"Conexão com RabbitMQ encerrada: {reason}")
+        connection.ioloop.stop()
+
+    def _on_connection_blocked(self, connection, method):
+        print("RabbitMQ bloqueou as publicações (connection.blocked)")
+        logger.warning("RabbitMQ bloqueou as publicações (connection.blocked)")
+        self._blocked.set()
+
+    def _on_connection_unblocked(self, connection, method):
+        print("RabbitMQ liberou as publicações (connection.unblocked)")
+        logger.warning("RabbitMQ liberou as publicações (connection.unblocked)")
+        self._blocked.clear()
+
+    def _on_channel_open(self, channel):
+        self._channel = channel
+        self._delivery_tag = 0
+        channel.add_on_close_callback(self._on_channel_closed)
+        if self.confirms:
+            channel.confirm_delivery(
+                ack_nack_callback=self._on_delivery_confirmation,
+                callback=lambda frame: channel.queue_declare(queue=self.queue, callback=self._on_queue_declareok))
+        else:
+            channel.queue_declare(queue=self.queue, callback=self._on_queue_declareok)
+
+    def _on_channel_closed(self, channel, reason):
+        self._ready.clear()
+        self._channel = None
+        self._fail_outstanding()
+        logger.error(f"Canal do RabbitMQ encerrado: {reason}")
+        self._close_connection()
+
+    def _on_queue_declareok(self, frame):
+        print("Conexão com RabbitMQ foi bem-sucedida!")
+        self._backoff = RABBIT_RECONNECT_MIN
+        self._ready.set()
+
+    def _do_publish(self, payload, routing_key, properties, future):
+        channel = self._channel
+        if channel is None or not channel.is_open:
+            future.set_result(False)
+            return
+        try:
+            channel.basic_publish(
+                exchange=self.exchange, routing_key=routing_key, body=payload, properties=properties)
+            if self.confirms:
+                self._delivery_tag += 1
+                self._outstanding[self._delivery_tag] = future
+            else:
+                future.set_result(True)
+        except Exception as e:
+            print(f"Erro ao enviar dados para ao RabbitMQ: {e}")
+            logger.error(f"Erro ao enviar dados para ao RabbitMQ: {e}")
+            future.set_result(False)
+
+
+    def _on_delivery_confirmation(self, frame):
+        """Resolve os Futures confirmados (ack) ou rejeitados (nack) pelo broker."""
+        method = frame.method
+        ack = isinstance(method, pika.spec.Basic.Ack)
+        if method.multiple:
+            tags = [tag for tag in self._outstanding if tag <= method.delivery_tag]
+        else:
+            tags = [method.delivery_tag]
+        for tag in tags:
+            future = self._outstanding.pop(tag, None)
+            if future is not None and not future.done():
+                future.set_result(ack)
+        if not ack:
+            logger.error(f"RabbitMQ rejeitou {len(tags)} mensagem(ns) (nack)")
+
+    def _fail_outstanding(self):
+        outstanding, self._outstanding = self._outstanding, {}
+        for future in outstanding.values():
+            if not future.done():
+                future.set_result(False)
+
+
+class MessageBatcher:
+
+    """
+    Agrupa mensagens antes de publicá-las.
+
+    As mensagens são acumuladas por routing key e formato e publicadas como
+    uma única mensagem AMQP contendo um array (no formato da routing key,
+    veja `serializers`) quando o lote atinge `max_messages` mensagens,
+    `max_bytes` bytes ou quando o primeiro item do lote espera mais que
+    `linger` segundos. Cada mensagem é convertida uma vez, em `add` (as que
+    já vêm convertidas da fila não são tocadas), e o lote só junta os
+    corpos. Cada chamada de `add` recebe um Future que é resolvido com o
+    resultado da publicação do lote inteiro.
+
+    Os lotes vencidos são publicados por uma thread própria, iniciada no
+    primeiro uso.
+    """
+
+    def __init__(self, publisher, max_messages=RABBIT_BATCH_MAX_MESSAGES, max_bytes=RABBIT_BATCH_MAX_BYTES,
+                 linger=RABBIT_BATCH_LINGER_MS / 1000.0, serializers=None):
+        self.publisher = publisher
+        self.serializers = serializers or SerializerRoutes()
+        self.max_messages = max(1, int(max_messages))
+        self.max_bytes = max(1, int(max_bytes))
+        self.linger = max(0.0, float(linger))
+
+        self._cond = threading.Condition()
+        self._batches = {}
+        self._thread = None
+        self._pid = None
+        self._stop = False
+
+    class _Batch:
+        def __init__(self, deadline, serializer):
+            self.deadline = deadline
+            self.serializer = serializer
+            self.bodies = []
+            self.futures = []
+            self.size = 5  # cabeçalho do array
+
+    def add(self, payload, routing_key=None):
+        """
+        Acrescenta uma mensagem (texto JSON ou conteúdo da fila gravado por
+        `serializers.pack`) ao lote da routing key.
+
+        Returns:
+            Future: resolvido com True quando o lote for publicado (confirmado
+            pelo broker, com RABBIT_CONFIRMS) ou False em caso de falha.
+        """
+        routing_key = routing_key or self.publisher.routing_key
+        serializer, body = encode_body(payload, routing_key, self.serializers)
+        size = len(body.encode("utf-8") if isinstance(body, str) else body) + 1
+        key = (routing_key, serializer.name)
+        future = Future()
+        ready = []
+        with self._cond:
+            self._start()
+            batch = self._batches.get(key)
+            if batch is not None and batch.size + size > self.max_bytes:
+                ready.append((routing_key, self._batches.pop(key)))
+                batch = None
+            if batch is None:
+                batch = self._batches[key] = self._Batch(time.monotonic() + self.linger, serializer)
+                self._cond.notify()
+            batch.bodies.append(body)
+            batch.futures.append(future)
+            batch.size += size
+            if len(batch.bodies) >= self.max_messages or batch.size >= self.max_bytes:
+                ready.append((routing_key, self._batches.pop(key)))
+        for key, full in ready:
+            self._publish(key, full)
+        return future
+
+    def flush(self):
+        """Publica imediatamente todos os lotes pendentes."""
+        with self._cond:
+            ready, self._batches = list(self._batches.items()), {}
+        for (routing_key, _), batch in ready:
+            self._publish(routing_key, batch)
+
+    def close(self):
+        """Publica os lotes pendentes e encerra a thread."""
+        with self._cond:
+            self._stop = True
+            self._cond.notify()
+        self.flush()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+
+    def _start(self):
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, name="rabbitmq-batcher", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if self._stop:
+                    return
+                now = time.monotonic()
+                expired = [key for key, batch in self._batches.items() if batch.deadline <= now]
+                ready = [(key, self._batches.pop(key)) for key in expired]
+                if not ready:
+                    deadlines = [batch.deadline for batch in self._batches.values()]
+                    self._cond.wait(min(deadlines) - now if deadlines else None)
+                    continue
+            for (routing_key, _), batch in ready:
+                self._publish(routing_key, batch)
+
+    def _publish(self, routing_key, batch):
+        try:
+            properties = pika.BasicProperties(content_type=batch.serializer.content_type,
+                                              headers={"batch_size": len(batch.bodies)})
+            body = batch.serializer.join(batch.bodies)
+            result = self.publisher.publish_async(body, routing_key, properties)
+        except Exception as e:
+            logger.error(f"Erro ao enviar lote para o RabbitMQ: {e}")
+            result = Future()
+            result.set_result(False)
+
+        def resolve(done, futures=batch.futures):
+            ok = not done.cancelled() and done.exception() is None and bool(done.result())
+            for future in futures:
+                if not future.done():
+                    future.set_result(ok)
+
+        result.add_done_callback(resolve)
+
+
+class BrokerPool:
+
+    """
+    Conjunto de brokers RabbitMQ com a mesma API de `RabbitPublisher`.
+
+    Cada broker tem o seu próprio `RabbitPublisher` (conexão e thread de I/O)
+    e é considerado saudável quando está conectado e não está bloqueado pelo
+    controle de fluxo. A cada publicação um broker saudável é escolhido pela
+    política:
+
+    - priority: o primeiro saudável na ordem da lista (failover). Quando o
+      broker preferido volta, ele volta a ser usado (failback);
+    - round_robin: alterna entre os saudáveis;
+    - least_outstanding: o que tiver menos mensagens aguardando confirmação.
+    """
+
+    POLICIES = ("priority", "round_robin", "least_outstanding")
+
+    def __init__(self, publishers, policy=RABBIT_POLICY):
+        if not publishers:
+            raise ValueError("Nenhum broker RabbitMQ configurado")
+        if policy not in self.POLICIES:
+            raise ValueError(f"Política de brokers inválida: {policy}")
+        self.publishers = list(publishers)
+        self.policy = policy
+        self._lock = threading.Lock()
+        self._next = 0
+
+    @property
+    def routing_key(self):
+        return self.publishers[0].routing_key
+
+    @staticmethod
+    def is_healthy(publisher):
+        return publisher.is_connected() and not publisher.is_blocked()
+
+    def start(self):
+        for publisher in self.publishers:
+            publisher.start()
+
+    def wait_ready(self, timeout=None):
+        """Aguarda até algum broker estar pronto. Retorna True se houver um."""
+        self.start()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            if any(publisher.is_connected() for publisher in self.publishers):
+                return True
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+
+    def is_connected(self):
+        return any(publisher.is_connected() for publisher in self.publishers)
+
+    def is_blocked(self):
+        return not any(self.is_healthy(publisher) for publisher in self.publishers)
+
+    def outstanding(self):
+        return sum(publisher.outstanding() for publisher in self.publishers)
+
+    def select(self):
+        """Escolhe o broker para a próxima publicação ou None se nenhum estiver saudável."""
+        healthy = [publisher for publisher in self.publishers if self.is_healthy(publisher)]
+        if not healthy:
+            return None
+        if self.policy == "round_robin":
+            with self._lock:
+                self._next = (self._next + 1) % len(healthy)
+                return healthy[self._next]
+        if self.policy == "least_outstanding":
+            return min(healthy, key=lambda publisher: publisher.outstanding())
+        return healthy[0]
+
+    def publish_async(self, payload, routing_key=None, properties=None):
+        self.start()
+        publisher = self.select()
+        if publisher is None:
+            future = Future()
+            future.set_result(False)
+            return future
+        return publisher.publish_async(payload, routing_key, properties)
+
+    def publish(self, payload, routing_key=None, properties=None, timeout=RABBIT_PUBLISH_TIMEOUT):
+        future = self.publish_async(payload, routing_key, properties)
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            return False
+
+    def close(self):
+        for publisher in self.publishers:
+            publisher.close()
+
+    def status(self):
+        """Situação de cada broker, para o health check."""
+        return [{
+            "host": f"{publisher.host}:{publisher.port}",
+            "conectado": publisher.is_connected(),
+            "bloqueado": publisher.is_blocked(),
+            "aguardando_confirmacao": publisher.outstanding(),
+        } for publisher in self.publishers]
+
+
+def parse_brokers(hosts, default_port=5672):
+
+    """
+    Converte "host:porta,host:porta" em uma lista de (host, porta).
+
+    Hosts sem porta usam `default_port`.
+    """
+
+    brokers = []
+    for item in (hosts or "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        host, _, port = item.rpartition(":") if ":" in item else (item, "", "")
+        brokers.append((host, int(port) if port else int(default_port or 5672)))
+    return brokers
+
+
+def create_publisher(transport=RABBIT_TRANSPORT):
+
+    """
+    Cria o conjunto de brokers do protocolo configurado em RABBIT_TRANSPORT.
+
+    O paho-mqtt só é importado quando o transporte mqtt é usado.
+    """
+
+    if transport == "mqtt":
+        from mqtt import MqttPublisher, MQTT_PORT
+        return BrokerPool([
+            MqttPublisher(host=host, port=port)
+            for host, port in parse_brokers(MQTT_HOSTS or RABBIT_HOST or "localhost", MQTT_PORT)
+        ])
+    if transport != "amqp":
+        raise ValueError(f"Transporte inválido: {transport}")
+    return BrokerPool([
+        RabbitPublisher(host=host, port=port)
+        for host, port in parse_brokers(RABBIT_HOSTS or RABBIT_HOST or "localhost", RABBIT_PORT)
+    ])
+
+
+def encode_body(payload, routing_key, routes):
 
     """
-    Verifica se a conexão com o Broker RabbitMQ pode ser estabelecida.
+    Corpo da mensagem no formato de envio.
 
-    Esta função lê as variáveis de configuração do RabbitMQ e tenta
-    estabelecer uma conexão com o Broker. Se a conexão for bem-sucedida,
-    a função retorna True, caso contrário retorna False.
+    O conteúdo gravado na fila já convertido (`serializers.pack`) segue como
+    está. Texto JSON é convertido para o formato da routing key; se a
+    conversão falhar a mensagem segue em JSON, como foi gerada, para não
+    ficar presa na fila.
 
     Returns:
-        bool: True se a conexão foi bem-sucedida, False caso contrário.
+        tuple: (Serializer, corpo)
     """
 
+    serializer, body = unpack(payload)
+    if serializer is not None:
+        return serializer, body
+    serializer = routes.for_route(routing_key)
     try:
-        # Configurando as credenciais
-        credentials = pika.PlainCredentials(RABBIT_USER, RABBIT_PASS)
+        return serializer, serializer.transcode(body)
+    except Exception as e:
+        logger.error(f"Erro ao converter mensagem para {serializer.name}, enviando em json: {e}")
+        return SERIALIZERS["json"], body
 
-        # Configurando os parâmetros de conexão
-        connection_params = pika.ConnectionParameters(
-            host=RABBIT_HOST, port=RABBIT_PORT, credentials=credentials)
 
-        # Tentando estabelecer a conexão
-        connection = pika.BlockingConnection(connection_params)
+def encode_message(payload, routing_key, routes):
+
+    """
+    Corpo (veja `encode_body`) e propriedades AMQP com o content type do formato.
+
+    Returns:
+        tuple: (corpo, pika.BasicProperties)
+    """
+
+    serializer, body = encode_body(payload, routing_key, routes)
+    return body, pika.BasicProperties(content_type=serializer.content_type)
+
+
+def encode_for_queue(text, routing_key=None):
+
+    """
+    Converte a mensagem (texto JSON) para o formato da routing key ao
+    enfileirá-la (`serializers.pack`), para ela ser convertida uma única vez.
+    Se a conversão falhar a mensagem é gravada como texto e segue em JSON.
+
+    Returns:
+        str | bytes: Conteúdo a gravar na fila.
+    """
+
+    serializer = serializers.for_route(routing_key or publisher.routing_key)
+    try:
+        return pack(text, serializer)
+    except Exception as e:
+        logger.error(f"Erro ao converter mensagem para {serializer.name}, gravando em json: {e}")
+        return text
 
-        # Se chegou aqui, a conexão foi bem-sucedida
-        print("Conexão com RabbitMQ foi bem-sucedida!")
-        #connection.close()  # Fechando a conexão
-        return connection
 
-    except pika.exceptions.AMQPConnectionError as e:
-        print(f"Erro ao checar conexão com RabbitMQ: {e}")
-        logger.error(f"Erro ao checar conexão como RabbitMQ: {e}")
-        
-        return False
+# Publicador compartilhado pelo processo (as conexões só são abertas no primeiro uso)
+publisher = create_publisher()
+
+# Formato das mensagens por routing key (RABBIT_SERIALIZER e RABBIT_SERIALIZER_ROUTES)
+serializers = SerializerRoutes()
+
+# Agrupador opcional de mensagens (RABBIT_BATCH)
+batcher = MessageBatcher(publisher, serializers=serializers) if RABBIT_BATCH else None
+
+
+def check_rabbitmq_connection():
+
+    """
+    Verifica se a conexão com o Broker RabbitMQ está estabelecida.
+
+    Usa as conexões de longa duração do `publisher` (iniciando-as se preciso)
+    e aguarda até RABBIT_PUBLISH_TIMEOUT segundos por algum broker. Não abre
+    uma conexão nova a cada chamada.
+
+    Returns:
+        bool: True se a conexão está pronta, False caso contrário.
+    """
+
+    if publisher.wait_ready(RABBIT_PUBLISH_TIMEOUT):
+        return True
+
+    print("Erro ao checar conexão com RabbitMQ: conexão indisponível")
+    logger.error("Erro ao checar conexão como RabbitMQ: conexão indisponível")
+    return False
 
 
 
@@ -77,22 +688,54 @@ def send_rabbitmq(payload=str):
         bool: True se a mensagem foi enviada com sucesso, False caso contrário.
     """
     
-    try:
-        credentials = pika.PlainCredentials(RABBIT_USER, RABBIT_PASS)
-        # Configurando os parâmetros de conexão
-        connection_params = pika.ConnectionParameters(
-            host=RABBIT_HOST, port=RABBIT_PORT, credentials=credentials)
-        connection = pika.BlockingConnection(connection_params)
-        channel = connection.channel()
-        channel.queue_declare(queue=RABBIT_TOPICO)
-
-        channel.basic_publish(
-            exchange=RABBIT_CAMINHO, routing_key=RABBIT_CHAVE, body=payload)
-
-        connection.close()
-        return True
+    body, properties = encode_message(payload, publisher.routing_key, serializers)
+    status = publisher.publish(body, properties=properties)
+    if not status:
+        print("Erro ao enviar dados para ao RabbitMQ")
+        logger.error("Erro ao enviar dados para ao RabbitMQ")
+    return status
+
+
+def send_rabbitmq_async(payload=str, routing_key=None):
+
+    """
+    Publica uma mensagem no RabbitMQ sem aguardar a confirmação do broker.
+
+    Com RABBIT_BATCH a mensagem é acumulada no lote da routing key e
+    publicada junto com as demais (veja `MessageBatcher`). Sem `routing_key`
+    é usada RABBIT_CHAVE. A mensagem é enviada no formato da routing key
+    (`serializers`).
+
+    Returns
+    -------
+        Future: resolvido com True quando o broker confirmar a mensagem.
+    """
+
+    if batcher is not None:
+        return batcher.add(payload, routing_key)
+    body, properties = encode_message(payload, routing_key or publisher.routing_key, serializers)
+    return publisher.publish_async(body, routing_key, properties)
+
+
+def wait_confirms(pending, timeout=RABBIT_PUBLISH_TIMEOUT):
+
+    """
+    Aguarda as confirmações de várias mensagens publicadas com `send_rabbitmq_async`.
+
+    Parameter
+    ----------
+    pending : list[tuple]
+        Lista de (chave, Future), por exemplo (id do registro, Future).
+    timeout : float
+        Tempo máximo total de espera, em segundos.
+
+    Returns
+    -------
+        list: Chaves das mensagens confirmadas pelo broker. As rejeitadas (nack)
+        ou sem confirmação dentro do prazo não são incluídas.
+    """
 
-    except pika.exceptions.AMQPConnectionError as e:
-        print(f"Erro ao enviar dados para ao RabbitMQ: {e}")
-        logger.error(f"Erro ao enviar dados para ao RabbitMQ: {e}")
-        return False
+    if not pending:
+        return []
+    wait_futures([future for _, future in pending], timeout=timeout)
+    return [key for key, future in pending if future.done() and future.result()]
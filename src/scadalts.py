@@ -12,6 +12,9 @@ import json
 from io import BytesIO
 import time
 import re
+import threading
+from collections import OrderedDict, deque
+from contextlib import contextmanager
 from dotenv import load_dotenv
 import os
 from logger import *
@@ -23,27 +26,234 @@ password = os.getenv("password")
 URL_BASE = os.getenv("URL_BASE")
 AUTH_URL = f"{URL_BASE}/Scada-LTS/api/auth/{username}/{password}"
 
-# Cache do cookie e tempo de expiração
+# Leitura em lote de valores de datapoints (vários xid_sensor por requisição):
+# opcional, só é usada com SCADA_BATCH_URL configurada (POST com a lista de xid,
+# resposta com a lista de valores); sem ela a leitura é ponto a ponto
+SCADA_BATCH_URL = os.getenv("SCADA_BATCH_URL", "")
+SCADA_BATCH_SIZE = int(os.getenv("SCADA_BATCH_SIZE", 100))
+
+# Quantidade máxima de requisições simultâneas ao Scada-LTS (CurlMulti)
+SCADA_MAX_CONCURRENT = int(os.getenv("SCADA_MAX_CONCURRENT", 16))
+
+# Quantidade de handles pycurl ociosos mantidos no pool de conexões
+SCADA_POOL_SIZE = int(os.getenv("SCADA_POOL_SIZE", 16))
+
+# Cache de valores de datapoints: validade (s) e quantidade máxima de pontos
+SCADA_CACHE_TTL = float(os.getenv("SCADA_CACHE_TTL", 1))
+SCADA_CACHE_SIZE = int(os.getenv("SCADA_CACHE_SIZE", 4096))
+
+# Timeouts das requisições ao Scada-LTS (segundos)
+SCADA_CONNECT_TIMEOUT = float(os.getenv("SCADA_CONNECT_TIMEOUT", 3))
+SCADA_TIMEOUT = float(os.getenv("SCADA_TIMEOUT", 10))
+
+# Circuit breaker: falhas seguidas para abrir, tempo aberto (s) e requisições de teste
+SCADA_BREAKER_THRESHOLD = int(os.getenv("SCADA_BREAKER_THRESHOLD", 5))
+SCADA_BREAKER_RESET_TIMEOUT = float(os.getenv("SCADA_BREAKER_RESET_TIMEOUT", 30))
+SCADA_BREAKER_HALF_OPEN_PROBES = int(os.getenv("SCADA_BREAKER_HALF_OPEN_PROBES", 1))
+
+# Validade da sessão do Scada-LTS e antecedência da renovação em segundo plano (segundos)
+SCADA_SESSION_TTL = int(os.getenv("SCADA_SESSION_TTL", 3600))
+SCADA_SESSION_REFRESH_MARGIN = int(os.getenv("SCADA_SESSION_REFRESH_MARGIN", 300))
+
+# Requisição leve, autenticada, usada pelo health check para validar a sessão no Scada-LTS
+SCADA_SESSION_CHECK_URL = os.getenv("SCADA_SESSION_CHECK_URL", f"{URL_BASE}/Scada-LTS/api/auth/isLogged/{username}")
+
+# Cache do cookie e tempo de expiração (mantido apenas em memória)
 cookie_cache = {
     "value": None,
     "expires_at": 0
 }
 
+# Indica se o Scada-LTS aceita a leitura em lote (None = ainda não testado)
+batch_support = {
+    "enabled": None
+}
+
+class ScadaUnavailableError(ConnectionError):
+    """Requisição recusada sem acessar a rede porque o circuito do Scada-LTS está aberto."""
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker (fechado/aberto/semiaberto) das requisições ao Scada-LTS.
+
+    - CLOSED: requisições liberadas; `failure_threshold` falhas seguidas abrem o circuito.
+    - OPEN: requisições recusadas na hora, sem acessar a rede, por `reset_timeout` segundos.
+    - HALF_OPEN: libera até `half_open_probes` requisições de teste; um sucesso
+      fecha o circuito e uma falha o abre novamente.
+
+    São consideradas falhas os erros de transporte (conexão recusada, timeout)
+    e respostas 5xx; qualquer outra resposta HTTP indica que o servidor está no ar.
+    """
+
+    CLOSED = "CLOSED"
+    OPEN = "OPEN"
+    HALF_OPEN = "HALF_OPEN"
+
+    def __init__(self, failure_threshold=SCADA_BREAKER_THRESHOLD,
+                 reset_timeout=SCADA_BREAKER_RESET_TIMEOUT,
+                 half_open_probes=SCADA_BREAKER_HALF_OPEN_PROBES):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_probes = half_open_probes
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._probes = 0
+        self._opened_at = 0
+
+    def _current_state(self):
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._probes = 0
+        return self._state
+
+    @property
+    def state(self):
+        """Estado atual do circuito: CLOSED, OPEN ou HALF_OPEN."""
+        with self._lock:
+            return self._current_state()
+
+    def is_available(self):
+        """Indica se vale a pena tentar acessar o Scada-LTS (circuito não está aberto)."""
+        return self.state != self.OPEN
+
+    def allow_request(self):
+        """Reserva uma requisição. Retorna False se ela deve falhar imediatamente."""
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and self._probes < self.half_open_probes:
+                self._probes += 1
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self._state != self.CLOSED:
+                print("Scada-LTS respondeu novamente. Circuito fechado.")
+                logger.warning("Scada-LTS respondeu novamente. Circuito fechado.")
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probes = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    print(f"Scada-LTS indisponível. Circuito aberto por {self.reset_timeout}s.")
+                    logger.error(f"Scada-LTS indisponível. Circuito aberto por {self.reset_timeout}s.")
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._probes = 0
+
+    def record_response(self, status_code):
+        """Registra o resultado de uma resposta HTTP recebida."""
+        if not status_code or status_code >= 500:
+            self.record_failure()
+        else:
+            self.record_success()
+
+
+# Circuit breaker compartilhado por todas as requisições ao Scada-LTS
+scada_breaker = CircuitBreaker()
+
+
+class CurlPool:
+    """
+    Pool thread-safe de handles pycurl reutilizáveis para o Scada-LTS.
+
+    Todos os handles compartilham (CurlShare) o cache de conexões, de DNS e
+    de sessões SSL, então as conexões TCP com o Scada-LTS ficam abertas
+    (keep-alive) e são reaproveitadas entre requisições e entre threads.
+    Antes de cada uso o handle é resetado e recebe as opções padrão.
+
+    Args:
+        size (int): Quantidade máxima de handles ociosos guardados no pool.
+    """
+
+    def __init__(self, size=SCADA_POOL_SIZE):
+        self.size = size
+        self._idle = []
+        self._lock = threading.Lock()
+        self.share = pycurl.CurlShare()
+        self.share.setopt(pycurl.SH_SHARE, pycurl.LOCK_DATA_CONNECT)
+        self.share.setopt(pycurl.SH_SHARE, pycurl.LOCK_DATA_DNS)
+        self.share.setopt(pycurl.SH_SHARE, pycurl.LOCK_DATA_SSL_SESSION)
+
+    def acquire(self):
+        """Retira um handle do pool (ou cria um novo) já com as opções padrão."""
+        with self._lock:
+            curl = self._idle.pop() if self._idle else None
+        if curl is None:
+            curl = pycurl.Curl()
+            curl.setopt(pycurl.SHARE, self.share)  # Mantido após o reset()
+        curl.reset()
+        curl.setopt(pycurl.NOSIGNAL, 1)
+        curl.setopt(pycurl.TCP_KEEPALIVE, 1)
+        curl.setopt(pycurl.ACCEPT_ENCODING, "gzip")
+        curl.setopt(pycurl.CONNECTTIMEOUT_MS, int(SCADA_CONNECT_TIMEOUT * 1000))
+        curl.setopt(pycurl.TIMEOUT_MS, int(SCADA_TIMEOUT * 1000))
+        return curl
+
+    def release(self, curl):
+        """Devolve o handle ao pool, descartando cookies da requisição anterior."""
+        try:
+            curl.setopt(pycurl.COOKIELIST, "ALL")
+        except pycurl.error:
+            pass
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append(curl)
+                return
+        curl.close()
+
+    @contextmanager
+    def handle(self):
+        """Context manager que empresta um handle do pool."""
+        curl = self.acquire()
+        try:
+            yield curl
+        finally:
+            self.release(curl)
+
+    def close(self):
+        """Fecha todos os handles ociosos e as conexões mantidas pelo pool."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for curl in idle:
+            curl.close()
+
+
+# Pool de conexões usado por todas as requisições ao Scada-LTS
+curl_pool = CurlPool()
+
+
 def get_cookie_from_url(url):
     """Obtém um novo cookie de autenticação da URL fornecida."""
     global cookie_cache
 
+    if not scada_breaker.allow_request():
+        print("Circuito do Scada-LTS aberto. Autenticação não realizada.")
+        return None
+
     buffer = BytesIO()
     header_buffer = BytesIO()
-    curl = pycurl.Curl()
-    curl.setopt(curl.URL, url)
-    curl.setopt(curl.WRITEFUNCTION, buffer.write)
-    curl.setopt(curl.HEADERFUNCTION, header_buffer.write)
-    curl.setopt(curl.COOKIEFILE, '')
+    curl = curl_pool.acquire()
+    curl.setopt(pycurl.URL, url)
+    curl.setopt(pycurl.WRITEFUNCTION, buffer.write)
+    curl.setopt(pycurl.HEADERFUNCTION, header_buffer.write)
 
     try:
-        curl.perform()
+        try:
+            curl.perform()
+        except pycurl.error:
+            scada_breaker.record_failure()
+            raise
         status_code = curl.getinfo(pycurl.RESPONSE_CODE)
+        scada_breaker.record_response(status_code)
         headers = header_buffer.getvalue().decode('utf-8').splitlines()
 
         print(f"Status Code ao obter cookie: {status_code}")
@@ -58,7 +268,7 @@ def get_cookie_from_url(url):
             if match:
                 cookie = match.group(1)
                 cookie_cache["value"] = cookie
-                cookie_cache["expires_at"] = time.time() + 3600  # 1 hora
+                cookie_cache["expires_at"] = time.time() + SCADA_SESSION_TTL
 
                 print(f"Novo cookie armazenado: {cookie_cache['value']}, expira em {time.ctime(cookie_cache['expires_at'])}")
                 logger.warning(f"Novo cookie armazenado: {cookie_cache['value']}, expira em {time.ctime(cookie_cache['expires_at'])}")
@@ -75,56 +285,420 @@ def get_cookie_from_url(url):
         logger.error(f"Erro ao obter cookie: {e}")
         return None
     finally:
-        curl.close()
+        curl_pool.release(curl)
 
 
-def get_with_cookie(url, cookie, xid_sensor):
-    """Realiza uma requisição GET usando o cookie de autenticação."""
+class ScadaSession:
+    """
+    Sessão única com o Scada-LTS compartilhada por todas as threads.
+
+    O cookie fica apenas em memória (`cookie_cache`). Garante que só uma
+    autenticação esteja em andamento por vez: as demais threads aguardam
+    o resultado dela em vez de autenticar também. Quando faltam menos de
+    `refresh_margin` segundos para a expiração, a sessão é renovada em
+    segundo plano enquanto o cookie atual continua sendo usado.
+
+    Args:
+        cache (dict): Dicionário {"value", "expires_at"} onde o cookie é guardado.
+        refresh_margin (int): Antecedência, em segundos, da renovação.
+    """
+
+    def __init__(self, cache, refresh_margin=SCADA_SESSION_REFRESH_MARGIN):
+        self.cache = cache
+        self.refresh_margin = refresh_margin
+        self._cond = threading.Condition()
+        self._refreshing = False
+
+    def get_cookie(self):
+        """Retorna um cookie válido, autenticando se necessário."""
+        with self._cond:
+            cookie = self.cache["value"]
+            remaining = self.cache["expires_at"] - time.time()
+            if cookie and remaining > 0:
+                if remaining < self.refresh_margin and not self._refreshing:
+                    self._refreshing = True
+                    threading.Thread(target=self._login, name="scada-session-refresh", daemon=True).start()
+                return cookie
+        return self.refresh()
+
+    def refresh(self, stale_cookie=None):
+        """
+        Autentica novamente no Scada-LTS e retorna o novo cookie.
+
+        Se outra thread já estiver autenticando, aguarda e devolve o resultado
+        dela. Se `stale_cookie` for informado e o cookie atual já for outro
+        (renovado por outra thread), devolve o atual sem autenticar.
+        """
+        with self._cond:
+            waited = False
+            while self._refreshing:
+                waited = True
+                self._cond.wait()
+            cookie = self.cache["value"]
+            valid = cookie and time.time() < self.cache["expires_at"]
+            if valid and cookie != stale_cookie:
+                return cookie
+            if waited and not valid:
+                return None  # A autenticação que estava em andamento falhou
+            self._refreshing = True
+        return self._login()
+
+    def _login(self):
+        cookie = None
+        try:
+            cookie = get_cookie_from_url(AUTH_URL)
+        finally:
+            with self._cond:
+                self._refreshing = False
+                self._cond.notify_all()
+        return cookie
+
+
+# Sessão usada por todas as requisições ao Scada-LTS
+scada_session = ScadaSession(cookie_cache)
+
+
+def is_session_expired(curl, status_code):
+    """Indica se o Scada-LTS recusou a sessão (401 ou redirecionamento para o login)."""
+    if status_code == 401:
+        return True
+    if status_code in (301, 302, 303, 307):
+        return "login" in str(curl.getinfo(pycurl.REDIRECT_URL) or "").lower()
+    return False
+
+
+def perform_with_cookie(url, cookie, postfields=None, headers=None):
+    """
+    Executa uma requisição ao Scada-LTS com um handle do pool.
+
+    Returns:
+        tuple: (status_code, response_data, expired) onde `expired` indica
+        que a sessão usada não é mais aceita pelo Scada-LTS.
+
+    Raises:
+        ScadaUnavailableError: Se o circuito do Scada-LTS estiver aberto.
+        pycurl.error: Em caso de erro de conexão ou timeout.
+    """
+    if not scada_breaker.allow_request():
+        raise ScadaUnavailableError("Circuito do Scada-LTS aberto")
+
     buffer = BytesIO()
-    curl = pycurl.Curl()
-    curl.setopt(curl.URL, url)
-    curl.setopt(curl.WRITEFUNCTION, buffer.write)
-    curl.setopt(curl.COOKIE, cookie)
+    with curl_pool.handle() as curl:
+        curl.setopt(pycurl.URL, url)
+        curl.setopt(pycurl.WRITEFUNCTION, buffer.write)
+        curl.setopt(pycurl.COOKIE, cookie)
+        if postfields is not None:
+            curl.setopt(pycurl.POST, 1)
+            curl.setopt(pycurl.POSTFIELDS, postfields)
+        if headers:
+            curl.setopt(pycurl.HTTPHEADER, headers)
+        try:
+            curl.perform()
+        except pycurl.error:
+            scada_breaker.record_failure()
+            raise
+        status_code = curl.getinfo(pycurl.RESPONSE_CODE)
+        scada_breaker.record_response(status_code)
+        expired = is_session_expired(curl, status_code)
+    return status_code, buffer.getvalue().decode('utf-8'), expired
+
+
+def request_with_session(url, cookie, postfields=None, headers=None):
+    """
+    Executa uma requisição e, se a sessão tiver expirado no Scada-LTS,
+    reautentica (uma única vez) e repete a requisição com o novo cookie.
+
+    Returns:
+        tuple: (status_code, response_data)
+    """
+    status_code, response_data, expired = perform_with_cookie(url, cookie, postfields, headers)
+    if expired:
+        print("Sessão do Scada-LTS expirada. Reautenticando...")
+        new_cookie = scada_session.refresh(stale_cookie=cookie)
+        if new_cookie:
+            status_code, response_data, _ = perform_with_cookie(url, new_cookie, postfields, headers)
+    return status_code, response_data
+
 
+def get_with_cookie(url, cookie, xid_sensor):
+    """Realiza uma requisição GET usando o cookie de autenticação."""
     try:
-        curl.perform()
-        status_code = curl.getinfo(pycurl.RESPONSE_CODE)
-        response_data = buffer.getvalue().decode('utf-8')
+        status_code, response_data = request_with_session(url, cookie)
 
         #print(f"Status Code GET: {status_code}")
         #print(f"Resposta bruta: {response_data}")
 
-        if status_code != 200:
-            print(f"Erro ao buscar dados do xid_sensor {xid_sensor}. Status: {status_code}")
-            return None
+        return decode_json_response(status_code, response_data, xid_sensor)
+    except Exception as e:
+        print(f"Erro na requisição GET: {e}")
+        return None
+
+
+def get_json_data_concurrent(xids_sensor, max_concurrent=None):
+    """
+    Lê vários datapoints do Scada-LTS em paralelo usando pycurl.CurlMulti.
+
+    Mantém até `max_concurrent` requisições GET em andamento ao mesmo tempo
+    (padrão SCADA_MAX_CONCURRENT) e devolve os resultados conforme as
+    respostas chegam, de forma que o tempo total fica próximo da maior
+    latência e não da soma das latências.
+
+    Args:
+        xids_sensor (list[str]): Lista de xid_sensor.
+        max_concurrent (int, opcional): Limite de requisições simultâneas.
+
+    Yields:
+        tuple: (xid_sensor, json) na ordem de conclusão. O json é None
+        quando o ponto não pôde ser lido.
+    """
+    pending = deque(dict.fromkeys(xids_sensor or []))
+    if not pending:
+        return
 
+    cookie = get_valid_cookie()
+    if not cookie:
+        logger.error(f"Falha ao buscar os dados de {len(pending)} xid_sensor")
+        for xid in pending:
+            yield xid, None
+        return
+
+    max_concurrent = max(1, max_concurrent or SCADA_MAX_CONCURRENT)
+    retried = set()
+    multi = pycurl.CurlMulti()
+    handles = [curl_pool.acquire() for _ in range(min(max_concurrent, len(pending)))]
+    free = list(handles)
+    active = 0
+
+    try:
+        while pending or active:
+            # Preenche os handles livres com os próximos xid_sensor
+            while pending and free:
+                if not scada_breaker.allow_request():
+                    # Circuito aberto: os pontos restantes falham sem acessar a rede
+                    while pending:
+                        yield pending.popleft(), None
+                    break
+                curl = free.pop()
+                curl.xid_sensor = pending.popleft()
+                curl.buffer = BytesIO()
+                curl.setopt(curl.URL, f"{URL_BASE}/Scada-LTS/api/point_value/getValue/{curl.xid_sensor}")
+                curl.setopt(curl.WRITEFUNCTION, curl.buffer.write)
+                curl.setopt(curl.COOKIE, cookie)
+                multi.add_handle(curl)
+                active += 1
+
+            while True:
+                ret, _ = multi.perform()
+                if ret != pycurl.E_CALL_MULTI_PERFORM:
+                    break
+
+            while True:
+                num_queued, ok_list, err_list = multi.info_read()
+                for curl in ok_list:
+                    multi.remove_handle(curl)
+                    status_code = curl.getinfo(pycurl.RESPONSE_CODE)
+                    response_data = curl.buffer.getvalue().decode('utf-8')
+                    scada_breaker.record_response(status_code)
+                    free.append(curl)
+                    active -= 1
+                    if is_session_expired(curl, status_code) and curl.xid_sensor not in retried:
+                        # Sessão expirada: reautentica e recoloca o ponto na fila uma vez
+                        retried.add(curl.xid_sensor)
+                        cookie = scada_session.refresh(stale_cookie=cookie) or cookie
+                        pending.append(curl.xid_sensor)
+                        continue
+                    yield curl.xid_sensor, decode_json_response(status_code, response_data, curl.xid_sensor)
+                for curl, errno, errmsg in err_list:
+                    multi.remove_handle(curl)
+                    scada_breaker.record_failure()
+                    print(f"Erro na requisição GET do xid_sensor {curl.xid_sensor}: {errmsg}")
+                    logger.error(f"Erro na requisição GET do xid_sensor {curl.xid_sensor}: {errmsg}")
+                    free.append(curl)
+                    active -= 1
+                    yield curl.xid_sensor, None
+                if num_queued == 0:
+                    break
+
+            if active:
+                # Aguarda atividade nos sockets pelo tempo sugerido pelo libcurl
+                timeout_ms = multi.timeout()
+                if timeout_ms < 0:
+                    timeout_ms = 100
+                multi.select(min(timeout_ms, 1000) / 1000.0)
+    finally:
+        for curl in handles:
+            try:
+                multi.remove_handle(curl)
+            except pycurl.error:
+                pass
+            curl_pool.release(curl)
+        multi.close()
+
+
+def decode_json_response(status_code, response_data, xid_sensor):
+    """Converte a resposta de leitura de um datapoint em JSON (None se houver erro)."""
+    if status_code != 200:
+        print(f"Erro ao buscar dados do xid_sensor {xid_sensor}. Status: {status_code}")
+        return None
+    try:
         return json.loads(response_data) if response_data else None
     except json.JSONDecodeError:
         print("Erro ao decodificar JSON. Resposta vazia ou inválida.")
         return None
+
+
+def post_with_cookie(url, cookie, body):
+    """
+    Realiza uma requisição POST com corpo JSON usando o cookie de autenticação.
+
+    Retorna uma tupla (status_code, json) onde json é None se a resposta
+    estiver vazia, for inválida ou se houver erro na requisição.
+    """
+    try:
+        status_code, response_data = request_with_session(
+            url, cookie, json.dumps(body), ["Content-Type: application/json", "Accept: application/json"])
+
+        if status_code != 200:
+            return status_code, None
+
+        return status_code, json.loads(response_data) if response_data else None
+    except json.JSONDecodeError:
+        print("Erro ao decodificar JSON. Resposta vazia ou inválida.")
+        return 200, None
     except Exception as e:
-        print(f"Erro na requisição GET: {e}")
-        return None
-    finally:
-        curl.close()
+        print(f"Erro na requisição POST: {e}")
+        return None, None
 
 
 def get_valid_cookie():
-    """Verifica se o cookie armazenado ainda é válido, senão obtém um novo."""
-    current_time = time.time()
-    print(f"Tempo atual: {current_time} ({time.ctime(current_time)})")
-    print(f"Tempo de expiração do cookie: {cookie_cache['expires_at']} ({time.ctime(cookie_cache['expires_at'])})")
+    """Retorna o cookie da sessão com o Scada-LTS, renovando-o se necessário."""
+    return scada_session.get_cookie()
 
-    if cookie_cache["value"] and current_time < cookie_cache["expires_at"]:
-        print(f"Usando cookie armazenado: {cookie_cache['value']}")
-        return cookie_cache["value"]
-    
-    print("Cookie expirado ou inexistente. Renovando...")
-    return get_cookie_from_url(AUTH_URL)
+
+class PointValueCache:
+    """
+    Cache LRU de curta duração dos valores lidos do Scada-LTS, por xid_sensor.
+
+    Valores ficam válidos por `ttl` segundos e o cache guarda no máximo
+    `max_size` pontos, descartando os menos usados. Leituras simultâneas do
+    mesmo ponto são agrupadas: apenas uma requisição é feita e as demais
+    threads aguardam o resultado dela. Falhas (None) não são guardadas.
+
+    Os contadores `hits`, `misses` e `coalesced` podem ser consultados com `stats()`.
+    """
+
+    class _Flight:
+        def __init__(self):
+            self.event = threading.Event()
+            self.value = None
+
+    def __init__(self, ttl=SCADA_CACHE_TTL, max_size=SCADA_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def get(self, key, fetch):
+        """Retorna o valor de `key`, chamando `fetch(key)` se não estiver em cache."""
+        return self.get_many([key], lambda keys: {keys[0]: fetch(keys[0])})[key]
+
+    def get_many(self, keys, fetch_many):
+        """
+        Retorna {key: valor} para `keys`. Os pontos fora do cache e que não
+        estão sendo lidos por outra thread são buscados com uma única chamada
+        a `fetch_many(lista)`, que deve retornar um dicionário.
+        """
+        result = {}
+        leading = []
+        waiting = {}
+        now = time.monotonic()
+        with self._lock:
+            for key in dict.fromkeys(keys):
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    result[key] = entry[1]
+                elif key in self._inflight:
+                    self.coalesced += 1
+                    waiting[key] = self._inflight[key]
+                else:
+                    self.misses += 1
+                    self._inflight[key] = self._Flight()
+                    leading.append(key)
+
+        if leading:
+            values = {}
+            try:
+                values = fetch_many(leading) or {}
+            finally:
+                self._complete({key: values.get(key) for key in leading})
+            result.update({key: values.get(key) for key in leading})
+
+        for key, flight in waiting.items():
+            flight.event.wait()
+            result[key] = flight.value
+        return {key: result.get(key) for key in keys}
+
+    def _complete(self, values):
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            for key, value in values.items():
+                flight = self._inflight.pop(key, None)
+                if value is not None:
+                    self._entries[key] = (expires_at, value)
+                    self._entries.move_to_end(key)
+                if flight is not None:
+                    flight.value = value
+                    flight.event.set()
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Retorna os contadores do cache."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "size": len(self._entries)
+            }
+
+
+# Cache de valores usado por get_json_data e get_json_data_many
+point_cache = PointValueCache()
 
 
 def get_json_data(xid_sensor):
+    """Obtém o valor de um datapoint, usando o cache de curta duração (`point_cache`)."""
+    return point_cache.get(xid_sensor, fetch_json_data)
+
+
+def get_json_data_many(xids_sensor):
+    """
+    Obtém os valores de vários datapoints usando o cache de curta duração.
+
+    Apenas os pontos fora do cache são lidos do Scada-LTS (`fetch_json_data_many`).
+
+    Returns:
+        dict: Dicionário {xid_sensor: json} com None para os pontos
+        que não puderam ser lidos.
+    """
+    return point_cache.get_many(list(xids_sensor or []), fetch_json_data_many)
+
+
+def fetch_json_data(xid_sensor):
     """Obtém os dados JSON apenas se o cookie for válido."""
+    if not scada_breaker.is_available():
+        return None
     cookie = get_valid_cookie()
     if cookie:
         url_get_value = f"{URL_BASE}/Scada-LTS/api/point_value/getValue/{xid_sensor}"
@@ -138,47 +712,123 @@ def get_json_data(xid_sensor):
         return None
 
 
+def fetch_json_data_many(xids_sensor):
+    """
+    Obtém os valores de vários datapoints do Scada-LTS em poucas requisições.
+
+    Com SCADA_BATCH_URL configurada, os xid_sensor são enviados em lotes de
+    SCADA_BATCH_SIZE para o endpoint de múltiplos pontos. Os pontos que o
+    lote não trouxer (erro na requisição, resposta inválida ou xid ausente
+    da resposta) são lidos ponto a ponto, em paralelo, com
+    `get_json_data_concurrent`. Se o Scada-LTS não suportar o endpoint
+    (404/405) ele não é mais tentado. Com o circuito do Scada-LTS aberto,
+    retorna imediatamente sem acessar a rede.
+
+    Args:
+        xids_sensor (list[str]): Lista de xid_sensor.
+
+    Returns:
+        dict: Dicionário {xid_sensor: json} com None para os pontos
+        que não puderam ser lidos.
+    """
+    xids_sensor = list(dict.fromkeys(xids_sensor or []))
+    result = {xid: None for xid in xids_sensor}
+    if not xids_sensor or not scada_breaker.is_available():
+        return result
+
+    if SCADA_BATCH_URL and batch_support["enabled"] is not False:
+        cookie = get_valid_cookie()
+        if not cookie:
+            logger.error(f"Falha ao buscar os dados em lote de {len(xids_sensor)} xid_sensor")
+            return result
+
+        for start in range(0, len(xids_sensor), SCADA_BATCH_SIZE):
+            chunk = xids_sensor[start:start + SCADA_BATCH_SIZE]
+            status_code, response_json = post_with_cookie(SCADA_BATCH_URL, cookie, chunk)
+
+            if status_code in (404, 405):
+                print("Scada-LTS não suporta leitura em lote. Lendo ponto a ponto...")
+                logger.warning("Scada-LTS não suporta leitura em lote. Lendo ponto a ponto.")
+                batch_support["enabled"] = False
+                break
+
+            if status_code != 200 or not isinstance(response_json, list):
+                print(f"Erro ao buscar dados em lote. Status: {status_code}")
+                logger.error(f"Erro ao buscar dados em lote dos xid_sensor {chunk}. Status: {status_code}")
+                continue
+
+            batch_support["enabled"] = True
+            for item in response_json:
+                if isinstance(item, dict) and item.get("xid") in result:
+                    result[item["xid"]] = item
+
+    missing = [xid for xid in xids_sensor if result[xid] is None]
+    if missing:
+        for xid, response_json in get_json_data_concurrent(missing):
+            result[xid] = response_json
+    return result
+
+
 
 
 # -------------------------------------------------------------
 # Rotina de autenticação no SCADA-LTS
 # -------------------------------------------------------------
-def auth_ScadaLTS():
+def auth_ScadaLTS(validate=False):
 
     """
-    Realiza a autenticação no SCADA-LTS com as credenciais definidas no arquivo .env.
+    Garante uma sessão autenticada no SCADA-LTS com as credenciais definidas no arquivo .env.
 
     Caso as credenciais estejam vazias, não realiza a autenticação e retorna None.
-    Caso haja um erro na conexão, registra o erro no log e retorna None.
+    A sessão é a mesma usada na leitura dos datapoints (`scada_session`), então
+    só há uma nova autenticação se o cookie em memória tiver expirado. Com
+    `validate` (health check) o cookie em memória é conferido no servidor com
+    uma requisição leve (SCADA_SESSION_CHECK_URL); a autenticação só é refeita
+    se o Scada-LTS recusar a sessão.
 
-    Caso a autenticação seja bem-sucedida, grava o cookie de sessão no arquivo 'cookies' e
-    retorna None.
+    Retorna True se houver uma sessão válida e False caso contrário.
     """
 
     if not username or not password:
         print("Erro: Credenciais de acesso ao SCADA-LTS não encontradas no arquivo .env")
         logger.error("Erro: Credenciais de acesso ao SCADA-LTS não encontradas no arquivo .env")
         return
-    try:
-        buffer = BytesIO()
-        c = pycurl.Curl()
-        c.setopt(c.URL, f"{URL_BASE}/Scada-LTS/login.htm")
-        c.setopt(c.POST, 1)
-        c.setopt(c.POSTFIELDS,
-                 f'username={username}&password={password}&submit=Login')
-        c.setopt(c.COOKIEFILE, '')
-        c.setopt(c.COOKIEJAR, 'cookies')
-        c.setopt(c.WRITEDATA, buffer)
-        c.perform()
-        c.close()
-        response = buffer.getvalue().decode('utf-8')
-        # print(response)
-        #print("Atenticado no SCADA-LTS!")
-        return True 
-    except ConnectionError as e:
+    cookie = scada_session.get_cookie()
+    if cookie and validate:
+        cookie = validate_session(cookie)
+    if not cookie:
+        print("Erro ao tentar autenticar no SCADA-LTS")
+        logger.error("Erro ao tentar autenticar no SCADA-LTS")
         return False
-        print(f"Erro ao tentar autenticar no SCADA-LTS: {e}")
-        logger.error(f"Erro ao tentar autenticar no SCADA-LTS: {e}")
+    #print("Atenticado no SCADA-LTS!")
+    return True
+
+
+def validate_session(cookie):
+
+    """
+    Confere no Scada-LTS se a sessão do cookie ainda é aceita.
+
+    Se o servidor recusar a sessão (401 ou redirecionamento para o login),
+    autentica novamente uma única vez. Com o circuito aberto, erro de conexão
+    ou erro 5xx a sessão é considerada inválida, sem nova autenticação.
+
+    Retorna o cookie válido ou None.
+    """
+
+    try:
+        status_code, _, expired = perform_with_cookie(SCADA_SESSION_CHECK_URL, cookie)
+        if expired:
+            cookie = scada_session.refresh(stale_cookie=cookie)
+            if not cookie:
+                return None
+            status_code, _, expired = perform_with_cookie(SCADA_SESSION_CHECK_URL, cookie)
+    except (ConnectionError, pycurl.error) as e:
+        logger.error(f"Erro ao validar a sessão do SCADA-LTS: {e}")
+        return None
+    if expired or status_code >= 500:
+        return None
+    return cookie
 
 
 
@@ -196,19 +846,14 @@ def send_data_to_scada(raw_data):
     Caso haja um erro na conexão, registra o erro no log e retorna None.
     """
 
+    cookie = scada_session.get_cookie()
+    if not cookie:
+        logger.error("Erro ao enviar dados ao SCADA-LTS: sessão não autenticada")
+        return
     try:
-        buffer = BytesIO()
-        c = pycurl.Curl()
-        c.setopt(
-            c.URL, f"{URL_BASE}/Scada-LTS/dwr/call/plaincall/EmportDwr.importData.dwr")
-        c.setopt(c.POST, 1)
-        c.setopt(c.POSTFIELDS, raw_data)
-        c.setopt(c.COOKIEFILE, 'cookies')
-        c.setopt(c.WRITEDATA, buffer)
-        c.perform()
-        c.close()
-        response = buffer.getvalue().decode('utf-8')
+        status_code, response = request_with_session(
+            f"{URL_BASE}/Scada-LTS/dwr/call/plaincall/EmportDwr.importData.dwr", cookie, raw_data)
         #print(response)
         print("send_data_to_scada", raw_data)
-    except ConnectionError as e:
+    except (ConnectionError, pycurl.error) as e:
         logger.error(f"Erro ao enviar dados ao SCADA-LTS: {e}")
@@ -0,0 +1,278 @@
+###############################################################
+# serializers.py
+# ------------------------------------------------------------
+# Formatos de envio das mensagens (JSON, JSON compacto, MessagePack
+# e CBOR) escolhidos por routing key, com o content type do AMQP, e
+# a conversão das mensagens para a fila local
+# Author: Aluisio Cavalcante <aluisio@controlengenharia.eng.br>
+# novembro de 2025
+# TODOS OS DIREITOS RESERVADOS A CONTROL ENGENHARIA
+# #############################################################
+import json
+import os
+import struct
+from abc import ABC, abstractmethod
+
+from dotenv import load_dotenv
+from logger import *
+
+# Bibliotecas opcionais: sem elas o formato correspondente não fica disponível
+# (orjson só acelera o JSON compacto)
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+try:
+    import cbor2
+except ImportError:
+    cbor2 = None
+# Carregando as variáveis de ambiente do arquivo .env
+load_dotenv()
+
+# Formato padrão das mensagens: json (como gerado, com indentação), json_compact,
+# msgpack ou cbor; formato por routing key ("chave:formato,chave:formato") e
+# biblioteca do JSON: auto (orjson quando instalado) ou json (biblioteca padrão)
+RABBIT_SERIALIZER = os.getenv("RABBIT_SERIALIZER", "json").lower()
+RABBIT_SERIALIZER_ROUTES = os.getenv("RABBIT_SERIALIZER_ROUTES", "")
+RABBIT_JSON_BACKEND = os.getenv("RABBIT_JSON_BACKEND", "auto").lower()
+
+_orjson = orjson if RABBIT_JSON_BACKEND == "auto" else None
+
+# Marcador das mensagens gravadas na fila já no formato de envio:
+# MARKER + nome do formato + MARKER + corpo. Texto JSON nunca começa com ele.
+MARKER = b"\x00"
+
+
+def loads(text):
+    """Converte o texto JSON da fila, com o orjson quando disponível."""
+    if _orjson is not None:
+        try:
+            return _orjson.loads(text)
+        except ValueError:
+            pass  # NaN/Infinity e outros casos que só o json aceita
+    return json.loads(text)
+
+
+def dumps_compact(document):
+    """JSON sem espaços, em UTF-8 (bytes)."""
+    if _orjson is not None:
+        try:
+            return _orjson.dumps(document)
+        except TypeError:
+            pass  # inteiros acima de 64 bits e outros casos que só o json aceita
+    return json.dumps(document, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class Serializer(ABC):
+
+    """
+    Formato de envio das mensagens.
+
+    Os produtores geram texto JSON; `transcode` converte uma mensagem para o
+    formato uma única vez, ao enfileirar (veja `pack`), e `join` junta
+    mensagens já convertidas em um lote (array) sem decodificá-las.
+    `content_type` vai nas propriedades da mensagem AMQP para o consumidor
+    saber decodificá-la.
+    """
+
+    name = None
+    content_type = None
+
+    def available(self):
+        return True
+
+    @abstractmethod
+    def encode(self, document):
+        """Documento (dict/list) no formato."""
+
+    @abstractmethod
+    def decode(self, body):
+        """Corpo no formato de volta para dict/list."""
+
+    def transcode(self, text):
+        return self.encode(loads(text))
+
+    @abstractmethod
+    def join(self, bodies):
+        """Array com as mensagens já convertidas (`transcode`), sem decodificá-las."""
+
+
+class JsonSerializer(Serializer):
+
+    """JSON como gerado pelo gateway (indent=4): a mensagem é enviada sem conversão."""
+
+    name = "json"
+    content_type = "application/json; charset=utf-8"
+
+    def encode(self, document):
+        return json.dumps(document, indent=4, ensure_ascii=False)
+
+    def decode(self, body):
+        return loads(body)
+
+    def transcode(self, text):
+        return text
+
+    def join(self, bodies):
+        return "[" + ",".join(bodies) + "]"
+
+
+class CompactJsonSerializer(JsonSerializer):
+
+    """JSON sem espaços nem quebras de linha."""
+
+    name = "json_compact"
+
+    def encode(self, document):
+        return dumps_compact(document)
+
+    def transcode(self, text):
+        return dumps_compact(loads(text))
+
+    def join(self, bodies):
+        return b"[" + b",".join(bodies) + b"]"
+
+
+class MsgpackSerializer(Serializer):
+
+    name = "msgpack"
+    content_type = "application/msgpack"
+
+    def available(self):
+        return msgpack is not None
+
+    def encode(self, document):
+        return msgpack.packb(document, use_bin_type=True)
+
+    def decode(self, body):
+        return msgpack.unpackb(body, raw=False)
+
+    def join(self, bodies):
+        # Cabeçalho de array (fixarray, array 16 ou array 32) seguido dos itens
+        count = len(bodies)
+        if count < 16:
+            header = bytes([0x90 | count])
+        elif count < 0x10000:
+            header = b"\xdc" + struct.pack(">H", count)
+        else:
+            header = b"\xdd" + struct.pack(">I", count)
+        return header + b"".join(bodies)
+
+
+class CborSerializer(Serializer):
+
+    name = "cbor"
+    content_type = "application/cbor"
+
+    def available(self):
+        return cbor2 is not None
+
+    def encode(self, document):
+        return cbor2.dumps(document)
+
+    def decode(self, body):
+        return cbor2.loads(body)
+
+    def join(self, bodies):
+        # Cabeçalho de array (tipo maior 4) com o tamanho, seguido dos itens
+        count = len(bodies)
+        if count < 24:
+            header = bytes([0x80 | count])
+        elif count < 0x100:
+            header = bytes([0x98, count])
+        elif count < 0x10000:
+            header = b"\x99" + struct.pack(">H", count)
+        else:
+            header = b"\x9a" + struct.pack(">I", count)
+        return header + b"".join(bodies)
+
+
+SERIALIZERS = {serializer.name: serializer for serializer in
+               (JsonSerializer(), CompactJsonSerializer(), MsgpackSerializer(), CborSerializer())}
+
+
+def get_serializer(name):
+    """
+    Formato pelo nome. Um nome inválido ou um formato sem a biblioteca
+    instalada é registrado no log e substituído por json, para o envio
+    não parar.
+    """
+    serializer = SERIALIZERS.get(str(name).strip().lower())
+    if serializer is None:
+        logger.error(f"Formato de mensagem inválido: {name}. Usando json")
+        return SERIALIZERS["json"]
+    if not serializer.available():
+        logger.error(f"Biblioteca do formato {serializer.name} não instalada. Usando json")
+        return SERIALIZERS["json"]
+    return serializer
+
+
+def serializer_for_content_type(content_type):
+    """
+    Formato de uma mensagem recebida pelo content type (para consumidores e
+    testes). Parâmetros como o charset são ignorados.
+    """
+    media_type = str(content_type).split(";", 1)[0].strip().lower()
+    for serializer in SERIALIZERS.values():
+        if serializer.content_type.split(";", 1)[0] == media_type and serializer.available():
+            return serializer
+    raise ValueError(f"Content type não suportado: {content_type}")
+
+
+def pack(text, serializer):
+    """
+    Converte a mensagem (texto JSON) para o formato de envio ao enfileirá-la,
+    para não ser convertida de novo a cada envio ou reenvio. Em json o texto
+    é gravado como está; nos demais formatos o nome do formato vai junto do
+    corpo (`MARKER`), de modo que mensagens gravadas antes de uma troca de
+    formato continuam sendo enviadas com o content type certo.
+
+    Returns:
+        str | bytes: Conteúdo a gravar na fila.
+    """
+    if serializer.name == "json":
+        return text
+    return MARKER + serializer.name.encode("ascii") + MARKER + serializer.transcode(text)
+
+
+def unpack(content):
+    """
+    Formato e corpo de uma mensagem da fila gravada por `pack`.
+
+    Returns:
+        tuple: (Serializer, corpo), ou (None, texto) para texto JSON ainda não
+        convertido (formato json ou gravado antes da conversão na fila).
+
+    Raises:
+        ValueError: Se o formato gravado não existir.
+    """
+    if isinstance(content, str):
+        if not content.startswith("\x00"):
+            return None, content
+        content = content.encode("utf-8")
+    content = bytes(content)
+    if content[:1] != MARKER:
+        return None, content.decode("utf-8")
+    name, _, body = content[1:].partition(MARKER)
+    serializer = SERIALIZERS.get(name.decode("ascii", "replace"))
+    if serializer is None:
+        raise ValueError(f"Formato de mensagem inválido na fila: {name!r}")
+    return serializer, body
+
+
+class SerializerRoutes:
+
+    """Formato de cada routing key, com `default` para as demais."""
+
+    def __init__(self, default=RABBIT_SERIALIZER, routes=RABBIT_SERIALIZER_ROUTES):
+        self.default = get_serializer(default)
+        if isinstance(routes, str):
+            routes = dict(item.strip().rsplit(":", 1) for item in routes.split(",") if ":" in item)
+        self.routes = {key.strip(): get_serializer(name) for key, name in routes.items()}
+
+    def for_route(self, routing_key):
+        return self.routes.get(routing_key, self.default)
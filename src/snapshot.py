@@ -0,0 +1,224 @@
+###############################################################
+# snapshot.py
+# ------------------------------------------------------------
+# Cópia em memória, somente leitura, da configuração do gateway
+# (gateway, equipamentos, registradores e tags) indexada por xid
+# Author: Aluisio Cavalcante <aluisio@controlengenharia.eng.br>
+# novembro de 2025
+# TODOS OS DIREITOS RESERVADOS A CONTROL ENGENHARIA
+# #############################################################
+import os
+import threading
+import time
+from collections import namedtuple
+from types import MappingProxyType
+
+from dotenv import load_dotenv
+from sqlalchemy import select
+
+from logger import *
+from events import change_events
+from models import (engine, cma_gateway, datasource_modbus_ip, datapoints_modbus_ip,
+                    datasource_dnp3, datapoints_dnp3, eqp_tags, dp_tags)
+# Carregando as variáveis de ambiente do arquivo .env
+load_dotenv()
+
+# Mantém a configuração inteira em memória (false: cada ciclo de equipamento
+# consulta o banco com as junções de `dataaccess`) e intervalo mínimo (s) entre
+# verificações de alteração no banco de configuração
+CONFIG_SNAPSHOT_ENABLED = os.getenv("CONFIG_SNAPSHOT_ENABLED", "true").lower() == "true"
+CONFIG_SNAPSHOT_CHECK_INTERVAL = float(os.getenv("CONFIG_SNAPSHOT_CHECK_INTERVAL", 1))
+
+# Tabelas de equipamentos e de registradores por protocolo
+PROTOCOL_TABLES = {
+    "modbus": (datasource_modbus_ip, datapoints_modbus_ip),
+    "dnp3": (datasource_dnp3, datapoints_dnp3),
+}
+
+# Colunas de período de atualização (valor, unidade) por protocolo
+PERIOD_COLUMNS = {
+    "modbus": ("updatePeriods", "updatePeriodType"),
+    "dnp3": ("rbePollPeriods", "eventsPeriodType"),
+}
+
+CONFIG_TABLES = (cma_gateway, datasource_modbus_ip, datapoints_modbus_ip,
+                 datasource_dnp3, datapoints_dnp3, eqp_tags, dp_tags)
+
+_EMPTY = MappingProxyType({})
+
+# Tipo de linha (tupla nomeada com as colunas) de cada tabela
+ROW_TYPES = {model.__tablename__: namedtuple(model.__tablename__, [column.key for column in model.__table__.columns])
+             for model in CONFIG_TABLES}
+
+
+def _freeze(mapping):
+    return MappingProxyType(mapping)
+
+
+def _name_value_pairs(rows, key):
+    """Agrupa as tags por `key` no formato {xid: {nome: valor}}, ignorando nome ou valor vazios."""
+    grouped = {}
+    for row in rows:
+        if row.nome and row.valor:
+            grouped.setdefault(getattr(row, key), {})[row.nome] = row.valor
+    return _freeze({xid: _freeze(pairs) for xid, pairs in grouped.items()})
+
+
+class ConfigSnapshot:
+
+    """
+    Configuração do gateway carregada de uma só vez e indexada por
+    xid_gateway, xid_equip e xid_sensor.
+
+    A instância não é alterada depois de criada: as linhas são tuplas
+    nomeadas e os índices, mapeamentos somente leitura. Uma alteração no
+    banco gera uma nova instância (ver `SnapshotStore`).
+
+    `complete` é False quando a instância tem só parte da configuração
+    (alguns equipamentos, ver `dataaccess.load_equipments`).
+    """
+
+    def __init__(self, rows, complete=True):
+        self.complete = complete
+        self.gateways = _freeze({row.xid_gateway: row for row in rows[cma_gateway.__tablename__]})
+        self.equipments = {}
+        self.datapoints = {}
+        self.sensors_by_equipment = {}
+        for protocol, (equipment_model, datapoint_model) in PROTOCOL_TABLES.items():
+            self.equipments[protocol] = _freeze({row.xid_equip: row for row in rows[equipment_model.__tablename__]})
+            datapoints = rows[datapoint_model.__tablename__]
+            self.datapoints[protocol] = _freeze({row.xid_sensor: row for row in datapoints})
+            sensors = {}
+            for row in datapoints:
+                sensors.setdefault(row.xid_equip, []).append(row.xid_sensor)
+            self.sensors_by_equipment[protocol] = _freeze({xid: tuple(xids) for xid, xids in sensors.items()})
+        self.equipments = _freeze(self.equipments)
+        self.datapoints = _freeze(self.datapoints)
+        self.sensors_by_equipment = _freeze(self.sensors_by_equipment)
+        self.equipment_tags = _name_value_pairs(rows[eqp_tags.__tablename__], "xid_equip")
+        self.datapoint_tags = _name_value_pairs(rows[dp_tags.__tablename__], "xid_sensor")
+        self.loaded_at = time.time()
+
+    @classmethod
+    def load(cls, bind=engine):
+        """Lê todas as tabelas de configuração em uma única transação de leitura."""
+        rows = {}
+        with bind.connect() as connection, connection.begin():
+            for model in CONFIG_TABLES:
+                row_type = ROW_TYPES[model.__tablename__]
+                result = connection.execute(select(model.__table__))
+                rows[model.__tablename__] = [row_type(*row) for row in result]
+        return cls(rows)
+
+    def gateway(self, xid_gateway):
+        return self.gateways.get(xid_gateway)
+
+    def equipment(self, protocol, xid_equip):
+        return self.equipments[protocol.lower()].get(xid_equip)
+
+    def datapoint(self, protocol, xid_sensor):
+        return self.datapoints[protocol.lower()].get(xid_sensor)
+
+    def sensors_of(self, protocol, xid_equip):
+        """xid_sensor dos registradores do equipamento, na ordem do banco."""
+        return self.sensors_by_equipment[protocol.lower()].get(xid_equip, ())
+
+    def tags_of_equipment(self, xid_equip):
+        return self.equipment_tags.get(xid_equip, _EMPTY)
+
+    def tags_of_datapoint(self, xid_sensor):
+        return self.datapoint_tags.get(xid_sensor, _EMPTY)
+
+    def periods(self, protocol):
+        """Lista de (xid_equip, período, unidade) dos equipamentos do protocolo."""
+        value, unit = PERIOD_COLUMNS[protocol.lower()]
+        return [(row.xid_equip, getattr(row, value), getattr(row, unit))
+                for row in self.equipments[protocol.lower()].values()]
+
+
+class SnapshotStore:
+
+    """
+    Mantém a cópia atual da configuração e a substitui quando o banco muda.
+
+    `current()` devolve a cópia vigente sem consultar o banco; no máximo a
+    cada `check_interval` segundos compara o `PRAGMA data_version` de uma
+    conexão dedicada, que muda quando outra conexão (deste ou de outro
+    processo) grava no banco. Alterações feitas pelo ORM neste processo
+    também chegam pelo barramento de eventos e invalidam a cópia na hora.
+    A troca é só a atribuição de uma referência: quem já pegou a cópia
+    anterior continua com uma visão consistente.
+    """
+
+    def __init__(self, bind=engine, check_interval=CONFIG_SNAPSHOT_CHECK_INTERVAL, bus=change_events):
+        self.bind = bind
+        self.check_interval = max(0.0, float(check_interval))
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._version = None
+        self._watch = None
+        self._pid = None
+        self._next_check = 0.0
+        self._dirty = False
+        self.reloads = 0
+        if bus is not None:
+            bus.subscribe(self._on_change, tables={model.__tablename__ for model in CONFIG_TABLES})
+
+    def current(self):
+        snapshot = self._snapshot
+        if snapshot is not None and not self._dirty and time.monotonic() < self._next_check:
+            return snapshot
+        with self._lock:
+            if self._snapshot is None or self._dirty or self._changed():
+                self._reload()
+            self._next_check = time.monotonic() + self.check_interval
+            return self._snapshot
+
+    def invalidate(self):
+        """Força a releitura na próxima chamada de `current()`."""
+        self._dirty = True
+
+    def _on_change(self, events):
+        self.invalidate()
+
+    def _data_version(self):
+        if self._watch is None or self._pid != os.getpid():
+            self._watch = self.bind.raw_connection()
+            self._pid = os.getpid()
+        cursor = self._watch.cursor()
+        try:
+            cursor.execute("PRAGMA data_version")
+            return cursor.fetchone()[0]
+        finally:
+            cursor.close()
+
+    def _changed(self):
+        try:
+            return self._data_version() != self._version
+        except Exception as e:
+            logger.error(f"Erro ao verificar alterações na configuração: {e}")
+            self._watch = None
+            return False
+
+    def _reload(self):
+        self._dirty = False
+        try:
+            # Lida antes da carga: uma gravação durante a leitura gera nova releitura
+            version = self._data_version()
+            snapshot = ConfigSnapshot.load(self.bind)
+        except Exception as e:
+            if self._snapshot is None:
+                raise
+            logger.error(f"Erro ao recarregar a configuração, mantendo a cópia anterior: {e}")
+            return
+        self._snapshot, self._version = snapshot, version
+        self.reloads += 1
+
+    def close(self):
+        with self._lock:
+            if self._watch is not None:
+                self._watch.close()
+                self._watch = None
+
+
+config_snapshot = SnapshotStore()
@@ -1,4 +1,42 @@
 import sys
 import os
 
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
\ No newline at end of file
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import pytest
+
+
+@pytest.fixture
+def config_engine(tmp_path):
+    """Banco de configuração com um gateway, equipamentos Modbus e DNP3, registradores e tags."""
+    import models
+    from sqlalchemy import insert
+
+    engine = models.create_sqlite_engine(f"sqlite:///{tmp_path / 'config.db'}")
+    models.Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(insert(models.cma_gateway.__table__),
+                           [{"xid_gateway": "GW_1", "subestacao": "SE Norte", "regional": "R1", "id_gtw": 7}])
+        connection.execute(insert(models.datasource_modbus_ip.__table__),
+                           [{"xid_equip": "EQ_1", "xid_gateway": "GW_1", "updatePeriods": 5,
+                             "updatePeriodType": "MINUTES"},
+                            {"xid_equip": "EQ_2", "xid_gateway": "GW_1", "updatePeriods": 30,
+                             "updatePeriodType": "SECONDS"},
+                            {"xid_equip": "EQ_3", "xid_gateway": "GW_X", "updatePeriods": 1,
+                             "updatePeriodType": "HOURS"}])
+        connection.execute(insert(models.datapoints_modbus_ip.__table__),
+                           [{"xid_sensor": f"DP_{i}", "xid_equip": "EQ_1" if i < 3 else "EQ_2", "offset": i}
+                            for i in range(5)])
+        connection.execute(insert(models.datasource_dnp3.__table__),
+                           [{"xid_equip": "EQ_D", "xid_gateway": "GW_1", "rbePollPeriods": 1,
+                             "eventsPeriodType": "HOURS"}])
+        connection.execute(insert(models.datapoints_dnp3.__table__),
+                           [{"xid_sensor": "DP_D", "xid_equip": "EQ_D", "index": 12}])
+        connection.execute(insert(models.eqp_tags.__table__),
+                           [{"xid_equip": "EQ_1", "nome": "bay", "valor": "01T1"},
+                            {"xid_equip": "EQ_1", "nome": "vazia", "valor": ""}])
+        connection.execute(insert(models.dp_tags.__table__),
+                           [{"xid_sensor": "DP_0", "nome": "fase", "valor": "A"},
+                            {"xid_sensor": "DP_4", "nome": "lado", "valor": "AT"}])
+    yield engine
+    engine.dispose()
@@ -14,7 +14,9 @@ from src.scadalts import (
     get_json_data,
     auth_ScadaLTS,
     send_data_to_scada,
-    cookie_cache
+    cookie_cache,
+    CurlPool,
+    PointValueCache
 )
 
 @pytest.fixture
@@ -27,14 +29,17 @@ def mock_env_variables():
     }):
         yield
 
+@pytest.fixture(autouse=True)
+def reset_point_cache():
+    """Fixture para que cada teste leia os datapoints sem o cache de valores."""
+    with mock.patch('src.scadalts.point_cache', PointValueCache()):
+        yield
+
 @pytest.fixture
 def reset_cookie_cache():
     """Fixture para resetar o cache de cookie entre os testes."""
-    global cookie_cache
-    original_cache = cookie_cache.copy()
-    cookie_cache = {"value": None, "expires_at": 0}
-    yield
-    cookie_cache = original_cache
+    with mock.patch.dict(cookie_cache, {"value": None, "expires_at": 0}):
+        yield
 
 class MockBuffer:
     """Classe para simular um buffer que captura dados escritos."""
@@ -58,7 +63,8 @@ class MockBuffer:
 @pytest.fixture
 def mock_curl():
     """Fixture para mockar a instância do pycurl.Curl."""
-    with mock.patch('pycurl.Curl') as mock_curl_class:
+    with mock.patch('pycurl.Curl') as mock_curl_class, \
+         mock.patch('src.scadalts.curl_pool', CurlPool()):
         mock_curl = mock.MagicMock()
         mock_curl_class.return_value = mock_curl
         yield mock_curl
@@ -107,7 +113,7 @@ def test_get_cookie_from_url_success(mock_env_variables, reset_cookie_cache, moc
     
     mock_curl.setopt.assert_any_call(pycurl.URL, "http://localhost:8080/Scada-LTS/api/auth/admin/admin")
     mock_curl.perform.assert_called_once()
-    mock_curl.close.assert_called_once()
+    mock_curl.close.assert_not_called()
 
 @pytest.mark.integration
 def test_get_cookie_from_url_failure(mock_env_variables, reset_cookie_cache, mock_curl):
@@ -124,7 +130,7 @@ def test_get_cookie_from_url_failure(mock_env_variables, reset_cookie_cache, moc
     assert cookie_cache["value"] is None
     
     mock_curl.perform.assert_called_once()
-    mock_curl.close.assert_called_once()
+    mock_curl.close.assert_not_called()
 
 @pytest.mark.integration
 def test_get_with_cookie_success(mock_env_variables, mock_curl):
@@ -154,7 +160,7 @@ def test_get_with_cookie_success(mock_env_variables, mock_curl):
     mock_curl.setopt.assert_any_call(pycurl.URL, "http://localhost:8080/Scada-LTS/api/point_value/getValue/DP_123")
     mock_curl.setopt.assert_any_call(pycurl.COOKIE, "JSESSIONID=abc123")
     mock_curl.perform.assert_called_once()
-    mock_curl.close.assert_called_once()
+    mock_curl.close.assert_not_called()
 
 @pytest.mark.integration
 def test_get_with_cookie_error(mock_env_variables, mock_curl):
@@ -173,7 +179,7 @@ def test_get_with_cookie_error(mock_env_variables, mock_curl):
     assert result is None
     
     mock_curl.perform.assert_called_once()
-    mock_curl.close.assert_called_once()
+    mock_curl.close.assert_not_called()
 
 @pytest.mark.integration
 def test_get_valid_cookie_cached(mock_env_variables, reset_cookie_cache):
@@ -203,7 +209,7 @@ def test_get_valid_cookie_expired(mock_env_variables, reset_cookie_cache, mock_c
     
     assert result == "JSESSIONID=new123"
     mock_curl.perform.assert_called_once()
-    mock_curl.close.assert_called_once()
+    mock_curl.close.assert_not_called()
 
 @pytest.mark.integration
 def test_get_json_data_with_valid_cookie(mock_env_variables, mock_curl):
@@ -215,8 +221,8 @@ def test_get_json_data_with_valid_cookie(mock_env_variables, mock_curl):
         "type": "NumericValue"
     }
     
-    with mock.patch('src.scada.get_valid_cookie') as mock_get_cookie, \
-         mock.patch('src.scada.get_with_cookie') as mock_get_with_cookie:
+    with mock.patch('src.scadalts.get_valid_cookie') as mock_get_cookie, \
+         mock.patch('src.scadalts.get_with_cookie') as mock_get_with_cookie:
         
         mock_get_cookie.return_value = "JSESSIONID=valid123"
         mock_get_with_cookie.return_value = response_data
@@ -234,7 +240,7 @@ def test_get_json_data_with_valid_cookie(mock_env_variables, mock_curl):
 @pytest.mark.integration
 def test_get_json_data_with_invalid_cookie(mock_env_variables):
     """Testa a falha na obtenção de dados JSON com um cookie inválido."""
-    with mock.patch('src.scada.get_valid_cookie') as mock_get_cookie:
+    with mock.patch('src.scadalts.get_valid_cookie') as mock_get_cookie:
         mock_get_cookie.return_value = None
         
         result = get_json_data("DP_123")
@@ -244,30 +250,78 @@ def test_get_json_data_with_invalid_cookie(mock_env_variables):
 
 @pytest.mark.integration
 def test_auth_ScadaLTS_success(mock_env_variables, mock_curl):
-    """Testa a autenticação bem-sucedida no SCADA-LTS."""
+    """Testa a autenticação bem-sucedida no SCADA-LTS (cookie mantido em memória)."""
     setup_mock_curl_response(
         mock_curl,
         status_code=200,
-        body=b"<html><body>Login successful</body></html>"
+        headers=b'HTTP/1.1 200 OK\r\nSet-Cookie: JSESSIONID=auth123; Path=/; HttpOnly\r\n\r\n'
     )
     
-    with mock.patch('builtins.print') as mock_print:
-        auth_ScadaLTS()
+    with mock.patch.dict(cookie_cache, {"value": None, "expires_at": 0}):
+        assert auth_ScadaLTS() is True
+        assert cookie_cache["value"] == "JSESSIONID=auth123"
+
+        # Com a sessão válida não há nova autenticação
+        assert auth_ScadaLTS() is True
         
-        mock_curl.setopt.assert_any_call(pycurl.URL, "http://localhost:8080/Scada-LTS/login.htm")
-        mock_curl.setopt.assert_any_call(pycurl.POST, 1)
-        mock_curl.setopt.assert_any_call(pycurl.POSTFIELDS, "username=admin&password=admin&submit=Login")
-        mock_curl.setopt.assert_any_call(pycurl.COOKIEJAR, 'cookies')
-        mock_curl.perform.assert_called_once()
-        mock_curl.close.assert_called_once()
-        mock_print.assert_called_with("AUTH SCADA")
+    mock_curl.setopt.assert_any_call(pycurl.URL, "http://localhost:8080/Scada-LTS/api/auth/admin/admin")
+    mock_curl.perform.assert_called_once()
+
+@pytest.mark.integration
+def test_auth_ScadaLTS_validate_checks_session_without_login(mock_env_variables, mock_curl):
+    """Com validate=True o cookie em memória é conferido no servidor, sem nova autenticação."""
+    setup_mock_curl_response(mock_curl, status_code=200, body=b'true')
+
+    with mock.patch.dict(cookie_cache, {"value": "JSESSIONID=antigo", "expires_at": time.time() + 3600}):
+        assert auth_ScadaLTS() is True
+        mock_curl.perform.assert_not_called()
+
+        assert auth_ScadaLTS(validate=True) is True
+        assert cookie_cache["value"] == "JSESSIONID=antigo"
+
+    mock_curl.perform.assert_called_once()
+    mock_curl.setopt.assert_any_call(pycurl.URL, "http://localhost:8080/Scada-LTS/api/auth/isLogged/admin")
+    mock_curl.setopt.assert_any_call(pycurl.COOKIE, "JSESSIONID=antigo")
+
+@pytest.mark.integration
+def test_auth_ScadaLTS_validate_logs_in_again_when_session_is_rejected(mock_env_variables, mock_curl):
+    """Só há nova autenticação quando o servidor recusa a sessão (401)."""
+    responses = iter([401, 200, 200])
+    setup_mock_curl_response(
+        mock_curl,
+        status_code=200,
+        headers=b'HTTP/1.1 200 OK\r\nSet-Cookie: JSESSIONID=novo456; Path=/; HttpOnly\r\n\r\n'
+    )
+    perform = mock_curl.perform.side_effect
+
+    def perform_with_status():
+        mock_curl.getinfo.return_value = next(responses)
+        perform()
+
+    mock_curl.perform.side_effect = perform_with_status
+
+    with mock.patch.dict(cookie_cache, {"value": "JSESSIONID=antigo", "expires_at": time.time() + 3600}):
+        assert auth_ScadaLTS(validate=True) is True
+        assert cookie_cache["value"] == "JSESSIONID=novo456"
+
+    assert mock_curl.perform.call_count == 3
+
+@pytest.mark.integration
+def test_auth_ScadaLTS_validate_reports_server_failure(mock_env_variables, mock_curl):
+    """Se o servidor não responder, a validação retorna False apesar do cookie em memória."""
+    mock_curl.perform.side_effect = pycurl.error(7, "Failed to connect")
+
+    with mock.patch.dict(cookie_cache, {"value": "JSESSIONID=antigo", "expires_at": time.time() + 3600}):
+        assert auth_ScadaLTS(validate=True) is False
+        assert cookie_cache["value"] == "JSESSIONID=antigo"
 
 @pytest.mark.integration
 def test_auth_ScadaLTS_missing_credentials():
     """Testa a falha na autenticação por falta de credenciais."""
-    with mock.patch.dict(os.environ, {"username": "", "password": ""}), \
+    with mock.patch('src.scadalts.username', ""), \
+         mock.patch('src.scadalts.password', ""), \
          mock.patch('builtins.print') as mock_print, \
-         mock.patch('src.scada.logger') as mock_logger:
+         mock.patch('src.scadalts.logger') as mock_logger:
         
         auth_ScadaLTS()
         
@@ -294,7 +348,8 @@ def test_send_data_to_scada(mock_env_variables, mock_curl):
         body=b"//OK"
     )
     
-    with mock.patch('builtins.print') as mock_print:
+    with mock.patch('builtins.print') as mock_print, \
+         mock.patch.dict(cookie_cache, {"value": "JSESSIONID=abc123", "expires_at": time.time() + 3600}):
         send_data_to_scada(test_data)
         
         mock_curl.setopt.assert_any_call(
@@ -303,9 +358,8 @@ def test_send_data_to_scada(mock_env_variables, mock_curl):
         )
         mock_curl.setopt.assert_any_call(pycurl.POST, 1)
         mock_curl.setopt.assert_any_call(pycurl.POSTFIELDS, test_data)
-        mock_curl.setopt.assert_any_call(pycurl.COOKIEFILE, 'cookies')
+        mock_curl.setopt.assert_any_call(pycurl.COOKIE, "JSESSIONID=abc123")
         mock_curl.perform.assert_called_once()
-        mock_curl.close.assert_called_once()
         mock_print.assert_called_with("send_data_to_scada", test_data)
 
 @pytest.mark.integration
@@ -315,7 +369,7 @@ def test_send_data_to_scada_error(mock_env_variables, mock_curl):
     
     test_data = "test_data"
     
-    with mock.patch('src.scada.logger') as mock_logger:
+    with mock.patch('src.scadalts.logger') as mock_logger:
         send_data_to_scada(test_data)
         
         mock_logger.error.assert_called()
\ No newline at end of file
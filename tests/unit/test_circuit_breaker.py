@@ -0,0 +1,71 @@
+import time
+from unittest import mock
+
+import pytest
+
+import scadalts
+from scadalts import CircuitBreaker
+
+
+@pytest.mark.unit
+def test_breaker_opens_after_threshold():
+    """O circuito abre após N falhas seguidas e recusa requisições."""
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60, half_open_probes=1)
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.is_available()
+    assert not breaker.allow_request()
+
+
+@pytest.mark.unit
+def test_breaker_half_open_probe():
+    """Após o reset_timeout, libera uma requisição de teste que decide o estado."""
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05, half_open_probes=1)
+    breaker.record_failure()
+    time.sleep(0.06)
+
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow_request()
+    assert not breaker.allow_request()
+
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    time.sleep(0.06)
+    assert breaker.allow_request()
+    breaker.record_response(404)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+@pytest.mark.unit
+def test_get_json_data_fail_fast():
+    """Com o circuito aberto, a leitura falha sem autenticar nem acessar a rede."""
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+    breaker.record_failure()
+    with mock.patch.object(scadalts, "scada_breaker", breaker), \
+         mock.patch.object(scadalts, "point_cache", scadalts.PointValueCache()), \
+         mock.patch.object(scadalts, "get_valid_cookie") as mock_cookie, \
+         mock.patch.object(scadalts, "curl_pool") as mock_pool:
+        assert scadalts.get_json_data("DP_1") is None
+        assert scadalts.get_json_data_many(["DP_1", "DP_2"]) == {"DP_1": None, "DP_2": None}
+        with pytest.raises(scadalts.ScadaUnavailableError):
+            scadalts.perform_with_cookie("http://scada/x", "JSESSIONID=abc")
+
+    mock_cookie.assert_not_called()
+    mock_pool.acquire.assert_not_called()
+    mock_pool.handle.assert_not_called()
+
+
+@pytest.mark.unit
+def test_timeouts_applied():
+    """Os handles do pool saem com os timeouts de conexão e total configurados."""
+    pool = scadalts.CurlPool(size=1)
+    with mock.patch("pycurl.Curl") as mock_curl_class:
+        curl = pool.acquire()
+
+    curl.setopt.assert_any_call(scadalts.pycurl.CONNECTTIMEOUT_MS, int(scadalts.SCADA_CONNECT_TIMEOUT * 1000))
+    curl.setopt.assert_any_call(scadalts.pycurl.TIMEOUT_MS, int(scadalts.SCADA_TIMEOUT * 1000))
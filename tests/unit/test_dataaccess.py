@@ -0,0 +1,76 @@
+import pytest
+from sqlalchemy import event, insert
+
+import models
+from dataaccess import load_equipments, load_periods
+from snapshot import ConfigSnapshot
+
+
+@pytest.fixture
+def statements(config_engine):
+    executed = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    event.listen(config_engine, "before_cursor_execute", count)
+    yield executed
+    event.remove(config_engine, "before_cursor_execute", count)
+
+
+@pytest.mark.unit
+def test_equipment_config_matches_full_snapshot(config_engine):
+    full = ConfigSnapshot.load(config_engine)
+
+    partial = load_equipments("MODBUS", ["EQ_1", "EQ_2"], bind=config_engine)
+
+    assert partial.complete is False
+    for xid_equip in ("EQ_1", "EQ_2"):
+        assert partial.equipment("modbus", xid_equip) == full.equipment("modbus", xid_equip)
+        assert partial.sensors_of("modbus", xid_equip) == full.sensors_of("modbus", xid_equip)
+        assert partial.tags_of_equipment(xid_equip) == full.tags_of_equipment(xid_equip)
+        for xid_sensor in full.sensors_of("modbus", xid_equip):
+            assert partial.datapoint("modbus", xid_sensor) == full.datapoint("modbus", xid_sensor)
+            assert partial.tags_of_datapoint(xid_sensor) == full.tags_of_datapoint(xid_sensor)
+    assert partial.gateway("GW_1") == full.gateway("GW_1")
+    assert partial.equipment("modbus", "EQ_3") is None
+    assert partial.equipment("dnp3", "EQ_D") is None
+
+
+@pytest.mark.unit
+def test_equipment_without_datapoints_or_gateway(config_engine):
+    partial = load_equipments("modbus", ["EQ_3", "EQ_inexistente"], bind=config_engine)
+
+    assert partial.equipment("modbus", "EQ_3").xid_gateway == "GW_X"
+    assert partial.gateway("GW_X") is None
+    assert partial.sensors_of("modbus", "EQ_3") == ()
+    assert partial.equipment("modbus", "EQ_inexistente") is None
+
+
+@pytest.mark.unit
+def test_query_count_does_not_grow_with_registers(config_engine, statements):
+    load_equipments("modbus", ["EQ_1"], bind=config_engine)
+    few = len(statements)
+
+    with config_engine.begin() as connection:
+        connection.execute(insert(models.datapoints_modbus_ip.__table__),
+                           [{"xid_sensor": f"DP_X{i}", "xid_equip": "EQ_1"} for i in range(200)])
+        connection.execute(insert(models.dp_tags.__table__),
+                           [{"xid_sensor": f"DP_X{i}", "nome": "fase", "valor": "B"} for i in range(200)])
+    statements.clear()
+
+    partial = load_equipments("modbus", ["EQ_1"], bind=config_engine)
+
+    assert len(partial.sensors_of("modbus", "EQ_1")) == 203
+    assert dict(partial.tags_of_datapoint("DP_X150")) == {"fase": "B"}
+    assert len(statements) == few == 3
+
+
+@pytest.mark.unit
+def test_dnp3_equipment_and_periods(config_engine):
+    partial = load_equipments("DNP3", ["EQ_D"], bind=config_engine)
+
+    assert partial.sensors_of("dnp3", "EQ_D") == ("DP_D",)
+    assert partial.datapoint("dnp3", "DP_D").index == 12
+    assert partial.gateway("GW_1").id_gtw == 7
+    assert load_periods("dnp3", bind=config_engine) == [("EQ_D", 1, "HOURS")]
@@ -0,0 +1,127 @@
+import logging
+import threading
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import models
+from events import ChangeEvent, ChangeEventBus, log_events
+
+
+@pytest.mark.unit
+def test_publish_without_subscribers_does_nothing():
+    bus = ChangeEventBus()
+
+    bus.publish("inclusão", "DP_TAGS", (1,))
+
+    assert bus.active is False
+    assert bus._thread is None
+    assert not bus._pending
+
+
+@pytest.mark.unit
+def test_events_are_delivered_in_batches_per_table():
+    bus = ChangeEventBus(batch_max=50, linger=0.05)
+    everything, tags = [], []
+    bus.subscribe(everything.append)
+    bus.subscribe(tags.append, tables={"DP_TAGS"})
+    try:
+        for i in range(10):
+            bus.publish("inclusão", "DP_TAGS" if i % 2 else "EQP_TAGS", (i,))
+        assert bus.flush()
+    finally:
+        bus.stop()
+
+    assert len(everything) == 1
+    assert [event.key for event in everything[0]] == [(i,) for i in range(10)]
+    assert tags == [[ChangeEvent("inclusão", "DP_TAGS", (i,)) for i in range(1, 10, 2)]]
+
+
+@pytest.mark.unit
+def test_failing_subscriber_does_not_block_others():
+    bus = ChangeEventBus(linger=0)
+    received = []
+
+    def broken(events):
+        raise RuntimeError("falha")
+
+    bus.subscribe(broken)
+    bus.subscribe(received.extend)
+    try:
+        bus.publish("deleção", "CMA_GD", ("GW",))
+        assert bus.flush()
+        bus.unsubscribe(broken)
+        bus.publish("atualização", "CMA_GD", ("GW",))
+        assert bus.flush()
+    finally:
+        bus.stop()
+
+    assert [event.operation for event in received] == ["deleção", "atualização"]
+
+
+@pytest.mark.unit
+def test_pending_limit_drops_oldest():
+    bus = ChangeEventBus(linger=0, max_pending=3)
+    gate = threading.Event()
+    received = []
+
+    def slow(events):
+        gate.wait(5)
+        received.extend(events)
+
+    bus.subscribe(slow)
+    try:
+        bus.publish("inclusão", "T", (0,))
+        bus.flush(timeout=0.1)  # o primeiro lote fica preso no assinante
+        for i in range(1, 6):
+            bus.publish("inclusão", "T", (i,))
+        gate.set()
+        assert bus.flush()
+    finally:
+        bus.stop()
+
+    assert bus.dropped == 2
+    assert [event.key for event in received] == [(0,), (3,), (4,), (5,)]
+
+
+@pytest.mark.unit
+def test_model_changes_reach_the_bus(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'config.db'}")
+    models.Base.metadata.create_all(engine)
+    bus = ChangeEventBus(linger=0)
+    received = []
+    bus.subscribe(received.extend)
+
+    class Tag(models.dp_tags):
+        pass
+
+    models.watch_changes(Tag, bus=bus)
+    Session = sessionmaker(bind=engine)
+    try:
+        with Session() as session:
+            tag = Tag(xid_sensor="DP_1", nome="fase", valor="A")
+            session.add(tag)
+            session.commit()
+            tag.valor = "B"
+            session.commit()
+            session.delete(tag)
+            session.commit()
+        assert bus.flush()
+    finally:
+        bus.stop()
+        engine.dispose()
+
+    assert received == [ChangeEvent("inclusão", "DP_TAGS", (1,)),
+                        ChangeEvent("atualização", "DP_TAGS", (1,)),
+                        ChangeEvent("deleção", "DP_TAGS", (1,))]
+
+
+@pytest.mark.unit
+def test_log_events_is_written_with_the_gateway_logger_level(caplog):
+    """O logger raiz fica em WARNING; os eventos ainda assim chegam ao log."""
+    assert logging.getLogger().level == logging.WARNING
+
+    log_events([ChangeEvent("inclusão", "DP_TAGS", (1,))])
+
+    assert "A operação 'inclusão' foi realizada em DP_TAGS (1,)" in caplog.text
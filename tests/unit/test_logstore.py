@@ -0,0 +1,187 @@
+import os
+import threading
+from concurrent.futures import Future
+from unittest import mock
+
+import pytest
+
+from logstore import SegmentLog
+from outbox import LogOutbox
+
+
+def segment_files(directory):
+    return sorted(name for name in os.listdir(directory) if name.endswith((".log", ".logz")))
+
+
+@pytest.mark.unit
+def test_append_and_read_across_compressed_segments(tmp_path):
+    log = SegmentLog(str(tmp_path), segment_bytes=200, compression_level=6, max_bytes=0)
+    payloads = [f'{{"sensor": {i}, "valor": "{"x" * 30}"}}' for i in range(20)]
+    for payload in payloads:
+        log.append(payload)
+    assert log.wait_compressed(5)
+
+    files = segment_files(tmp_path)
+    assert len(files) > 2
+    assert all(name.endswith(".logz") for name in files[:-1])
+    assert files[-1].endswith(".log")
+
+    assert log.read(0, 100) == list(enumerate(payloads))
+    assert log.read(7, 3) == [(7, payloads[7]), (8, payloads[8]), (9, payloads[9])]
+    log.close()
+
+
+@pytest.mark.unit
+def test_converted_messages_are_read_as_bytes(tmp_path):
+    """Mensagens gravadas já no formato de envio (serializers.pack) voltam em bytes, nos dois tipos de segmento."""
+    log = SegmentLog(str(tmp_path), segment_bytes=60, compression_level=6, max_bytes=0)
+    payloads = [b"\x00msgpack\x00\x81\xa1n\xff" * 3, '{"n": 1}', b"\x00cbor\x00\xa1an\x01" * 3, '{"n": 2}']
+    for payload in payloads:
+        log.append(payload)
+    assert log.wait_compressed(5)
+
+    assert log.read(0, 10) == list(enumerate(payloads))
+    log.close()
+
+
+@pytest.mark.unit
+def test_compression_runs_outside_the_append_lock(tmp_path):
+    """Gravações e leituras continuam enquanto um segmento fechado é comprimido."""
+    log = SegmentLog(str(tmp_path), segment_bytes=100, compression_level=6, max_bytes=0)
+    started, release = threading.Event(), threading.Event()
+    compress = log._compress
+
+    def slow_compress(base):
+        started.set()
+        release.wait(5)
+        compress(base)
+
+    with mock.patch.object(log, "_compress", side_effect=slow_compress):
+        for i in range(12):
+            log.append(f"message-{i:04d}")
+        assert started.wait(5)
+        log.append("during-compression")
+        log.sync()
+        assert log.read(12, 1) == [(12, "during-compression")]
+        release.set()
+        assert log.wait_compressed(5)
+
+    assert any(name.endswith(".logz") for name in segment_files(tmp_path))
+    assert [payload for _, payload in log.read(0, 100)][:12] == [f"message-{i:04d}" for i in range(12)]
+    log.close()
+
+
+@pytest.mark.unit
+def test_commit_deletes_whole_consumed_segments(tmp_path):
+    log = SegmentLog(str(tmp_path), segment_bytes=100, compression_level=0, max_bytes=0)
+    for i in range(30):
+        log.append(f"message-{i:04d}")
+    before = len(segment_files(tmp_path))
+
+    log.commit(25)
+
+    assert len(segment_files(tmp_path)) < before
+    assert log.pending() == 5
+    assert [payload for _, payload in log.read(log.checkpoint, 100)] == [f"message-{i:04d}" for i in range(25, 30)]
+    log.close()
+
+
+@pytest.mark.unit
+def test_recovery_keeps_checkpoint_and_drops_torn_tail(tmp_path):
+    log = SegmentLog(str(tmp_path), segment_bytes=100, compression_level=6, max_bytes=0)
+    for i in range(12):
+        log.append(f"message-{i:04d}")
+    log.sync()
+    log.commit(4)
+    log.close()
+
+    # Simula queda no meio da gravação de um registro
+    tail = os.path.join(tmp_path, segment_files(tmp_path)[-1])
+    with open(tail, "ab") as segment:
+        segment.write(b"\x00\x00\x00\x40\x12\x34")
+
+    recovered = SegmentLog(str(tmp_path), segment_bytes=100, compression_level=6, max_bytes=0)
+    assert recovered.checkpoint == 4
+    assert recovered.next_offset == 12
+    assert [payload for _, payload in recovered.read(4, 100)] == [f"message-{i:04d}" for i in range(4, 12)]
+
+    assert recovered.append("after-crash") == 12
+    assert recovered.read(12, 1) == [(12, "after-crash")]
+    recovered.close()
+
+
+@pytest.mark.unit
+def test_quota_drops_oldest_segments(tmp_path):
+    log = SegmentLog(str(tmp_path), segment_bytes=100, compression_level=0, max_bytes=300)
+    for i in range(40):
+        log.append(f"message-{i:04d}")
+
+    dropped = log.enforce_quota()
+
+    assert dropped > 0
+    assert log.size() <= 300 + 100
+    assert log.checkpoint == dropped
+    assert log.read(log.checkpoint, 1)[0][1] == f"message-{dropped:04d}"
+    log.close()
+
+
+@pytest.mark.unit
+def test_concurrent_appends_share_sync(tmp_path):
+    log = SegmentLog(str(tmp_path), segment_bytes=4096, compression_level=0, max_bytes=0)
+
+    def producer(n):
+        for i in range(50):
+            log.sync(log.append(f"t{n}-{i}"))
+
+    threads = [threading.Thread(target=producer, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert log.next_offset == 200
+    assert len(log.read(0, 1000)) == 200
+    log.close()
+
+
+@pytest.mark.unit
+def test_log_outbox_advances_checkpoint_to_first_unconfirmed(tmp_path):
+    rejected = {"m3"}
+
+    def publish(payload, routing_key=None):
+        future = Future()
+        future.set_result(payload not in rejected)
+        return future
+
+    def wait(pending):
+        return [key for key, future in pending if future.result()]
+
+    log = SegmentLog(str(tmp_path), segment_bytes=64, compression_level=6, max_bytes=0)
+    outbox = LogOutbox(log, page_size=4, publish=publish, wait=wait, ready=lambda: True)
+    try:
+        with mock.patch.object(outbox, "start"):
+            for i in range(10):
+                outbox.enqueue(f"m{i}", wait=True)
+
+        assert outbox.drain_once() == 3
+        assert log.checkpoint == 3
+
+        rejected.clear()
+        assert outbox.drain_once() == 7
+        assert outbox.stats()["pendentes"] == 0
+    finally:
+        outbox.stop()
+        log.close()
+
+
+@pytest.mark.unit
+def test_log_outbox_rejects_non_text_payloads(tmp_path):
+    log = SegmentLog(str(tmp_path), segment_bytes=1024, compression_level=0, max_bytes=0)
+    outbox = LogOutbox(log, ready=lambda: True)
+    try:
+        with mock.patch.object(outbox, "start"):
+            with pytest.raises(TypeError):
+                outbox.enqueue(None)
+        assert log.next_offset == 0
+    finally:
+        log.close()
@@ -0,0 +1,84 @@
+import json
+from unittest import mock
+
+import pytest
+
+# Importado na coleta, antes de os testes iniciarem threads (main aguarda as threads ao ser importado)
+import main
+from dataaccess import load_equipments
+from snapshot import ConfigSnapshot
+
+
+@pytest.fixture
+def snapshot(config_engine):
+    return ConfigSnapshot.load(config_engine)
+
+
+@pytest.fixture
+def dnp3_enabled(monkeypatch):
+    monkeypatch.setattr(main, "PAYLOAD_DNP3", True)
+
+
+@pytest.mark.unit
+def test_dnp3_register_payload_is_pre_rendered(snapshot, dnp3_enabled):
+    payload = main.process_json_datapoints("DP_D", "DNP3", {"value": 3.5}, config=snapshot)
+
+    document = json.loads(payload)
+    gateway, sensor, register = document["gateways"][0], document["sensors"][0], document["registers"][0]
+    assert gateway["gateway_id"] == 7 and gateway["gateway_name"] == "GW_1" and gateway["SE"] == "SE Norte"
+    assert sensor["sensor_id"] == "EQ_D" and sensor["sensor_protocol"] == "DNP3"
+    assert register["register_id"] == "DP_D" and register["register"] == 12
+    assert register["register_value"] == 3.5
+
+
+@pytest.mark.unit
+def test_modbus_and_dnp3_payloads_have_the_same_fields(snapshot, dnp3_enabled):
+    modbus = json.loads(main.process_json_datapoints("DP_0", "MODBUS", {"value": 1}, config=snapshot))
+    dnp3 = json.loads(main.process_json_datapoints("DP_D", "DNP3", {"value": 1}, config=snapshot))
+
+    for block in ("gateways", "sensors", "registers"):
+        assert dnp3[block][0].keys() == modbus[block][0].keys()
+
+
+@pytest.mark.unit
+def test_dnp3_payloads_are_off_by_default(snapshot, monkeypatch):
+    """Sem PAYLOAD_DNP3 nada é gerado para DNP3, como nas versões anteriores."""
+    monkeypatch.setattr(main, "PAYLOAD_DNP3", False)
+
+    assert main.process_json_datapoints("DP_D", "DNP3", {"value": 3.5}, config=snapshot) is None
+    assert main.process_equipment_payloads("EQ_D", "DNP3", {"DP_D": {"value": 7}}, config=snapshot) == []
+    assert main.process_json_datapoints("DP_0", "MODBUS", {"value": 1}, config=snapshot) is not None
+
+
+@pytest.mark.unit
+def test_send_data_rejects_non_text_content():
+    with mock.patch.object(main, "outbox") as outbox:
+        assert "error" in main.send_data_to_mqtt(None)
+        assert "error" in main.send_data_to_mqtt({"value": 1})
+
+    outbox.enqueue.assert_not_called()
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("partial", [False, True])
+def test_dnp3_equipment_payload(config_engine, snapshot, dnp3_enabled, partial):
+    """Modo equipment com DNP3, pela cópia completa e pela leitura em conjunto do equipamento."""
+    config = load_equipments("DNP3", ["EQ_D"], bind=config_engine) if partial else snapshot
+
+    payloads = main.process_equipment_payloads("EQ_D", "DNP3", {"DP_D": {"value": 7}}, config=config)
+
+    assert len(payloads) == 1
+    document = json.loads(payloads[0])
+    assert document["sensors"][0]["sensor_id"] == "EQ_D"
+    assert [(r["register_id"], r["register"], r["register_value"]) for r in document["registers"]] == [("DP_D", 12, 7)]
+
+
+@pytest.mark.unit
+def test_equipment_payload_errors_are_logged(snapshot):
+    with mock.patch.object(main, "build_payload_parts", side_effect=NameError("gtw_id")), \
+         mock.patch.object(main, "logger") as logger:
+        main.equipment_templates.clear()
+        assert main.process_equipment_payloads("EQ_1", "MODBUS", {"DP_0": {"value": 1}}, config=snapshot) == []
+
+    logger.exception.assert_called_once()
+    main.equipment_templates.clear()
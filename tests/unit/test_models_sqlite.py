@@ -0,0 +1,132 @@
+from unittest import mock
+
+import pytest
+from sqlalchemy import inspect, select, text
+
+import models
+from models import create_sqlite_engine, persistence, queue_database_url
+
+
+@pytest.mark.unit
+def test_queue_database_url():
+    assert queue_database_url("sqlite:////data/CMA_Gateway.db") == "sqlite:////data/CMA_Gateway_queue.db"
+    assert queue_database_url("sqlite:///cma") == "sqlite:///cma_queue.db"
+
+
+@pytest.mark.unit
+def test_engine_applies_pragmas(tmp_path):
+    engine = create_sqlite_engine(f"sqlite:///{tmp_path / 'queue.db'}", incremental_vacuum=True)
+    try:
+        with engine.connect() as connection:
+            assert connection.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+            assert connection.exec_driver_sql("PRAGMA synchronous").scalar() == 1  # NORMAL
+            assert connection.exec_driver_sql("PRAGMA auto_vacuum").scalar() == 2
+            assert connection.exec_driver_sql("PRAGMA busy_timeout").scalar() == models.SQLITE_BUSY_TIMEOUT
+    finally:
+        engine.dispose()
+
+
+@pytest.mark.unit
+def test_legacy_queue_rows_move_to_queue_database(tmp_path):
+    config_engine = create_sqlite_engine(f"sqlite:///{tmp_path / 'config.db'}")
+    queue_engine = create_sqlite_engine(f"sqlite:///{tmp_path / 'config_queue.db'}")
+    try:
+        with config_engine.begin() as connection:
+            connection.execute(text('CREATE TABLE "PERSISTENCE" (id INTEGER PRIMARY KEY, content_data VARCHAR, sended BOOLEAN)'))
+            connection.execute(text('INSERT INTO "PERSISTENCE" (content_data, sended) VALUES (:c, 0)'),
+                               [{"c": f"m{i}"} for i in range(7)])
+        persistence.__table__.create(queue_engine)
+
+        with mock.patch.object(models, "engine", config_engine), \
+             mock.patch.object(models, "queue_engine", queue_engine):
+            assert models.move_legacy_queue(chunk_size=3) == 7
+            assert models.move_legacy_queue() == 0
+
+        with queue_engine.connect() as connection:
+            moved = connection.execute(select(persistence.content_data, persistence.created_at, persistence.kind)
+                                       .order_by(persistence.id)).all()
+        assert [row.content_data for row in moved] == [f"m{i}" for i in range(7)]
+        # Sem created_at/kind na origem: horário da migração e tipo sensor, para a cota alcançá-las
+        assert all(row.created_at and row.kind == "sensor" for row in moved)
+    finally:
+        config_engine.dispose()
+        queue_engine.dispose()
+
+
+@pytest.mark.unit
+def test_legacy_queue_keeps_known_created_at_and_kind(tmp_path):
+    config_engine = create_sqlite_engine(f"sqlite:///{tmp_path / 'config.db'}")
+    queue_engine = create_sqlite_engine(f"sqlite:///{tmp_path / 'config_queue.db'}")
+    try:
+        persistence.__table__.create(config_engine)
+        persistence.__table__.create(queue_engine)
+        with config_engine.begin() as connection:
+            connection.execute(persistence.__table__.insert(), [
+                {"content_data": "status", "sended": False, "created_at": 100, "kind": "status"},
+                {"content_data": "antiga", "sended": False, "created_at": None, "kind": None}])
+
+        with mock.patch.object(models, "engine", config_engine), \
+             mock.patch.object(models, "queue_engine", queue_engine):
+            assert models.move_legacy_queue() == 2
+
+        with queue_engine.connect() as connection:
+            rows = connection.execute(select(persistence.created_at, persistence.kind).order_by(persistence.id)).all()
+        assert rows[0] == (100, "status")
+        assert rows[1].created_at > 100 and rows[1].kind == "sensor"
+    finally:
+        config_engine.dispose()
+        queue_engine.dispose()
+
+
+@pytest.mark.unit
+def test_fill_queue_defaults(tmp_path):
+    queue_engine = create_sqlite_engine(f"sqlite:///{tmp_path / 'queue.db'}")
+    try:
+        persistence.__table__.create(queue_engine)
+        with queue_engine.begin() as connection:
+            connection.execute(persistence.__table__.insert(), [
+                {"content_data": "a", "sended": False, "created_at": None, "kind": None},
+                {"content_data": "b", "sended": False, "created_at": 100, "kind": "health"}])
+
+        assert models.fill_queue_defaults(queue_engine) == 2
+
+        with queue_engine.connect() as connection:
+            rows = connection.execute(select(persistence.created_at, persistence.kind).order_by(persistence.id)).all()
+        assert rows[0].created_at > 100 and rows[0].kind == "sensor"
+        assert rows[1] == (100, "health")
+    finally:
+        queue_engine.dispose()
+
+
+@pytest.mark.unit
+def test_migrate_indexes_replaces_per_column_indexes(tmp_path):
+    engine = create_sqlite_engine(f"sqlite:///{tmp_path / 'config.db'}")
+    try:
+        table = models.datapoints_modbus_ip.__table__
+        with engine.begin() as connection:
+            # Esquema antigo: um índice por coluna
+            connection.execute(text(
+                'CREATE TABLE "DP_MODBUS_IP" (xid_sensor VARCHAR PRIMARY KEY, xid_equip VARCHAR, '
+                'multiplier FLOAT, enabled BOOLEAN, nome VARCHAR)'))
+            for column in ("xid_sensor", "xid_equip", "multiplier", "enabled", "nome"):
+                connection.execute(text(f'CREATE INDEX "ix_DP_MODBUS_IP_{column}" ON "DP_MODBUS_IP" ({column})'))
+            connection.execute(text('CREATE INDEX "manual_idx" ON "DP_MODBUS_IP" (nome)'))
+            connection.execute(text('INSERT INTO "DP_MODBUS_IP" VALUES (:s, :e, 1.5, 1, :n)'),
+                               [{"s": f"DP_{i}", "e": f"EQ_{i % 3}", "n": f"sensor {i}"} for i in range(30)])
+
+        dropped, created = models.migrate_indexes(engine, table.metadata, vacuum=True)
+
+        assert set(dropped) == {f"ix_DP_MODBUS_IP_{column}"
+                                for column in ("xid_sensor", "xid_equip", "multiplier", "enabled", "nome")}
+        assert created == ["ix_DP_MODBUS_IP_xid_equip_enabled"]
+        indexes = {index["name"]: index["column_names"] for index in inspect(engine).get_indexes("DP_MODBUS_IP")}
+        assert indexes == {"ix_DP_MODBUS_IP_xid_equip_enabled": ["xid_equip", "enabled"], "manual_idx": ["nome"]}
+        with engine.connect() as connection:
+            assert connection.execute(text('SELECT count(*) FROM "DP_MODBUS_IP"')).scalar() == 30
+            plan = connection.execute(text(
+                'EXPLAIN QUERY PLAN SELECT xid_sensor FROM "DP_MODBUS_IP" WHERE xid_equip = :e'), {"e": "EQ_1"}).all()
+        assert "ix_DP_MODBUS_IP_xid_equip_enabled" in str(plan)
+
+        assert models.migrate_indexes(engine, table.metadata) == ([], [])
+    finally:
+        engine.dispose()
@@ -0,0 +1,170 @@
+import socketserver
+import struct
+import threading
+import time
+from unittest import mock
+
+import pytest
+
+import mqtt
+from mqtt import MqttPublisher
+
+
+class StandInBroker(socketserver.ThreadingTCPServer):
+
+    """Broker MQTT 3.1.1 mínimo: aceita CONNECT, PUBLISH (QoS 0/1), PINGREQ e DISCONNECT."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, send_puback=True):
+        super().__init__(("127.0.0.1", 0), StandInHandler)
+        self.send_puback = send_puback
+        self.messages = []
+        self.connects = []
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+
+class StandInHandler(socketserver.BaseRequestHandler):
+
+    def read(self, size):
+        data = b""
+        while len(data) < size:
+            chunk = self.request.recv(size - len(data))
+            if not chunk:
+                raise ConnectionError
+            data += chunk
+        return data
+
+    def read_packet(self):
+        header = self.read(1)[0]
+        length, multiplier = 0, 1
+        while True:
+            byte = self.read(1)[0]
+            length += (byte & 0x7F) * multiplier
+            multiplier *= 128
+            if not byte & 0x80:
+                break
+        return header, self.read(length)
+
+    def handle(self):
+        try:
+            while True:
+                header, body = self.read_packet()
+                packet_type = header >> 4
+                if packet_type == 1:  # CONNECT
+                    name_len = struct.unpack("!H", body[:2])[0]
+                    flags = body[2 + name_len + 1]
+                    id_start = 2 + name_len + 4
+                    id_len = struct.unpack("!H", body[id_start:id_start + 2])[0]
+                    client_id = body[id_start + 2:id_start + 2 + id_len].decode()
+                    self.server.connects.append((client_id, bool(flags & 0x02)))
+                    self.request.sendall(b"\x20\x02\x00\x00")
+                elif packet_type == 3:  # PUBLISH
+                    qos = (header >> 1) & 0x03
+                    topic_len = struct.unpack("!H", body[:2])[0]
+                    topic = body[2:2 + topic_len].decode()
+                    offset = 2 + topic_len
+                    packet_id = None
+                    if qos:
+                        packet_id = body[offset:offset + 2]
+                        offset += 2
+                    self.server.messages.append((topic, body[offset:], qos))
+                    if qos == 1 and self.server.send_puback:
+                        self.request.sendall(b"\x40\x02" + packet_id)
+                elif packet_type == 12:  # PINGREQ
+                    self.request.sendall(b"\xd0\x00")
+                elif packet_type == 14:  # DISCONNECT
+                    return
+        except (ConnectionError, OSError):
+            return
+
+
+@pytest.fixture
+def broker():
+    server = StandInBroker()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def make_publisher(broker, **kwargs):
+    kwargs.setdefault("routing_key", "sensor")
+    return MqttPublisher(host="127.0.0.1", port=broker.port, username=None, password=None,
+                         topic="Gateway", client_id="test-gateway", **kwargs)
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+@pytest.mark.unit
+def test_publish_qos1_confirmed_by_puback(broker):
+    """Mensagens QoS 1 só são confirmadas após o PUBACK do broker."""
+    publisher = make_publisher(broker, qos=1)
+    try:
+        assert publisher.wait_ready(5)
+        futures = [publisher.publish_async(f'{{"n": {i}}}') for i in range(10)]
+        assert all(future.result(5) is True for future in futures)
+    finally:
+        publisher.close()
+
+    assert [payload for _, payload, _ in broker.messages] == [f'{{"n": {i}}}'.encode() for i in range(10)]
+    assert {topic for topic, _, _ in broker.messages} == {"sensor"}
+    assert broker.connects == [("test-gateway", False)]
+
+
+@pytest.mark.unit
+def test_publish_qos0(broker):
+    publisher = make_publisher(broker, qos=0)
+    try:
+        assert publisher.wait_ready(5)
+        assert publisher.publish("payload", routing_key="status.scada") is True
+    finally:
+        publisher.close()
+
+    assert broker.messages == [("status/scada", b"payload", 0)]
+
+
+@pytest.mark.unit
+def test_inflight_window_limits_unacknowledged_messages(broker):
+    """Sem PUBACK, no máximo MQTT_INFLIGHT mensagens são enviadas ao broker."""
+    broker.send_puback = False
+    with mock.patch.object(mqtt, "MQTT_INFLIGHT", 3):
+        publisher = make_publisher(broker, qos=1)
+        try:
+            assert publisher.wait_ready(5)
+            futures = [publisher.publish_async(f"m{i}") for i in range(8)]
+            assert wait_until(lambda: len(broker.messages) == 3)
+            time.sleep(0.1)
+            assert len(broker.messages) == 3
+            assert publisher.outstanding() == 8
+            assert not any(future.done() for future in futures)
+        finally:
+            publisher.close()
+
+    assert all(future.result(0) is False for future in futures)
+
+
+@pytest.mark.unit
+def test_topic_template():
+    publisher = MqttPublisher(host="127.0.0.1", topic="Gateway", routing_key="sensor",
+                              topic_template="{topico}/{chave}")
+    assert publisher.topic_for("sensor") == "Gateway/sensor"
+
+
+@pytest.mark.unit
+def test_publish_fails_fast_when_disconnected():
+    publisher = MqttPublisher(host="127.0.0.1", port=1, routing_key="sensor")
+    with mock.patch.object(publisher, "start"):
+        assert publisher.publish_async("payload").result(0) is False
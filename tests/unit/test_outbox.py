@@ -0,0 +1,489 @@
+import threading
+import time
+from concurrent.futures import Future
+
+import pytest
+from sqlalchemy import create_engine, func, select, text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import sessionmaker
+
+from models import persistence
+from outbox import GroupCommitWriter, OutboxDrainer, StorageQuota
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'outbox.db'}")
+    persistence.__table__.create(engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+class FakeBroker:
+
+    """Confirma as mensagens publicadas, exceto as de `reject`."""
+
+    def __init__(self, reject=()):
+        self.reject = set(reject)
+        self.published = []
+        self.routing_keys = []
+        self.pages = []
+
+    def publish(self, payload, routing_key=None):
+        self.published.append(payload)
+        self.routing_keys.append(routing_key)
+        future = Future()
+        future.set_result(payload not in self.reject)
+        return future
+
+    def wait(self, pending):
+        self.pages.append(len(pending))
+        return [key for key, future in pending if future.result()]
+
+
+def make_drainer(session_factory, broker, page_size=3, replay_rate=0):
+    return OutboxDrainer(session_factory=session_factory, page_size=page_size, idle_interval=0.01,
+                         replay_rate=replay_rate, publish=broker.publish, wait=broker.wait, ready=lambda: True)
+
+
+def remaining(session_factory):
+    with session_factory() as session:
+        return session.execute(select(persistence.content_data).order_by(persistence.id)).scalars().all()
+
+
+def fill(drainer, count):
+    table = persistence.__table__
+    with drainer.session_factory() as session:
+        session.execute(table.insert(), [{"content_data": f"m{i}", "sended": False} for i in range(count)])
+        session.commit()
+
+
+@pytest.mark.unit
+def test_drain_walks_queue_in_pages(session_factory):
+    """A fila é enviada em páginas limitadas e esvaziada ao final."""
+    broker = FakeBroker()
+    drainer = make_drainer(session_factory, broker, page_size=3)
+    fill(drainer, 8)
+
+    assert drainer.drain_once() == 8
+    assert broker.published == [f"m{i}" for i in range(8)]
+    assert broker.pages == [3, 3, 2]
+    assert remaining(session_factory) == []
+
+
+@pytest.mark.unit
+def test_unconfirmed_messages_stay_queued(session_factory):
+    """Mensagens sem confirmação permanecem na fila e a passada é interrompida."""
+    broker = FakeBroker(reject={"m4"})
+    drainer = make_drainer(session_factory, broker, page_size=3)
+    fill(drainer, 8)
+
+    assert drainer.drain_once() == 5
+    assert broker.pages == [3, 3]
+    assert remaining(session_factory) == ["m4", "m6", "m7"]
+
+    broker.reject.clear()
+    assert drainer.drain_once() == 3
+    assert remaining(session_factory) == []
+
+
+@pytest.mark.unit
+def test_enqueue_wakes_drain_thread(session_factory):
+    """`enqueue` grava a mensagem e a thread de envio a publica."""
+    broker = FakeBroker()
+    drainer = make_drainer(session_factory, broker)
+    try:
+        drainer.enqueue('{"valor": 1}')
+        for _ in range(500):
+            if broker.published and not remaining(session_factory):
+                break
+            drainer._stop_event.wait(0.01)
+    finally:
+        drainer.stop()
+
+    assert broker.published == ['{"valor": 1}']
+    with session_factory() as session:
+        assert session.execute(select(func.count()).select_from(persistence)).scalar() == 0
+
+
+@pytest.mark.unit
+def test_group_commit_joins_concurrent_enqueues(session_factory):
+    """Mensagens de várias threads são gravadas com poucos commits."""
+    commits = []
+
+    def counting_factory():
+        session = session_factory()
+        original_commit = session.commit
+
+        def commit():
+            commits.append(1)
+            original_commit()
+
+        session.commit = commit
+        return session
+
+    writer = GroupCommitWriter(counting_factory, max_rows=100, max_delay=0.05)
+    futures = []
+    lock = threading.Lock()
+
+    def producer(n):
+        for i in range(20):
+            future = writer.submit(f"t{n}-{i}")
+            with lock:
+                futures.append(future)
+
+    threads = [threading.Thread(target=producer, args=(n,)) for n in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert all(future.result(5) is True for future in futures)
+    writer.stop()
+
+    assert len(remaining(session_factory)) == 200
+    assert len(commits) <= 10
+
+
+@pytest.mark.unit
+def test_group_commit_propagates_database_errors(tmp_path):
+    """Erro no banco chega a quem aguarda a gravação."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'empty.db'}")
+    drainer = OutboxDrainer(session_factory=sessionmaker(bind=engine), ready=lambda: False)
+    try:
+        with pytest.raises(SQLAlchemyError):
+            drainer.enqueue("payload", wait=True)
+    finally:
+        drainer.stop()
+        engine.dispose()
+
+
+@pytest.mark.unit
+def test_group_commit_failure_only_affects_bad_rows(session_factory):
+    """Se o grupo falhar, só a mensagem recusada pelo banco recebe a exceção."""
+    with session_factory() as session:
+        session.execute(text("CREATE TRIGGER recusa BEFORE INSERT ON PERSISTENCE WHEN NEW.content_data = 'ruim' "
+                             "BEGIN SELECT RAISE(ABORT, 'mensagem recusada'); END"))
+        session.commit()
+
+    writer = GroupCommitWriter(session_factory, max_rows=4, max_delay=1)
+    futures = [writer.submit(content) for content in ("m0", "m1", "ruim", "m2")]
+
+    with pytest.raises(SQLAlchemyError):
+        futures[2].result(5)
+    assert [futures[i].result(5) for i in (0, 1, 3)] == [True, True, True]
+    writer.stop()
+    assert remaining(session_factory) == ["m0", "m1", "m2"]
+
+
+@pytest.mark.unit
+def test_group_commit_survives_non_database_errors(session_factory):
+    """Erros fora do banco chegam aos Futures do grupo e a thread de gravação continua."""
+    class BrokenSession:
+        def __init__(self):
+            raise RuntimeError("sessão indisponível")
+
+    writer = GroupCommitWriter(BrokenSession, max_rows=2, max_delay=1)
+    futures = [writer.submit("m0"), writer.submit("m1")]
+    for future in futures:
+        with pytest.raises(RuntimeError):
+            future.result(5)
+
+    writer.session_factory = session_factory
+    assert writer.submit("m2").result(5) is True
+    writer.stop()
+    assert remaining(session_factory) == ["m2"]
+
+
+@pytest.mark.unit
+def test_group_commit_errors_in_a_row_only_fail_that_row(session_factory):
+    """Uma linha que falha fora do banco (ex.: TypeError na conversão) não derruba o grupo."""
+    def checked_session():
+        session = session_factory()
+        execute = session.execute
+
+        def checked_execute(statement, rows=None):
+            if rows and any(row["content_data"] == "ruim" for row in rows):
+                raise TypeError("linha inválida")
+            return execute(statement, rows)
+
+        session.execute = checked_execute
+        return session
+
+    writer = GroupCommitWriter(checked_session, max_rows=3, max_delay=1)
+    futures = [writer.submit(content) for content in ("m0", "ruim", "m2")]
+
+    with pytest.raises(TypeError):
+        futures[1].result(5)
+    assert [futures[0].result(5), futures[2].result(5)] == [True, True]
+    writer.stop()
+    assert remaining(session_factory) == ["m0", "m2"]
+
+
+@pytest.mark.unit
+def test_enqueue_wait_is_bounded(session_factory):
+    """Se o commit não terminar, quem enfileira desiste após commit_timeout."""
+    drainer = OutboxDrainer(session_factory=session_factory, ready=lambda: False, commit_timeout=0.1)
+    drainer.writer.submit = lambda *args: Future()
+    try:
+        started = time.monotonic()
+        with pytest.raises(TimeoutError):
+            drainer.enqueue("payload", wait=True)
+        assert time.monotonic() - started < 2
+    finally:
+        drainer.stop()
+
+
+@pytest.mark.unit
+def test_group_commit_rejects_non_text_payloads(session_factory):
+    writer = GroupCommitWriter(session_factory)
+    for content in (None, ("payload",)):
+        with pytest.raises(TypeError):
+            writer.submit(content)
+    writer.stop()
+    drainer = make_drainer(session_factory, FakeBroker())
+    with pytest.raises(TypeError):
+        drainer.enqueue(b"bytes")
+    drainer.stop()
+
+
+@pytest.mark.unit
+def test_backlog_replay_is_rate_limited_and_live_goes_first(session_factory):
+    """O backlog é reenviado em ordem e no limite de taxa; mensagens novas passam na frente."""
+    drainer = None
+
+    class LiveDuringReplay(FakeBroker):
+        def publish(self, payload, routing_key=None):
+            if payload == "m0":
+                # Uma mensagem nova chega durante o reenvio do backlog
+                fill_live(drainer)
+            return super().publish(payload, routing_key)
+
+    def fill_live(drainer):
+        with drainer.session_factory() as session:
+            session.execute(persistence.__table__.insert(), [{"content_data": "live", "sended": False}])
+            session.commit()
+
+    broker = LiveDuringReplay()
+    drainer = make_drainer(session_factory, broker, page_size=10, replay_rate=100)
+    fill(drainer, 20)
+
+    started = time.monotonic()
+    assert drainer.drain_once() == 21
+    elapsed = time.monotonic() - started
+
+    assert elapsed >= 0.15
+    backlog = [payload for payload in broker.published if payload != "live"]
+    assert backlog == [f"m{i}" for i in range(20)]
+    assert broker.published.index("live") < broker.published.index("m19")
+    assert remaining(session_factory) == []
+    assert drainer.stats()["reenvio_ativo"] is False
+
+
+@pytest.mark.unit
+def test_replay_stats(session_factory):
+    broker = FakeBroker(reject={"m5"})
+    drainer = make_drainer(session_factory, broker, page_size=5, replay_rate=0)
+    fill(drainer, 10)
+
+    assert drainer.drain_once() == 9
+    stats = drainer.stats()
+    assert stats["reenvio_ativo"] is True
+    assert stats["reenvio_restante"] == 1
+    assert stats["pendentes"] == 1
+    assert stats["reenvio_taxa"] > 0
+    assert stats["reenvio_eta_s"] is not None
+
+
+def fill_rows(session_factory, rows):
+    with session_factory() as session:
+        session.execute(persistence.__table__.insert(),
+                        [dict({"sended": False}, **row) for row in rows])
+        session.commit()
+
+
+def quota(session_factory, **kwargs):
+    kwargs.setdefault("max_rows", 0)
+    kwargs.setdefault("max_bytes", 0)
+    kwargs.setdefault("max_age", 0)
+    kwargs.setdefault("vacuum_pages", 0)
+    return StorageQuota(session_factory, **kwargs)
+
+
+@pytest.mark.unit
+def test_quota_drops_oldest_rows(session_factory):
+    now = int(time.time())
+    fill_rows(session_factory, [{"content_data": f"m{i}", "kind": "sensor", "created_at": now} for i in range(10)])
+    storage = quota(session_factory, max_rows=6, policies="drop_oldest")
+
+    assert storage.enforce() == 4
+    assert remaining(session_factory) == [f"m{i}" for i in range(4, 10)]
+    assert storage.stats() == {"descartadas": {"idade": 0, "status_first": 0, "downsample": 0, "drop_oldest": 4}}
+
+
+@pytest.mark.unit
+def test_quota_drops_status_and_health_first(session_factory):
+    now = int(time.time())
+    fill_rows(session_factory, [
+        {"content_data": "s0", "kind": "sensor", "created_at": now},
+        {"content_data": "status", "kind": "status", "created_at": now},
+        {"content_data": "s1", "kind": "sensor", "created_at": now},
+        {"content_data": "health", "kind": "health", "created_at": now},
+        {"content_data": "s2", "kind": "sensor", "created_at": now},
+    ])
+    storage = quota(session_factory, max_rows=3, policies="status_first,drop_oldest")
+
+    assert storage.enforce() == 2
+    assert remaining(session_factory) == ["s0", "s1", "s2"]
+
+
+@pytest.mark.unit
+def test_quota_downsamples_old_sensor_data(session_factory):
+    now = int(time.time())
+    start = (now - 7200) // 300 * 300
+    fill_rows(session_factory, [{"content_data": f"old{i}", "kind": "sensor", "source": "DP_1",
+                                 "created_at": start + 60 * i} for i in range(20)])
+    fill_rows(session_factory, [{"content_data": f"new{i}", "kind": "sensor", "source": "DP_1", "created_at": now}
+                                for i in range(5)])
+    storage = quota(session_factory, max_rows=9, policies="downsample",
+                    downsample_interval=300, downsample_age=3600)
+
+    storage.enforce()
+    kept = remaining(session_factory)
+    assert [row for row in kept if row.startswith("new")] == [f"new{i}" for i in range(5)]
+    # Uma leitura a cada 5 minutos (a primeira de cada intervalo)
+    assert [row for row in kept if row.startswith("old")] == ["old0", "old5", "old10", "old15"]
+
+
+@pytest.mark.unit
+def test_quota_downsample_keeps_history_of_every_sensor(session_factory):
+    """Com leituras intercaladas de vários sensores, todos mantêm parte do histórico."""
+    start = (int(time.time()) - 7200) // 600 * 600
+    sources = ["DP_1", "DP_2", "DP_3", "DP_4", "EQ_1"]
+    fill_rows(session_factory, [{"content_data": f"{source}@{cycle}", "kind": "sensor", "source": source,
+                                 "created_at": start + 60 * cycle}
+                                for cycle in range(30) for source in sources])
+    storage = quota(session_factory, max_rows=10, policies="downsample",
+                    downsample_interval=600, downsample_age=3600)
+
+    assert storage.enforce() == 150 - 15
+    kept = remaining(session_factory)
+    for source in sources:
+        assert [row for row in kept if row.startswith(source + "@")] == [f"{source}@{c}" for c in (0, 10, 20)]
+
+    # Já reduzido: uma nova passada não descarta mais nada
+    assert storage.enforce() == 0
+
+
+@pytest.mark.unit
+def test_quota_drops_expired_rows(session_factory):
+    fill_rows(session_factory, [
+        {"content_data": "expired", "kind": "sensor", "created_at": int(time.time()) - 100},
+        {"content_data": "fresh", "kind": "sensor", "created_at": int(time.time())},
+    ])
+    storage = quota(session_factory, max_age=50)
+
+    assert storage.enforce() == 1
+    assert remaining(session_factory) == ["fresh"]
+    assert storage.evicted["idade"] == 1
+
+
+@pytest.mark.unit
+def test_quota_limits_bytes_and_reclaims_space(tmp_path):
+    path = tmp_path / "quota.db"
+    engine = create_engine(f"sqlite:///{path}")
+    persistence.__table__.create(engine)
+    factory = sessionmaker(bind=engine)
+    try:
+        now = int(time.time())
+        fill_rows(factory, [{"content_data": "x" * 4000, "kind": "sensor", "created_at": now} for _ in range(500)])
+        size_before = path.stat().st_size
+        storage = quota(factory, max_bytes=400 * 1024, vacuum_pages=100000, policies="drop_oldest")
+
+        assert storage.enforce() > 0
+        with engine.connect() as connection:
+            assert connection.exec_driver_sql("PRAGMA auto_vacuum").scalar() == 2
+        assert path.stat().st_size <= 400 * 1024 + 64 * 1024
+        assert path.stat().st_size < size_before
+    finally:
+        engine.dispose()
+
+
+@pytest.mark.unit
+def test_strict_lanes_send_status_before_sensor_backlog(session_factory):
+    """Com prioridade estrita, status e health saem antes de qualquer sensor."""
+    now = int(time.time())
+    fill_rows(session_factory, [{"content_data": f"s{i}", "kind": "sensor", "created_at": now} for i in range(6)])
+    fill_rows(session_factory, [{"content_data": "health", "kind": "health", "created_at": now},
+                                {"content_data": "status", "kind": "status", "created_at": now},
+                                {"content_data": "legacy", "kind": None, "created_at": None}])
+    broker = FakeBroker()
+    drainer = OutboxDrainer(session_factory=session_factory, page_size=2, replay_rate=0,
+                            publish=broker.publish, wait=broker.wait, ready=lambda: True,
+                            lanes="status,health,sensor", scheduling="strict",
+                            routing="status:gateway.status,health:gateway.health")
+
+    assert drainer.drain_once() == 9
+    assert broker.published[:2] == ["status", "health"]
+    assert broker.published[2:] == ["s0", "s1", "s2", "s3", "s4", "s5", "legacy"]
+    assert broker.routing_keys[:3] == ["gateway.status", "gateway.health", None]
+    assert remaining(session_factory) == []
+
+
+@pytest.mark.unit
+def test_weighted_lanes_share_each_page(session_factory):
+    now = int(time.time())
+    fill_rows(session_factory, [{"content_data": f"s{i}", "kind": "sensor", "created_at": now} for i in range(10)])
+    fill_rows(session_factory, [{"content_data": f"st{i}", "kind": "status", "created_at": now} for i in range(10)])
+    broker = FakeBroker()
+    drainer = OutboxDrainer(session_factory=session_factory, page_size=4, replay_rate=0,
+                            publish=broker.publish, wait=broker.wait, ready=lambda: True,
+                            lanes="status,sensor", scheduling="weighted", weights="status:3,sensor:1")
+
+    assert drainer.drain_once() == 20
+    assert broker.published[:4] == ["st0", "st1", "st2", "s0"]
+    assert remaining(session_factory) == []
+
+
+@pytest.mark.unit
+def test_weighted_backlog_pass_never_exceeds_the_token_budget(session_factory):
+    """Com mais faixas que tokens, cada passada do backlog envia exatamente o orçamento e as faixas se alternam."""
+    now = int(time.time())
+    lanes = ["status", "health", "alarm", "sensor"]
+    fill_rows(session_factory, [{"content_data": f"{lane}{i}", "kind": lane, "created_at": now}
+                                for i in range(3) for lane in lanes])
+    broker = FakeBroker()
+    drainer = OutboxDrainer(session_factory=session_factory, page_size=10, replay_rate=1000,
+                            publish=broker.publish, wait=broker.wait, ready=lambda: True,
+                            lanes=",".join(lanes), scheduling="weighted", weights="")
+    drainer._take_tokens = lambda: 2
+    passes = []
+    schedule = drainer._schedule
+
+    def recording_schedule(session, condition, limit, credit):
+        batches = schedule(session, condition, limit, credit)
+        passes.append((limit, [lane for lane, rows in batches for _ in rows]))
+        return batches
+
+    drainer._schedule = recording_schedule
+
+    assert drainer.drain_once() == 12
+    backlog = [served for limit, served in passes if limit == 2 and served]
+    assert all(len(served) <= limit for limit, served in passes)
+    assert [len(served) for served in backlog] == [2] * 6
+    # Duas passadas bastam para todas as faixas serem atendidas
+    assert sorted(backlog[0] + backlog[1]) == sorted(lanes)
+
+
+@pytest.mark.unit
+def test_weighted_split_is_exact_and_proportional(session_factory):
+    drainer = OutboxDrainer(session_factory=session_factory, lanes="status,health,sensor",
+                            scheduling="weighted", weights="status:6,health:3,sensor:1")
+
+    credit = dict.fromkeys(drainer.lanes, 0.0)
+    shares = [drainer._split(3, credit) for _ in range(10)]
+
+    assert all(sum(share.values()) == 3 for share in shares)
+    assert {lane: sum(share[lane] for share in shares) for lane in drainer.lanes} == \
+        {"status": 18, "health": 9, "sensor": 3}
+    assert sum(drainer._split(0, credit).values()) == 0
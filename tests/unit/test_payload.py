@@ -0,0 +1,101 @@
+import json
+
+import pytest
+
+from payload import PayloadTemplate, Slot, TemplateCache, json_array
+
+
+def document(timestamp, value):
+    return {
+        "gateways": [{"timestamp": timestamp, "gateway_name": "GW_Subestação", "SE_id": 2}],
+        "registers": [{"register_id": "DP_1", "register_tags": {"fase": "A"}, "register_value": value}],
+    }
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("value", [21.5, -3.0e-7, 0, 10**20, None, True, False, "texto \"com\" aspas ç\n",
+                                   float("nan"), {"a": [1, 2]}, [], {}, (1, "x")])
+def test_render_matches_full_serialization(value):
+    template = PayloadTemplate(document(Slot("timestamp"), Slot("register_value")))
+
+    rendered = template.render(timestamp=1730462400.123456, register_value=value)
+
+    assert rendered == json.dumps(document(1730462400.123456, value), indent=4, ensure_ascii=False)
+
+
+@pytest.mark.unit
+def test_render_without_indent():
+    template = PayloadTemplate(document(Slot("timestamp"), Slot("register_value")), indent=None)
+
+    rendered = template.render(timestamp=1.5, register_value={"x": 1})
+
+    assert rendered == json.dumps(document(1.5, {"x": 1}), ensure_ascii=False)
+    assert template.slots == ["timestamp", "register_value"]
+
+
+@pytest.mark.unit
+def test_cache_rebuilds_when_snapshot_changes():
+    class Store:
+        snapshot = object()
+
+        def current(self):
+            return self.snapshot
+
+    built = []
+
+    def builder(snapshot, protocol, xid_sensor):
+        built.append((snapshot, xid_sensor))
+        if xid_sensor == "ausente":
+            return None
+        return {"register_id": xid_sensor, "register_value": Slot("register_value")}
+
+    store = Store()
+    cache = TemplateCache(builder, store=store)
+
+    first = cache.get("MODBUS", "DP_1")
+    assert cache.get("MODBUS", "DP_1") is first
+    assert cache.get("MODBUS", "ausente") is None
+    assert cache.get("MODBUS", "ausente") is None
+    assert len(built) == 2
+
+    store.snapshot = object()
+    second = cache.get("MODBUS", "DP_1")
+    assert second is not first
+    assert json.loads(second.render(register_value=3)) == {"register_id": "DP_1", "register_value": 3}
+    assert len(built) == 3
+
+
+@pytest.mark.unit
+def test_partial_snapshots_are_not_cached():
+    class Partial:
+        complete = False
+
+    class Store:
+        def current(self):
+            raise AssertionError("a cópia completa não deve ser lida")
+
+    built = []
+    cache = TemplateCache(lambda snapshot, xid: built.append(xid) or {"id": xid, "v": Slot("v")}, store=Store())
+
+    cache.get("DP_1", snapshot=Partial())
+    cache.get("DP_1", snapshot=Partial())
+
+    assert built == ["DP_1", "DP_1"]
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("indent", [4, None])
+@pytest.mark.parametrize("count", [0, 1, 3])
+def test_registers_array_matches_full_serialization(indent, count):
+    registers = [{"register_id": f"DP_{i}", "register_tags": {"fase": "A"}, "register_value": i * 1.5}
+                 for i in range(count)]
+    envelope = PayloadTemplate({"gateways": [{"timestamp": Slot("timestamp")}], "registers": Slot("registers")},
+                               indent=indent)
+    register = PayloadTemplate({"register_id": Slot("id"), "register_tags": {"fase": "A"},
+                                "register_value": Slot("register_value")}, indent=indent)
+
+    texts = [register.render(id=r["register_id"], register_value=r["register_value"]) for r in registers]
+    text = envelope.render(timestamp=1.25, registers=json_array(texts, indent))
+
+    assert text == json.dumps({"gateways": [{"timestamp": 1.25}], "registers": registers},
+                              indent=indent, ensure_ascii=False)
@@ -0,0 +1,64 @@
+import threading
+import time
+
+import pytest
+
+from scadalts import PointValueCache
+
+
+@pytest.mark.unit
+def test_cache_hit_and_ttl():
+    """Valores ficam em cache até o TTL e depois são lidos novamente."""
+    cache = PointValueCache(ttl=0.05, max_size=10)
+    calls = []
+    fetch = lambda xid: calls.append(xid) or {"xid": xid}
+
+    assert cache.get("DP_1", fetch) == {"xid": "DP_1"}
+    assert cache.get("DP_1", fetch) == {"xid": "DP_1"}
+    assert calls == ["DP_1"]
+
+    time.sleep(0.06)
+    cache.get("DP_1", fetch)
+    assert calls == ["DP_1", "DP_1"]
+    assert cache.stats() == {"hits": 1, "misses": 2, "coalesced": 0, "size": 1}
+
+
+@pytest.mark.unit
+def test_cache_lru_and_failures():
+    """O cache descarta os pontos menos usados e não guarda falhas."""
+    cache = PointValueCache(ttl=60, max_size=2)
+    cache.get_many(["DP_1", "DP_2"], lambda xids: {xid: xid for xid in xids})
+    cache.get("DP_1", lambda xid: xid)
+    cache.get("DP_3", lambda xid: xid)
+    cache.get("DP_4", lambda xid: None)
+
+    calls = []
+    result = cache.get_many(["DP_1", "DP_2", "DP_3", "DP_4"], lambda xids: calls.extend(xids) or {})
+    assert calls == ["DP_2", "DP_4"]
+    assert result == {"DP_1": "DP_1", "DP_2": None, "DP_3": "DP_3", "DP_4": None}
+
+
+@pytest.mark.unit
+def test_cache_coalescing():
+    """Leituras simultâneas do mesmo ponto geram uma única requisição."""
+    cache = PointValueCache(ttl=60, max_size=10)
+    calls = []
+
+    def fetch_many(xids):
+        calls.append(list(xids))
+        time.sleep(0.1)
+        return {xid: {"xid": xid} for xid in xids}
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get_many(["DP_1", "DP_2"], fetch_many)))
+        for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert calls == [["DP_1", "DP_2"]]
+    assert all(result == {"DP_1": {"xid": "DP_1"}, "DP_2": {"xid": "DP_2"}} for result in results)
+    assert cache.stats()["coalesced"] == 8
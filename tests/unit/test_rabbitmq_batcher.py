@@ -0,0 +1,84 @@
+import json
+import time
+from concurrent.futures import Future
+from unittest import mock
+
+import pytest
+
+from rabbitmq import MessageBatcher
+
+
+@pytest.fixture
+def fake_publisher():
+    """Publicador simulado que confirma imediatamente cada mensagem publicada."""
+    publisher = mock.MagicMock(routing_key="sensor")
+
+    def publish_async(body, routing_key=None, properties=None):
+        future = Future()
+        future.set_result(True)
+        return future
+
+    publisher.publish_async.side_effect = publish_async
+    return publisher
+
+
+def published(publisher):
+    return [(call.args[1], json.loads(call.args[0])) for call in publisher.publish_async.call_args_list]
+
+
+@pytest.mark.unit
+def test_batch_flushes_on_max_messages(fake_publisher):
+    """Ao atingir o número máximo o lote vira uma única mensagem com array JSON."""
+    batcher = MessageBatcher(fake_publisher, max_messages=3, max_bytes=65536, linger=60)
+    futures = [batcher.add(json.dumps({"n": i})) for i in range(3)]
+
+    assert all(future.result(1) is True for future in futures)
+    assert published(fake_publisher) == [("sensor", [{"n": 0}, {"n": 1}, {"n": 2}])]
+    properties = fake_publisher.publish_async.call_args.args[2]
+    assert properties.headers == {"batch_size": 3}
+    batcher.close()
+
+
+@pytest.mark.unit
+def test_batch_flushes_on_linger(fake_publisher):
+    """Um lote incompleto é publicado ao vencer o tempo de espera."""
+    batcher = MessageBatcher(fake_publisher, max_messages=100, max_bytes=65536, linger=0.05)
+    started = time.monotonic()
+    future = batcher.add('{"n": 1}')
+
+    assert future.result(2) is True
+    assert time.monotonic() - started >= 0.05
+    assert published(fake_publisher) == [("sensor", [{"n": 1}])]
+    batcher.close()
+
+
+@pytest.mark.unit
+def test_batch_respects_max_bytes_and_routing_key(fake_publisher):
+    """Lotes são separados por routing key e não passam do tamanho máximo."""
+    batcher = MessageBatcher(fake_publisher, max_messages=100, max_bytes=30, linger=60)
+    batcher.add('{"value": 1111111}')
+    batcher.add('{"value": 2}', routing_key="status")
+    batcher.add('{"value": 3333333}')
+    batcher.flush()
+
+    assert sorted(published(fake_publisher), key=str) == sorted([
+        ("sensor", [{"value": 1111111}]),
+        ("sensor", [{"value": 3333333}]),
+        ("status", [{"value": 2}]),
+    ], key=str)
+    batcher.close()
+
+
+@pytest.mark.unit
+def test_batch_failure_resolves_every_future(fake_publisher):
+    """Se o lote falhar, todas as mensagens dele recebem False."""
+    failed = Future()
+    failed.set_result(False)
+    fake_publisher.publish_async.side_effect = None
+    fake_publisher.publish_async.return_value = failed
+
+    batcher = MessageBatcher(fake_publisher, max_messages=2, max_bytes=65536, linger=60)
+    futures = [batcher.add('{"n": 1}'), batcher.add('{"n": 2}')]
+
+    assert [future.result(1) for future in futures] == [False, False]
+    batcher.close()
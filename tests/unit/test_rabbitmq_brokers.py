@@ -0,0 +1,86 @@
+from concurrent.futures import Future
+from unittest import mock
+
+import pytest
+
+from rabbitmq import BrokerPool, parse_brokers
+
+
+def fake_broker(name, connected=True, blocked=False, outstanding=0):
+    broker = mock.MagicMock(host=name, port=5672, routing_key="sensor")
+    broker.is_connected.return_value = connected
+    broker.is_blocked.return_value = blocked
+    broker.outstanding.return_value = outstanding
+
+    def publish_async(body, routing_key=None, properties=None):
+        future = Future()
+        future.set_result(True)
+        return future
+
+    broker.publish_async.side_effect = publish_async
+    return broker
+
+
+@pytest.mark.unit
+def test_parse_brokers():
+    assert parse_brokers("a:5673, b ,c:1", 5672) == [("a", 5673), ("b", 5672), ("c", 1)]
+    assert parse_brokers("", 5672) == []
+
+
+@pytest.mark.unit
+def test_priority_failover_and_failback():
+    """Usa o primeiro broker saudável e volta para ele quando se recupera."""
+    primary, secondary = fake_broker("primary"), fake_broker("secondary")
+    pool = BrokerPool([primary, secondary], policy="priority")
+
+    assert pool.publish("m1") is True
+    primary.is_connected.return_value = False
+    assert pool.publish("m2") is True
+    primary.is_connected.return_value = True
+    assert pool.publish("m3") is True
+
+    assert primary.publish_async.call_count == 2
+    assert secondary.publish_async.call_count == 1
+
+
+@pytest.mark.unit
+def test_blocked_broker_is_skipped():
+    """Broker bloqueado pelo controle de fluxo não recebe mensagens."""
+    primary, secondary = fake_broker("primary", blocked=True), fake_broker("secondary")
+    pool = BrokerPool([primary, secondary], policy="priority")
+
+    assert pool.select() is secondary
+    assert pool.is_blocked() is False
+
+
+@pytest.mark.unit
+def test_round_robin_spreads_load():
+    brokers = [fake_broker("a"), fake_broker("b"), fake_broker("c")]
+    pool = BrokerPool(brokers, policy="round_robin")
+
+    for i in range(6):
+        pool.publish(f"m{i}")
+
+    assert [broker.publish_async.call_count for broker in brokers] == [2, 2, 2]
+
+
+@pytest.mark.unit
+def test_least_outstanding():
+    busy, idle = fake_broker("busy", outstanding=50), fake_broker("idle", outstanding=2)
+    pool = BrokerPool([busy, idle], policy="least_outstanding")
+
+    assert pool.select() is idle
+
+
+@pytest.mark.unit
+def test_no_healthy_broker_fails_fast():
+    pool = BrokerPool([fake_broker("a", connected=False)], policy="priority")
+
+    assert pool.publish_async("m").result(0) is False
+    assert pool.wait_ready(0.01) is False
+
+
+@pytest.mark.unit
+def test_invalid_policy():
+    with pytest.raises(ValueError):
+        BrokerPool([fake_broker("a")], policy="random")
@@ -0,0 +1,133 @@
+from concurrent.futures import Future
+from unittest import mock
+
+import pika
+import pytest
+
+import rabbitmq
+from rabbitmq import RabbitPublisher
+
+
+def make_publisher(confirms):
+    """Publicador com conexão e canal simulados, já prontos para publicar."""
+    publisher = RabbitPublisher(host="broker", port=5672, username="u", password="p",
+                                exchange="amq.topic", queue="Gateway", routing_key="sensor",
+                                confirms=confirms)
+    publisher._connection = mock.MagicMock()
+    publisher._connection.ioloop.add_callback_threadsafe.side_effect = lambda callback: callback()
+    publisher._channel = mock.MagicMock(is_open=True)
+    publisher._ready.set()
+    return publisher
+
+
+@pytest.fixture
+def connected_publisher():
+    publisher = make_publisher(confirms=False)
+    with mock.patch.object(publisher, "start"):
+        yield publisher
+
+
+@pytest.fixture
+def confirming_publisher():
+    publisher = make_publisher(confirms=True)
+    with mock.patch.object(publisher, "start"):
+        yield publisher
+
+
+def confirmation(method):
+    return mock.MagicMock(method=method)
+
+
+@pytest.mark.unit
+def test_publish_uses_long_lived_channel(connected_publisher):
+    """Publicações reutilizam o canal aberto, sem novas conexões."""
+    with mock.patch("pika.BlockingConnection") as mock_blocking, \
+         mock.patch("pika.SelectConnection") as mock_select:
+        assert connected_publisher.publish("payload 1") is True
+        assert connected_publisher.publish("payload 2", routing_key="status") is True
+
+    mock_blocking.assert_not_called()
+    mock_select.assert_not_called()
+    channel = connected_publisher._channel
+    assert channel.basic_publish.call_count == 2
+    channel.basic_publish.assert_called_with(
+        exchange="amq.topic", routing_key="status", body="payload 2", properties=None)
+
+
+@pytest.mark.unit
+def test_publish_fails_fast_when_disconnected(connected_publisher):
+    """Sem conexão pronta a publicação falha na hora."""
+    connected_publisher._ready.clear()
+    assert connected_publisher.publish_async("payload").result(0) is False
+    connected_publisher._channel.basic_publish.assert_not_called()
+
+
+@pytest.mark.unit
+def test_publish_blocked_by_broker(connected_publisher):
+    """Durante connection.blocked as publicações são recusadas (controle de fluxo)."""
+    connected_publisher._on_connection_blocked(None, None)
+    assert connected_publisher.publish("payload") is False
+
+    connected_publisher._on_connection_unblocked(None, None)
+    assert connected_publisher.publish("payload") is True
+
+
+@pytest.mark.unit
+def test_check_rabbitmq_connection_reuses_publisher():
+    """A checagem de conexão usa a conexão do publicador e não abre outra."""
+    with mock.patch.object(rabbitmq.publisher, "wait_ready", return_value=True) as mock_wait, \
+         mock.patch("pika.BlockingConnection") as mock_blocking:
+        assert rabbitmq.check_rabbitmq_connection() is True
+
+    mock_wait.assert_called_once()
+    mock_blocking.assert_not_called()
+
+
+@pytest.mark.unit
+def test_confirms_resolve_pipelined_publishes(confirming_publisher):
+    """Várias mensagens aguardam confirmação ao mesmo tempo; ack múltiplo resolve todas."""
+    futures = [confirming_publisher.publish_async(f"payload {i}") for i in range(3)]
+    assert not any(future.done() for future in futures)
+    assert confirming_publisher.outstanding() == 3
+
+    confirming_publisher._on_delivery_confirmation(
+        confirmation(pika.spec.Basic.Ack(delivery_tag=2, multiple=True)))
+    assert [future.done() for future in futures] == [True, True, False]
+    assert futures[0].result() is True and futures[1].result() is True
+
+    confirming_publisher._on_delivery_confirmation(
+        confirmation(pika.spec.Basic.Nack(delivery_tag=3)))
+    assert futures[2].result(0) is False
+    assert confirming_publisher.outstanding() == 0
+
+
+@pytest.mark.unit
+def test_confirms_fail_outstanding_on_channel_close(confirming_publisher):
+    """Mensagens sem confirmação falham quando o canal cai, para serem reenviadas."""
+    future = confirming_publisher.publish_async("payload")
+    confirming_publisher._on_channel_closed(None, None)
+
+    assert future.result(0) is False
+    assert confirming_publisher.outstanding() == 0
+
+
+@pytest.mark.unit
+def test_channel_open_enables_confirm_mode(confirming_publisher):
+    """Com confirms o canal entra em confirm mode antes de declarar a fila."""
+    channel = mock.MagicMock()
+    confirming_publisher._on_channel_open(channel)
+
+    channel.confirm_delivery.assert_called_once()
+    channel.queue_declare.assert_not_called()
+    channel.confirm_delivery.call_args.kwargs["callback"](None)
+    channel.queue_declare.assert_called_once()
+
+
+@pytest.mark.unit
+def test_wait_confirms_returns_only_acked_keys():
+    """Somente as chaves confirmadas são retornadas; nack e sem resposta ficam de fora."""
+    acked, nacked, unanswered = Future(), Future(), Future()
+    acked.set_result(True)
+    nacked.set_result(False)
+
+    assert rabbitmq.wait_confirms([(1, acked), (2, nacked), (3, unanswered)], timeout=0.01) == [1]
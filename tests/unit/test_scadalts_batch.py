@@ -0,0 +1,106 @@
+import pytest
+from unittest import mock
+
+import scadalts
+
+
+BATCH_URL = "http://localhost:8080/Scada-LTS/api/point_value/getValues"
+
+
+def concurrent(xids):
+    return ((xid, {"xid": xid, "value": "ponto"}) for xid in xids)
+
+
+@pytest.fixture(autouse=True)
+def reset_batch_support():
+    """Reseta o estado de suporte à leitura em lote e o cache entre os testes (leitura em lote configurada)."""
+    scadalts.batch_support["enabled"] = None
+    with mock.patch.object(scadalts, "point_cache", scadalts.PointValueCache()), \
+         mock.patch.object(scadalts, "SCADA_BATCH_URL", BATCH_URL):
+        yield
+    scadalts.batch_support["enabled"] = None
+
+
+@pytest.mark.unit
+def test_get_json_data_many_batch():
+    """Valores lidos em lote são mapeados por xid."""
+    response = [{"xid": "DP_1", "value": "1"}, {"xid": "DP_2", "value": "2"}]
+    with mock.patch.object(scadalts, "get_valid_cookie", return_value="JSESSIONID=abc"), \
+         mock.patch.object(scadalts, "post_with_cookie", return_value=(200, response)) as mock_post, \
+         mock.patch.object(scadalts, "get_json_data_concurrent") as mock_get:
+        result = scadalts.get_json_data_many(["DP_1", "DP_2"])
+
+    assert result == {"DP_1": response[0], "DP_2": response[1]}
+    mock_post.assert_called_once_with(BATCH_URL, "JSESSIONID=abc", ["DP_1", "DP_2"])
+    mock_get.assert_not_called()
+    assert scadalts.batch_support["enabled"] is True
+
+
+@pytest.mark.unit
+def test_get_json_data_many_reads_points_missing_from_the_batch():
+    """xid ausentes da resposta do lote são lidos ponto a ponto."""
+    response = [{"xid": "DP_1", "value": "1"}]
+    with mock.patch.object(scadalts, "get_valid_cookie", return_value="JSESSIONID=abc"), \
+         mock.patch.object(scadalts, "post_with_cookie", return_value=(200, response)), \
+         mock.patch.object(scadalts, "get_json_data_concurrent", side_effect=concurrent) as mock_get:
+        result = scadalts.get_json_data_many(["DP_1", "DP_2", "DP_3"])
+
+    assert result["DP_1"] == response[0]
+    assert result["DP_2"]["value"] == result["DP_3"]["value"] == "ponto"
+    mock_get.assert_called_once_with(["DP_2", "DP_3"])
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("failure", [(500, None), (400, None), (None, None), (200, {"erro": "formato"})])
+def test_get_json_data_many_reads_failed_chunks_point_by_point(failure):
+    """Um lote com erro (5xx, 400, falha de conexão ou resposta inválida) é lido ponto a ponto."""
+    responses = iter([(200, [{"xid": "DP_0"}, {"xid": "DP_1"}]), failure, (200, [{"xid": "DP_4"}])])
+    with mock.patch.object(scadalts, "SCADA_BATCH_SIZE", 2), \
+         mock.patch.object(scadalts, "get_valid_cookie", return_value="JSESSIONID=abc"), \
+         mock.patch.object(scadalts, "post_with_cookie", side_effect=lambda *args: next(responses)), \
+         mock.patch.object(scadalts, "get_json_data_concurrent", side_effect=concurrent) as mock_get:
+        result = scadalts.get_json_data_many([f"DP_{i}" for i in range(5)])
+
+    mock_get.assert_called_once_with(["DP_2", "DP_3"])
+    assert all(result[xid] is not None for xid in result)
+    assert scadalts.batch_support["enabled"] is True
+
+
+@pytest.mark.unit
+def test_get_json_data_many_without_batch_url_reads_point_by_point():
+    """Sem SCADA_BATCH_URL o endpoint de lote não é usado."""
+    with mock.patch.object(scadalts, "SCADA_BATCH_URL", ""), \
+         mock.patch.object(scadalts, "post_with_cookie") as mock_post, \
+         mock.patch.object(scadalts, "get_json_data_concurrent", side_effect=concurrent) as mock_get:
+        result = scadalts.get_json_data_many(["DP_1", "DP_2"])
+
+    mock_post.assert_not_called()
+    mock_get.assert_called_once_with(["DP_1", "DP_2"])
+    assert result["DP_1"]["xid"] == "DP_1"
+
+
+@pytest.mark.unit
+def test_get_json_data_many_chunks():
+    """Listas maiores que SCADA_BATCH_SIZE são divididas em lotes."""
+    xids = [f"DP_{i}" for i in range(5)]
+    with mock.patch.object(scadalts, "SCADA_BATCH_SIZE", 2), \
+         mock.patch.object(scadalts, "get_valid_cookie", return_value="JSESSIONID=abc"), \
+         mock.patch.object(scadalts, "post_with_cookie", return_value=(200, [])) as mock_post, \
+         mock.patch.object(scadalts, "get_json_data_concurrent", side_effect=concurrent):
+        scadalts.get_json_data_many(xids)
+
+    assert [c.args[2] for c in mock_post.call_args_list] == [xids[0:2], xids[2:4], xids[4:5]]
+
+
+@pytest.mark.unit
+def test_get_json_data_many_fallback():
+    """Sem suporte a lote no Scada-LTS, a leitura volta a ser ponto a ponto."""
+    with mock.patch.object(scadalts, "get_valid_cookie", return_value="JSESSIONID=abc"), \
+         mock.patch.object(scadalts, "post_with_cookie", return_value=(404, None)), \
+         mock.patch.object(scadalts, "get_json_data_concurrent",
+                           side_effect=lambda xids: ((xid, {"xid": xid}) for xid in xids)) as mock_get:
+        result = scadalts.get_json_data_many(["DP_1", "DP_2"])
+
+    assert result == {"DP_1": {"xid": "DP_1"}, "DP_2": {"xid": "DP_2"}}
+    mock_get.assert_called_once_with(["DP_1", "DP_2"])
+    assert scadalts.batch_support["enabled"] is False
@@ -0,0 +1,97 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+import pytest
+
+import scadalts
+
+DELAY = 0.3
+
+
+class PointValueHandler(BaseHTTPRequestHandler):
+    """Simula o endpoint getValue do Scada-LTS com latência fixa."""
+
+    protocol_version = "HTTP/1.1"
+    delay = DELAY
+    clients = set()
+
+    def do_GET(self):
+        self.clients.add(self.client_address)
+        time.sleep(self.delay)
+        xid = self.path.rsplit("/", 1)[-1]
+        if xid == "DP_404":
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = json.dumps({"xid": xid, "value": xid.split("_")[-1]}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ScadaServer(ThreadingHTTPServer):
+    request_queue_size = 64
+
+
+@pytest.fixture
+def scada_server():
+    """Servidor HTTP local no lugar do Scada-LTS."""
+    PointValueHandler.clients = set()
+    server = ScadaServer(("127.0.0.1", 0), PointValueHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    with mock.patch.object(scadalts, "URL_BASE", f"http://127.0.0.1:{server.server_port}"), \
+         mock.patch.object(scadalts, "get_valid_cookie", return_value="JSESSIONID=abc"):
+        yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.unit
+def test_get_json_data_concurrent(scada_server):
+    """As requisições ficam em paralelo: o tempo total é próximo de uma latência."""
+    xids = [f"DP_{i}" for i in range(8)] + ["DP_404"]
+
+    start = time.monotonic()
+    result = dict(scadalts.get_json_data_concurrent(xids, max_concurrent=16))
+    elapsed = time.monotonic() - start
+
+    assert set(result) == set(xids)
+    assert result["DP_3"] == {"xid": "DP_3", "value": "3"}
+    assert result["DP_404"] is None
+    assert elapsed < DELAY * 4
+
+
+@pytest.mark.unit
+def test_get_json_data_concurrent_cap(scada_server):
+    """O limite de requisições simultâneas é respeitado."""
+    xids = [f"DP_{i}" for i in range(4)]
+
+    start = time.monotonic()
+    result = dict(scadalts.get_json_data_concurrent(xids, max_concurrent=2))
+    elapsed = time.monotonic() - start
+
+    assert len(result) == 4
+    assert elapsed >= DELAY * 2
+
+
+@pytest.mark.unit
+def test_curl_pool_keep_alive(scada_server):
+    """Requisições sequenciais reaproveitam a mesma conexão TCP do pool."""
+    with mock.patch.object(PointValueHandler, "delay", 0), \
+         mock.patch.object(scadalts, "point_cache", scadalts.PointValueCache()), \
+         mock.patch.object(scadalts, "curl_pool", scadalts.CurlPool(size=2)):
+        for i in range(5):
+            assert scadalts.get_json_data(f"DP_{i}") == {"xid": f"DP_{i}", "value": str(i)}
+        scadalts.curl_pool.close()
+
+    assert len(PointValueHandler.clients) == 1
@@ -0,0 +1,80 @@
+import threading
+import time
+from unittest import mock
+
+import pytest
+
+import scadalts
+
+
+def fake_login(calls, cookie="JSESSIONID=new", delay=0.2):
+    """Simula a autenticação no Scada-LTS gravando o cookie no cache."""
+    def login(url):
+        calls.append(url)
+        time.sleep(delay)
+        scadalts.cookie_cache["value"] = cookie
+        scadalts.cookie_cache["expires_at"] = time.time() + 3600
+        return cookie
+    return login
+
+
+@pytest.fixture
+def session():
+    with mock.patch.dict(scadalts.cookie_cache, {"value": None, "expires_at": 0}):
+        yield scadalts.ScadaSession(scadalts.cookie_cache, refresh_margin=300)
+
+
+@pytest.mark.unit
+def test_single_flight(session):
+    """Várias threads com o cookie expirado geram uma única autenticação."""
+    calls = []
+    results = []
+    with mock.patch.object(scadalts, "get_cookie_from_url", side_effect=fake_login(calls)):
+        threads = [threading.Thread(target=lambda: results.append(session.get_cookie())) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    assert len(calls) == 1
+    assert results == ["JSESSIONID=new"] * 10
+
+
+@pytest.mark.unit
+def test_background_refresh(session):
+    """Perto da expiração o cookie atual é devolvido e renovado em segundo plano."""
+    scadalts.cookie_cache["value"] = "JSESSIONID=old"
+    scadalts.cookie_cache["expires_at"] = time.time() + 60
+    calls = []
+    with mock.patch.object(scadalts, "get_cookie_from_url", side_effect=fake_login(calls, delay=0)):
+        assert session.get_cookie() == "JSESSIONID=old"
+        for _ in range(50):
+            if scadalts.cookie_cache["value"] == "JSESSIONID=new":
+                break
+            time.sleep(0.01)
+
+    assert len(calls) == 1
+    assert session.get_cookie() == "JSESSIONID=new"
+
+
+@pytest.mark.unit
+def test_refresh_stale_cookie(session):
+    """Um cookie recusado (401) só é renovado se ninguém o renovou antes."""
+    calls = []
+    with mock.patch.object(scadalts, "get_cookie_from_url", side_effect=fake_login(calls, delay=0)):
+        assert session.refresh(stale_cookie="JSESSIONID=old") == "JSESSIONID=new"
+        assert session.refresh(stale_cookie="JSESSIONID=old") == "JSESSIONID=new"
+
+    assert len(calls) == 1
+
+
+@pytest.mark.unit
+def test_request_with_session_reauth():
+    """Respostas 401 disparam reautenticação e a requisição é repetida."""
+    responses = [(401, "", True), (200, '{"value": 1}', False)]
+    with mock.patch.object(scadalts, "perform_with_cookie", side_effect=responses) as mock_perform, \
+         mock.patch.object(scadalts.scada_session, "refresh", return_value="JSESSIONID=new"):
+        status_code, response_data = scadalts.request_with_session("http://scada/x", "JSESSIONID=old")
+
+    assert (status_code, response_data) == (200, '{"value": 1}')
+    assert mock_perform.call_args_list[1].args[:2] == ("http://scada/x", "JSESSIONID=new")
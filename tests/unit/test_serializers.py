@@ -0,0 +1,230 @@
+import json
+from concurrent.futures import Future
+from unittest import mock
+
+import pytest
+
+import rabbitmq
+import serializers
+from rabbitmq import MessageBatcher
+from serializers import SERIALIZERS, Serializer, SerializerRoutes, get_serializer, pack, serializer_for_content_type, unpack
+
+DOCUMENT = {
+    "gateways": [{"timestamp": 1762000000.123456, "gateway_id": 1, "SE": "Subestação", "SE_Region": None}],
+    "sensors": [{"sensor_id": "EQ_1", "sensor_tags": {"fase": "A"}}],
+    "registers": [{"register_id": "DP_1", "register": 40001, "register_value": -21.5, "ativo": True}],
+}
+TEXT = json.dumps(DOCUMENT, indent=4, ensure_ascii=False)
+
+
+def installed(name):
+    serializer = SERIALIZERS[name]
+    if not serializer.available():
+        pytest.skip(f"biblioteca do formato {name} não instalada")
+    return serializer
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("name", ["json", "json_compact", "msgpack", "cbor"])
+def test_transcode_round_trip(name):
+    serializer = installed(name)
+
+    body = serializer.transcode(TEXT)
+
+    assert serializer.decode(body) == DOCUMENT
+    assert serializer_for_content_type(serializer.content_type).decode(body) == DOCUMENT
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("name", ["json", "json_compact", "msgpack", "cbor"])
+@pytest.mark.parametrize("count", [1, 15, 16, 23, 24, 255, 256, 70000])
+def test_join_is_an_array(name, count):
+    """Os limites de tamanho do cabeçalho de array de msgpack (16, 65536) e CBOR (24, 256, 65536)."""
+    serializer = installed(name)
+    if count > 300 and name.startswith("json"):
+        pytest.skip("cabeçalho só existe nos formatos binários")
+    documents = [{"n": n} for n in range(count)]
+
+    body = serializer.join([serializer.transcode(json.dumps(document)) for document in documents])
+
+    assert serializer.decode(body) == documents
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("name", ["json", "json_compact", "msgpack", "cbor"])
+def test_pack_keeps_the_format_with_the_message(name):
+    serializer = installed(name)
+
+    content = pack(TEXT, serializer)
+    stored, body = unpack(content)
+
+    if name == "json":
+        assert content is TEXT and stored is None and body is TEXT
+    else:
+        assert stored is serializer and body == serializer.transcode(TEXT)
+    assert unpack(TEXT) == (None, TEXT)
+    assert unpack(TEXT.encode("utf-8")) == (None, TEXT)
+
+
+@pytest.mark.unit
+def test_json_is_sent_unchanged_and_compact_is_smaller():
+    compact = SERIALIZERS["json_compact"].transcode(TEXT)
+
+    assert SERIALIZERS["json"].transcode(TEXT) is TEXT
+    assert compact == json.dumps(DOCUMENT, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    assert len(compact) < len(TEXT.encode("utf-8")) * 0.8
+
+
+@pytest.mark.unit
+def test_compact_json_falls_back_to_standard_library():
+    """Valores que o orjson recusa (inteiros acima de 64 bits, NaN) seguem pelo json."""
+    text = json.dumps({"big": 2 ** 70, "nan": float("nan")})
+
+    body = SERIALIZERS["json_compact"].transcode(text)
+
+    assert body == b'{"big":1180591620717411303424,"nan":NaN}'
+
+
+@pytest.mark.unit
+def test_invalid_or_missing_format_falls_back_to_json(monkeypatch):
+    monkeypatch.setattr(serializers, "msgpack", None)
+
+    assert get_serializer("xml").name == "json"
+    assert get_serializer("msgpack").name == "json"
+    assert get_serializer(" JSON_COMPACT ").name == "json_compact"
+
+
+@pytest.mark.unit
+def test_routes_choose_format_by_routing_key():
+    routes = SerializerRoutes(default="json_compact", routes="status:json, Gateway.health:cbor")
+
+    assert routes.for_route("status").name == "json"
+    assert routes.for_route("sensor").name == "json_compact"
+    assert routes.for_route("Gateway.health").name == ("cbor" if SERIALIZERS["cbor"].available() else "json")
+
+
+@pytest.mark.unit
+def test_batcher_sets_content_type_of_the_route():
+    serializer = installed("msgpack")
+    publisher = mock.MagicMock(routing_key="sensor")
+    done = Future()
+    done.set_result(True)
+    publisher.publish_async.return_value = done
+
+    batcher = MessageBatcher(publisher, max_messages=2, max_bytes=65536, linger=60,
+                             serializers=SerializerRoutes(default="json", routes="sensor:msgpack"))
+    batcher.add('{"n": 1}')
+    batcher.add('{"n": 2}')
+
+    body, routing_key, properties = publisher.publish_async.call_args.args
+    assert serializer.decode(body) == [{"n": 1}, {"n": 2}]
+    assert properties.content_type == "application/msgpack"
+    assert properties.content_encoding is None
+    assert properties.headers == {"batch_size": 2}
+    batcher.close()
+
+
+@pytest.mark.unit
+def test_batcher_joins_queued_messages_without_converting_them_again():
+    """Mensagens gravadas já convertidas não são decodificadas; lotes são separados por formato."""
+    serializer = installed("cbor")
+    publisher = mock.MagicMock(routing_key="sensor")
+    done = Future()
+    done.set_result(True)
+    publisher.publish_async.return_value = done
+
+    batcher = MessageBatcher(publisher, max_messages=2, max_bytes=65536, linger=60,
+                             serializers=SerializerRoutes(default="json"))
+    first, third = pack('{"n": 1}', serializer), pack('{"n": 3}', serializer)
+    with mock.patch.object(serializers, "loads", side_effect=AssertionError("convertida de novo")):
+        batcher.add(first)
+        batcher.add('{"n": 2}')
+        batcher.add(third)
+
+    body, _, properties = publisher.publish_async.call_args.args
+    assert serializer.decode(body) == [{"n": 1}, {"n": 3}]
+    assert properties.content_type == "application/cbor"
+    batcher.flush()
+    body, _, properties = publisher.publish_async.call_args.args
+    assert json.loads(body) == [{"n": 2}]
+    assert properties.content_type == "application/json; charset=utf-8"
+    batcher.close()
+
+
+@pytest.mark.unit
+def test_send_async_publishes_in_route_format():
+    """Sem agrupamento, cada mensagem é convertida e leva o content type, sem content encoding."""
+    routes = SerializerRoutes(default="json", routes="status:json_compact")
+    with mock.patch.object(rabbitmq, "batcher", None), \
+         mock.patch.object(rabbitmq, "serializers", routes), \
+         mock.patch.object(rabbitmq.publisher, "publish_async") as publish_async:
+        rabbitmq.send_rabbitmq_async(TEXT)
+        rabbitmq.send_rabbitmq_async(TEXT, routing_key="status")
+
+    (json_body, _, json_properties), (compact_body, key, compact_properties) = \
+        [call.args for call in publish_async.call_args_list]
+    assert json_body is TEXT and json_properties.content_type == "application/json; charset=utf-8"
+    assert json_properties.content_encoding is None
+    assert key == "status" and json.loads(compact_body) == DOCUMENT and b"\n" not in compact_body
+
+
+@pytest.mark.unit
+def test_content_type_lookup_ignores_parameters():
+    assert serializer_for_content_type("application/json").name == "json"
+    assert serializer_for_content_type("Application/JSON; charset=UTF-8").name == "json"
+    with pytest.raises(ValueError):
+        serializer_for_content_type("text/plain")
+
+
+@pytest.mark.unit
+def test_queue_stores_messages_in_the_route_format(tmp_path):
+    """A mensagem é convertida ao entrar na fila e enviada sem nova conversão."""
+    from sqlalchemy import create_engine, select
+    from sqlalchemy.orm import sessionmaker
+    from models import persistence
+    from outbox import OutboxDrainer
+
+    serializer = installed("msgpack")
+    engine = create_engine(f"sqlite:///{tmp_path / 'outbox.db'}")
+    persistence.__table__.create(engine)
+    routes = SerializerRoutes(default="json", routes="gateway.status:msgpack")
+    published = []
+
+    def publish(payload, routing_key=None):
+        published.append(rabbitmq.encode_message(payload, routing_key, routes))
+        done = Future()
+        done.set_result(True)
+        return done
+
+    with mock.patch.object(rabbitmq, "serializers", routes):
+        # A thread de envio fica parada (ready False); a fila é percorrida por drain_once
+        drainer = OutboxDrainer(session_factory=sessionmaker(bind=engine), replay_rate=0, publish=publish,
+                                wait=lambda pending: [key for key, future in pending if future.result()],
+                                ready=lambda: False, lanes="status,sensor", routing="status:gateway.status")
+        drainer.enqueue(TEXT, kind="status")
+        drainer.enqueue(TEXT, kind="sensor")
+        drainer.writer.stop()
+        with engine.connect() as connection:
+            status, sensor = connection.execute(select(persistence.content_data).order_by(persistence.id)).scalars()
+
+    assert status == pack(TEXT, serializer) and sensor == TEXT
+    with mock.patch.object(serializers, "loads", side_effect=AssertionError("convertida de novo")):
+        assert drainer.drain_once() == 2
+    drainer.stop()
+    (status_body, status_properties), (sensor_body, sensor_properties) = published
+    assert serializer.decode(status_body) == DOCUMENT and status_properties.content_type == "application/msgpack"
+    assert sensor_body == TEXT and sensor_properties.content_type == "application/json; charset=utf-8"
+    engine.dispose()
+
+
+@pytest.mark.unit
+def test_serializer_base_cannot_be_instantiated():
+    with pytest.raises(TypeError):
+        Serializer()
+
+    class Incomplete(Serializer):
+        def encode(self, document):
+            return b""
+
+    with pytest.raises(TypeError):
+        Incomplete()
@@ -0,0 +1,84 @@
+import pytest
+from sqlalchemy import update
+
+import models
+from events import ChangeEventBus
+from snapshot import ConfigSnapshot, SnapshotStore
+
+
+@pytest.mark.unit
+def test_snapshot_indexes_configuration(config_engine):
+    snapshot = ConfigSnapshot.load(config_engine)
+
+    assert snapshot.gateway("GW_1").subestacao == "SE Norte"
+    assert snapshot.equipment("MODBUS", "EQ_1").xid_gateway == "GW_1"
+    assert snapshot.datapoint("modbus", "DP_4").xid_equip == "EQ_2"
+    assert snapshot.datapoint("DNP3", "DP_D").index == 12
+    assert snapshot.sensors_of("modbus", "EQ_1") == ("DP_0", "DP_1", "DP_2")
+    assert snapshot.sensors_of("modbus", "sem dados") == ()
+    assert dict(snapshot.tags_of_equipment("EQ_1")) == {"bay": "01T1"}
+    assert dict(snapshot.tags_of_datapoint("DP_0")) == {"fase": "A"}
+    assert dict(snapshot.tags_of_datapoint("DP_1")) == {}
+    assert sorted(snapshot.periods("modbus")) == [("EQ_1", 5, "MINUTES"), ("EQ_2", 30, "SECONDS"),
+                                                  ("EQ_3", 1, "HOURS")]
+    assert snapshot.periods("dnp3") == [("EQ_D", 1, "HOURS")]
+
+
+@pytest.mark.unit
+def test_snapshot_is_read_only(config_engine):
+    snapshot = ConfigSnapshot.load(config_engine)
+
+    with pytest.raises(TypeError):
+        snapshot.gateways["GW_2"] = None
+    with pytest.raises(AttributeError):
+        snapshot.gateway("GW_1").subestacao = "outra"
+
+
+@pytest.mark.unit
+def test_store_reloads_when_database_changes(config_engine):
+    store = SnapshotStore(config_engine, check_interval=0, bus=None)
+    try:
+        first = store.current()
+        assert store.current() is first
+
+        # Gravação por outra conexão, como a feita pelo middleware de configuração
+        with config_engine.begin() as connection:
+            connection.execute(update(models.cma_gateway.__table__).values(subestacao="SE Sul"))
+
+        second = store.current()
+        assert second is not first
+        assert second.gateway("GW_1").subestacao == "SE Sul"
+        assert first.gateway("GW_1").subestacao == "SE Norte"
+        assert store.reloads == 2
+    finally:
+        store.close()
+
+
+@pytest.mark.unit
+def test_store_checks_database_at_most_once_per_interval(config_engine):
+    store = SnapshotStore(config_engine, check_interval=3600, bus=None)
+    try:
+        first = store.current()
+        with config_engine.begin() as connection:
+            connection.execute(update(models.cma_gateway.__table__).values(subestacao="SE Sul"))
+        assert store.current() is first
+
+        store.invalidate()
+        assert store.current().gateway("GW_1").subestacao == "SE Sul"
+    finally:
+        store.close()
+
+
+@pytest.mark.unit
+def test_change_events_invalidate_store(config_engine):
+    bus = ChangeEventBus(linger=0)
+    store = SnapshotStore(config_engine, check_interval=3600, bus=bus)
+    try:
+        first = store.current()
+        bus.publish("atualização", "EQP_TAGS", (1,))
+        bus.publish("atualização", "PERSISTENCE", (1,))
+        assert bus.flush()
+        assert store.current() is not first
+    finally:
+        bus.stop()
+        store.close()